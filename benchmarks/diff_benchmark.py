@@ -0,0 +1,89 @@
+import argparse
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tools.llm_tools import _apply_diff_highlights, _tokenize
+from src.tools.text_diff import diff_opcodes
+
+SIZES = [100, 1_000, 5_000, 10_000, 50_000]
+
+VOCABULARY = (
+    "the of and to in is was that for it with as on be at by this had not are but from or have an they "
+    "which one you were all we her she there would their will when who him been has more if no out so "
+    "said what up its about into than them can only other new some could time these two may then do "
+    "first any my now such like our over man me even most made after also did many before must through "
+    "report meeting budget quarter customer product release feature review planning schedule deadline"
+).split()
+
+
+def make_text(tokens: int, rng: random.Random) -> str:
+    """Prose-like text of roughly `tokens` diff tokens (words, spaces and punctuation)."""
+    words = []
+    while len(words) * 2 < tokens:
+        sentence = [rng.choice(VOCABULARY) for _ in range(rng.randint(6, 18))]
+        sentence[0] = sentence[0].capitalize()
+        words.extend(sentence[:-1])
+        words.append(sentence[-1] + rng.choice([".", ".", ",", "!", "?"]))
+    return " ".join(words)
+
+
+def edit_text(text: str, rate: float, rng: random.Random) -> str:
+    """Simulates an editor's fixes: replaces, drops or inserts about `rate` of the words."""
+    words = text.split(" ")
+    edited = []
+    for word in words:
+        roll = rng.random()
+        if roll < rate / 3:
+            edited.append(rng.choice(VOCABULARY))
+        elif roll < 2 * rate / 3:
+            continue
+        elif roll < rate:
+            edited.extend([word, rng.choice(VOCABULARY)])
+        else:
+            edited.append(word)
+    return " ".join(edited)
+
+
+def legacy_opcodes(a, b):
+    return SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+
+
+def time_call(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the diff engine behind fix/polish highlights with difflib")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Token counts to benchmark")
+    parser.add_argument("--edit-rate", type=float, default=0.05, help="Fraction of words the simulated editor changes")
+    parser.add_argument("--legacy-limit", type=int, default=10_000, help="Skip difflib above this many tokens (it needs minutes at 50k)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'tokens':>8} | {'difflib opcodes':>15} | {'new opcodes':>11} | {'speedup':>8} | {'highlight total':>15}")
+    print("-" * 70)
+    for size in args.sizes:
+        original = make_text(size, rng)
+        edited = edit_text(original, args.edit_rate, rng)
+        a, b = _tokenize(original), _tokenize(edited)
+
+        new = time_call(diff_opcodes, a, b)
+        highlight = time_call(_apply_diff_highlights, original, edited)
+        if len(a) <= args.legacy_limit:
+            legacy = time_call(legacy_opcodes, a, b)
+            legacy_text, speedup = f"{legacy * 1000:13.1f}ms", f"{legacy / new:7.1f}x"
+        else:
+            legacy_text, speedup = f"{'skipped':>15}", f"{'-':>8}"
+        print(f"{len(a):>8} | {legacy_text} | {new * 1000:9.1f}ms | {speedup} | {highlight * 1000:13.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_TEXT_RE = re.compile(r"<text>(.*?)</text>", re.DOTALL)
+_FIELD_RE = re.compile(r'^\s*- "(\w+)":', re.MULTILINE)
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class Profile:
+    """How the fake provider behaves.
+
+    Attributes:
+        latency: Median time to the first token, in seconds.
+        jitter: Spread of that latency: the sigma of a lognormal, or the half-width of a
+            uniform distribution.
+        distribution: "constant", "uniform" or "lognormal".
+        tokens_per_second: Generation speed once the first token is out.
+        error_rate: Fraction of requests answered with `error_status`.
+        error_status: HTTP status of failed requests (500, 429, ...).
+    """
+    latency: float = 0.3
+    jitter: float = 0.3
+    distribution: str = "lognormal"
+    tokens_per_second: float = 80.0
+    error_rate: float = 0.0
+    error_status: int = 500
+
+    def first_token_delay(self, rng: random.Random) -> float:
+        if self.distribution == "constant":
+            return self.latency
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(self.latency - self.jitter, self.latency + self.jitter))
+        return rng.lognormvariate(0, self.jitter) * self.latency
+
+
+def _text_of(content) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def normalize_messages(body: dict) -> list:
+    """Role/text pairs from a Chat Completions (`messages`) or Responses (`input`) request."""
+    messages = [{"role": "system", "content": body["instructions"]}] if body.get("instructions") else []
+    items = body.get("messages") or body.get("input") or []
+    if isinstance(items, str):
+        items = [{"role": "user", "content": items}]
+    for item in items:
+        role = "system" if item.get("role") == "developer" else item.get("role")
+        messages.append({"role": role, "content": _text_of(item.get("content"))})
+    return messages
+
+
+def reply_for(messages: list) -> str:
+    """A plausible answer without a model: the input text back, or JSON for structured prompts."""
+    system = "\n".join(m["content"] for m in messages if m["role"] == "system")
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    match = _TEXT_RE.search(user)
+    text = match.group(1) if match else user
+    if "JSON object" in system:
+        return json.dumps({field: text for field in _FIELD_RE.findall(system)}, ensure_ascii=False)
+    return text
+
+
+def _token_counts(messages: list, completion: str, seen_prefixes: set) -> tuple:
+    """Prompt, completion and cached prompt tokens; a system prompt seen before counts as cached."""
+    system = "\n".join(m["content"] for m in messages if m["role"] == "system")
+    cached = len(_TOKEN_RE.findall(system)) if system in seen_prefixes else 0
+    seen_prefixes.add(system)
+    return sum(len(_TOKEN_RE.findall(m["content"])) for m in messages), len(_TOKEN_RE.findall(completion)), cached
+
+
+def create_app(profile: Profile, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI-compatible LLM")
+    rng = random.Random(seed)
+    seen_prefixes: set = set()
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "benchmark"}]}
+
+    async def respond(request: Request, render_full, render_stream):
+        body = await request.json()
+        messages = normalize_messages(body)
+        await asyncio.sleep(profile.first_token_delay(rng))
+        if rng.random() < profile.error_rate:
+            return JSONResponse(
+                {"error": {"message": "Injected failure", "type": "server_error"}},
+                status_code=profile.error_status,
+            )
+
+        content = reply_for(messages)
+        tokens = _TOKEN_RE.findall(content) or [""]
+        gap = 1 / profile.tokens_per_second if profile.tokens_per_second > 0 else 0
+        model = body.get("model", "fake")
+        counts = _token_counts(messages, content, seen_prefixes)
+
+        if not body.get("stream"):
+            await asyncio.sleep(gap * len(tokens))
+            return render_full(model, content, counts)
+
+        async def paced():
+            for index, token in enumerate(tokens):
+                if index:
+                    await asyncio.sleep(gap)
+                yield token
+
+        return StreamingResponse(render_stream(model, content, counts, paced()), media_type="text/event-stream")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        def usage(counts):
+            return {
+                "prompt_tokens": counts[0],
+                "prompt_tokens_details": {"cached_tokens": counts[2]},
+                "completion_tokens": counts[1],
+                "total_tokens": counts[0] + counts[1],
+            }
+
+        def full(model, content, counts):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage(counts),
+            }
+
+        async def stream(model, content, counts, tokens):
+            def chunk(delta, finish_reason=None, **extra):
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                    **extra,
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            async for token in tokens:
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            yield chunk(None, usage=usage(counts))
+            yield "data: [DONE]\n\n"
+
+        return await respond(request, full, stream)
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        response_id = f"resp_{uuid.uuid4().hex[:12]}"
+        message_id = f"msg_{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        def message(content, status="completed"):
+            parts = [{"type": "output_text", "text": content, "annotations": []}] if status == "completed" else []
+            return {"type": "message", "id": message_id, "status": status, "role": "assistant", "content": parts}
+
+        def full(model, content, counts, status="completed"):
+            return {
+                "id": response_id,
+                "object": "response",
+                "created_at": created,
+                "model": model,
+                "status": status,
+                "output": [message(content)] if status == "completed" else [],
+                "parallel_tool_calls": True,
+                "tool_choice": "auto",
+                "tools": [],
+                "usage": {
+                    "input_tokens": counts[0],
+                    "input_tokens_details": {"cached_tokens": counts[2]},
+                    "output_tokens": counts[1],
+                    "output_tokens_details": {"reasoning_tokens": 0},
+                    "total_tokens": counts[0] + counts[1],
+                },
+            }
+
+        async def stream(model, content, counts, tokens):
+            sequence = 0
+
+            def event(kind, **payload):
+                nonlocal sequence
+                sequence += 1
+                return f"event: {kind}\ndata: {json.dumps({'type': kind, 'sequence_number': sequence, **payload})}\n\n"
+
+            location = {"item_id": message_id, "output_index": 0, "content_index": 0}
+            yield event("response.created", response=full(model, "", counts, status="in_progress"))
+            yield event("response.output_item.added", output_index=0, item=message("", status="in_progress"))
+            yield event("response.content_part.added", part={"type": "output_text", "text": "", "annotations": []}, **location)
+            async for token in tokens:
+                yield event("response.output_text.delta", delta=token, **location)
+            yield event("response.output_text.done", text=content, **location)
+            yield event("response.content_part.done", part={"type": "output_text", "text": content, "annotations": []}, **location)
+            yield event("response.output_item.done", output_index=0, item=message(content))
+            yield event("response.completed", response=full(model, content, counts))
+
+        return await respond(request, full, stream)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI-compatible chat completions API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--latency", type=float, default=Profile.latency, help="Median time to first token (s)")
+    parser.add_argument("--jitter", type=float, default=Profile.jitter, help="Lognormal sigma or uniform half-width")
+    parser.add_argument("--distribution", choices=["constant", "uniform", "lognormal"], default=Profile.distribution)
+    parser.add_argument("--tokens-per-second", type=float, default=Profile.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=Profile.error_rate)
+    parser.add_argument("--error-status", type=int, default=Profile.error_status)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    profile = Profile(
+        latency=args.latency,
+        jitter=args.jitter,
+        distribution=args.distribution,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    uvicorn.run(create_app(profile, args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+CONCURRENCY = [1, 4, 16]
+SENTENCES = [
+    "Please review the draft before the meeting and send me your comments.",
+    "We shipped the new release to every customer last week without issues.",
+    "The budget for next quarter depends on how the product launch goes.",
+    "I think we should move the planning session so that everyone can attend.",
+    "Could you summarize the feedback from the customer interviews for the team?",
+    "Their report was longer than expected but it covered every open question.",
+]
+
+
+def percentiles(samples: list) -> dict:
+    """p50/p95/p99/mean of `samples` (seconds), in milliseconds."""
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    ordered = sorted(samples)
+
+    def at(quantile):
+        return round(ordered[min(int(len(ordered) * quantile), len(ordered) - 1)] * 1000, 1)
+
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "mean": round(sum(ordered) / len(ordered) * 1000, 1)}
+
+
+def cpu_seconds(pid: int):
+    """User plus system CPU time of a process, or None where it can't be read."""
+    if psutil is not None:
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError):
+        return None
+
+
+def make_content(index: int, rng: random.Random) -> str:
+    """A short unique paragraph, so neither the response cache nor single-flight hides the work."""
+    return " ".join(rng.sample(SENTENCES, 2)) + f" Reference {index}."
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url, timeout=1.0)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+            await asyncio.sleep(0.2)
+
+
+def benchmark_env(fake_url: str, log_dir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_BASE_URL": fake_url,
+        "LITELLM_HOST": fake_url,
+        "OPENAI_API_KEY": "benchmark",
+        "LITELLM_API_KEY": "benchmark",
+        "HERMIONE_CACHE_ENABLED": "0",
+        "HERMIONE_LOG_DIR": log_dir,
+        "PYTHONPATH": ROOT,
+    })
+    return env
+
+
+async def run_level(send_one, concurrency: int, requests: int, rng: random.Random) -> dict:
+    """Sends `requests` requests, `concurrency` at a time; returns first-chunk and total latencies.
+
+    The first chunk is the first node output or delta; the router's echo of the input
+    doesn't count.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    first_chunk, complete, errors = [], [], []
+
+    async def one(index):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                first = await send_one(make_content(index, rng), started)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                return
+            if first is not None:
+                first_chunk.append(first)
+            complete.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "throughput_rps": round(requests / elapsed, 2),
+        "time_to_first_chunk_ms": percentiles(first_chunk),
+        "time_to_all_complete_ms": percentiles(complete),
+    }
+
+
+async def benchmark_agent(args, rng: random.Random) -> list:
+    # src modules read provider URLs and keys at import time, so they are imported
+    # only once benchmark_env has been applied to this process
+    from langchain_core.messages import HumanMessage
+    from src.agent import AgentBuilder, clear_timing_data, get_timing_data
+    from src.agent_config import get_agent_config
+    from src.tools.prompts import prompt_cache_stats
+
+    agent = AgentBuilder(provider=args.provider, **get_agent_config(provider=args.provider)).build()
+
+    async def send_one(content, started):
+        first = None
+        async for event in agent.ainvoke_streaming({"messages": [HumanMessage(content)]}, stream_tokens=True):
+            if first is None and event["output_key"] != "existent":
+                first = time.perf_counter() - started
+        return first
+
+    results = []
+    for concurrency in args.concurrency:
+        clear_timing_data()
+        prompt_cache_stats.clear()
+        cpu_before = time.process_time()
+        result = await run_level(send_one, concurrency, args.requests, rng)
+        result["cpu_ms_per_request"] = round((time.process_time() - cpu_before) / args.requests * 1000, 2)
+        nodes = {}
+        for timing in get_timing_data():
+            nodes.setdefault(timing["node"], []).append(timing["time"])
+        result["node_time_ms"] = {node: percentiles(samples) for node, samples in sorted(nodes.items())}
+        result["prompt_cache"] = prompt_cache_stats.stats()
+        results.append({"target": "agent", **result})
+    return results
+
+
+async def benchmark_api(args, rng: random.Random, env: dict) -> list:
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "src", "api.py")],
+        env={**env, "API_PORT": str(args.api_port)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        await wait_ready(f"{api_url}/")
+        async with httpx.AsyncClient(timeout=120.0, limits=httpx.Limits(max_connections=max(args.concurrency))) as client:
+            async def send_one(content, started):
+                first = None
+                body = {
+                    "content": content,
+                    "provider_mode": args.provider_mode,
+                    "stream_tokens": True,
+                    "session_id": uuid.uuid4().hex,
+                }
+                async with client.stream("POST", f"{api_url}/runs/stream", json=body) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        chunk = json.loads(line[6:])
+                        if "error" in chunk:
+                            raise RuntimeError(chunk["error"])
+                        if first is None and chunk.get("output_key", "existent") != "existent":
+                            first = time.perf_counter() - started
+                        if chunk.get("all_complete"):
+                            break
+                return first
+
+            results = []
+            for concurrency in args.concurrency:
+                cpu_before = cpu_seconds(server.pid)
+                result = await run_level(send_one, concurrency, args.requests, rng)
+                cpu_after = cpu_seconds(server.pid)
+                result["cpu_ms_per_request"] = (
+                    round((cpu_after - cpu_before) / args.requests * 1000, 2) if cpu_before is not None else None
+                )
+                results.append({"target": "api", **result})
+            return results
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_table(results: list):
+    print(f"{'target':>6} | {'conc':>4} | {'ok':>4} | {'err':>3} | {'first p50':>9} | {'first p95':>9} | {'all p50':>8} | {'all p95':>8} | {'all p99':>8} | {'cpu/req':>8}")
+    print("-" * 98)
+    for r in results:
+        first, total = r["time_to_first_chunk_ms"], r["time_to_all_complete_ms"]
+        cpu = r["cpu_ms_per_request"]
+        print(
+            f"{r['target']:>6} | {r['concurrency']:>4} | {r['requests'] - r['errors']:>4} | {r['errors']:>3} | "
+            f"{first['p50'] or '-':>9} | {first['p95'] or '-':>9} | {total['p50'] or '-':>8} | "
+            f"{total['p95'] or '-':>8} | {total['p99'] or '-':>8} | {cpu if cpu is not None else '-':>8}"
+        )
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    fake_url = f"http://127.0.0.1:{args.fake_port}/v1"
+    fake_server = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "benchmarks", "fake_llm_server.py"),
+        "--port", str(args.fake_port),
+        "--latency", str(args.latency),
+        "--jitter", str(args.jitter),
+        "--distribution", args.distribution,
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--error-rate", str(args.error_rate),
+        "--seed", str(args.seed),
+    ])
+    try:
+        await wait_ready(f"{fake_url}/models")
+        with tempfile.TemporaryDirectory() as log_dir:
+            env = benchmark_env(fake_url, log_dir)
+            results = []
+            if "agent" in args.targets:
+                os.environ.update(env)
+                results += await benchmark_agent(args, rng)
+            if "api" in args.targets:
+                results += await benchmark_api(args, rng, env)
+    finally:
+        fake_server.terminate()
+        fake_server.wait(timeout=10)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "fake_llm": {
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "distribution": args.distribution,
+                "tokens_per_second": args.tokens_per_second,
+                "error_rate": args.error_rate,
+            },
+            "provider": args.provider,
+            "provider_mode": args.provider_mode,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure agent and API latency against a local fake LLM server")
+    parser.add_argument("--targets", nargs="+", choices=["agent", "api"], default=["agent", "api"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY, help="Concurrent requests per level")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per concurrency level")
+    parser.add_argument("--provider", choices=["openai", "litellm"], default="openai", help="Provider for the agent target")
+    parser.add_argument("--provider-mode", choices=["openai_only", "litellm_only", "both"], default="openai_only", help="provider_mode sent to /runs/stream")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake LLM median time to first token (s)")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--distribution", choices=["constant", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-port", type=int, default=8199)
+    parser.add_argument("--api-port", type=int, default=8198)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report here (e.g. to diff across commits)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_table(report["results"])
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
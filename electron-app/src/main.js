@@ -1,6 +1,7 @@
 const { app, BrowserWindow, globalShortcut, ipcMain, clipboard, screen, Menu, dialog, systemPreferences } = require('electron');
 const path = require('path');
 const { spawn, exec, execFile } = require('child_process');
+const crypto = require('crypto');
 const fs = require('fs');
 const fetch = require('node-fetch');
 const log = require('electron-log');
@@ -31,6 +32,15 @@ const DEFAULT_PORT = 8123;
 const API_PORT = process.env.API_PORT || DEFAULT_PORT;
 const API_HOST = '127.0.0.1';
 const PROVIDER_MODE = process.env.PROVIDER_MODE || 'openai_only';
+const STREAM_RENDER_INTERVAL_MS = 50;
+// Identifies this app instance so a new request only cancels our own previous one
+const SESSION_ID = crypto.randomUUID();
+// Opt-in: copied text is sent to the backend (and its LLM providers) ahead of time
+// so its results are ready sooner, including text the user never asks to process
+const PREFETCH_ENABLED = process.env.HERMIONE_PREFETCH === '1';
+const PREFETCH_POLL_INTERVAL_MS = 500;
+const PREFETCH_DEBOUNCE_MS = 400;
+const PREFETCH_MAX_CHARS = 20000;
 
 // Path to the Python executable in the virtual environment
 const pythonPath = IS_DEV
@@ -1315,6 +1325,35 @@ async function copySelectedText() {
   return copiedText.trim() ? copiedText : null;
 }
 
+function startClipboardPrefetch() {
+  let lastText = clipboard.readText();
+  let debounceTimer = null;
+
+  setInterval(() => {
+    const text = clipboard.readText();
+    if (text === lastText) {
+      return;
+    }
+    lastText = text;
+    clearTimeout(debounceTimer);
+    if (!text.trim() || text.length > PREFETCH_MAX_CHARS) {
+      return;
+    }
+    debounceTimer = setTimeout(() => {
+      fetch(`http://${API_HOST}:${API_PORT}/runs/prefetch`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          content: text,
+          provider_mode: PROVIDER_MODE
+        })
+      }).catch(error => log.warn('Prefetch request failed:', error.message));
+    }, PREFETCH_DEBOUNCE_MS);
+  }, PREFETCH_POLL_INTERVAL_MS);
+}
+
 function createTextInputWindow() {
   if (popupWindow && !popupWindow.isDestroyed()) {
     popupWindow.destroy();
@@ -1474,6 +1513,23 @@ function registerShortcut() {
         const requestController = new AbortController();
         activeRequestController = requestController;
 
+        // Token deltas arrive much faster than the popup can re-render, so batch them
+        let streamingRenderTimer = null;
+        const scheduleStreamingRender = () => {
+          if (streamingRenderTimer) {
+            return;
+          }
+          streamingRenderTimer = setTimeout(() => {
+            streamingRenderTimer = null;
+            if (!allComplete) {
+              updatePopup(accumulatedOutput, true);
+            }
+          }, STREAM_RENDER_INTERVAL_MS);
+        };
+        const findStreamingIndex = (items, data) => items.findIndex(
+          item => item.streaming && item.model === data.model && item.provider === data.provider
+        );
+
         fetch(`http://${API_HOST}:${API_PORT}/runs/stream`, {
           method: 'POST',
           headers: {
@@ -1481,7 +1537,9 @@ function registerShortcut() {
           },
           body: JSON.stringify({
             content: selectedText,
-            provider_mode: PROVIDER_MODE
+            provider_mode: PROVIDER_MODE,
+            stream_tokens: true,
+            session_id: SESSION_ID
           }),
           signal: requestController.signal
         })
@@ -1515,6 +1573,33 @@ function registerShortcut() {
                       return;
                     }
 
+                    if (data.event === 'delta') {
+                      if (!accumulatedOutput[data.output_key]) {
+                        accumulatedOutput[data.output_key] = [];
+                      }
+                      const items = accumulatedOutput[data.output_key];
+                      const streamingIndex = findStreamingIndex(items, data);
+                      if (streamingIndex === -1) {
+                        items.push({
+                          value: data.delta,
+                          tag: data.tag,
+                          model: data.model,
+                          provider: data.provider,
+                          elapsed: Date.now() - requestStartTime,
+                          streaming: true
+                        });
+                      } else {
+                        items[streamingIndex].value += data.delta;
+                      }
+                      scheduleStreamingRender();
+                      continue;
+                    }
+
+                    // Per-request token usage is for /stats and logs, not the popup
+                    if (data.event === 'usage') {
+                      continue;
+                    }
+
                     if (data.output_key) {
                       if (!accumulatedOutput[data.output_key]) {
                         accumulatedOutput[data.output_key] = [];
@@ -1525,10 +1610,19 @@ function registerShortcut() {
                         value: data.value,
                         tag: data.tag,
                         model: data.model,
+                        provider: data.provider,
                         elapsed: elapsedMs
                       };
 
-                      accumulatedOutput[data.output_key].push(newItem);
+                      // The final value replaces the text streamed so far for this model
+                      const items = accumulatedOutput[data.output_key];
+                      const streamingIndex = findStreamingIndex(items, data);
+                      if (streamingIndex === -1) {
+                        items.push(newItem);
+                      } else {
+                        newItem.elapsed = items[streamingIndex].elapsed;
+                        items[streamingIndex] = newItem;
+                      }
 
                       // Update popup with accumulated output
                       updatePopup(accumulatedOutput, !data.all_complete);
@@ -1829,6 +1923,10 @@ app.on('ready', async () => {
 
     registerShortcut();
 
+    if (PREFETCH_ENABLED) {
+      startClipboardPrefetch();
+    }
+
     app.on('activate', () => {
       if (popupWindow && !popupWindow.isDestroyed() && !popupWindow.isVisible()) {
         popupWindow.show();
@@ -1,6 +1,6 @@
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
-from src.tools.function_calculator import calculate_formula
+from src.tools.function_calculator import acalculate_formula, evaluate_expression, UnsupportedExpression
 from src.tools.llm_tools import (
     translate_text,
     fluent_translate_text,
@@ -11,21 +11,100 @@ from src.tools.llm_tools import (
     polish_text,
     generate_emoji,
     convert_time_zones,
+    multi_output_transform,
     message_content_to_str,
     _label_to_language_bucket,
 )
 from src.llm_providers import get_openai_llm, get_litellm_llm
 from src.agent_config import get_agent_config
+from src.provider_health import health_monitor, is_provider_failure
+from src.hedging import hedged
+from src.single_flight import node_flights
+from src.chunking import CHUNK_MIN_CHARS, transform_text
+from src.tracing import tracer
+from src.usage import PROMPT_OVERHEAD_TOKENS, estimate_tokens, usage_ledger
+from src.response_cache import CACHE_ENABLED, CacheHits, llm_identity, make_cache_key
+from src.scheduler import USEFUL_PRIORITY, Completion, DagScheduler, Job, NodeSpec, get_provider_limiter, ttfur_slo
+from src.tools.time_expressions import has_time_expression
+from collections import Counter, deque
 from textwrap import dedent
-from typing import Dict, Any, List, Literal, Union
+from typing import Dict, Any, List, Literal, Union, Callable, Awaitable
 from dataclasses import dataclass, field
 import logging
 import asyncio
 import re
+import time
+from contextlib import aclosing, nullcontext
 
 logger = logging.getLogger(__name__)
 
 _MATH_OPERATOR_RE = re.compile(r'[+\-*/^=<>%]|\b(?:log|log10|log2|ln|sin|cos|tan|sqrt|sum|prod|exp)\b', re.IGNORECASE)
+_MATH_WORDS = {"log", "ln", "sin", "cos", "tan", "sqrt", "sum", "prod", "exp", "abs", "min", "max", "pi"}
+
+# Inputs the text nodes have nothing to say about
+_URL_RE = re.compile(r'^(?:[a-z][a-z0-9+.-]*://|www\.)\S+$', re.IGNORECASE)
+_NUMBER_RE = re.compile(r'^[-+]?[$€£₽]?\s*[\d\s.,_]*\d[\d\s.,_]*\s*(?:%|[$€£₽]|[a-zA-Z]{1,3})?$')
+# Syntax prose doesn't have: enough to call even a single line code
+_CODE_SYNTAX_RE = re.compile(r'[;{}]\s*$|\)\s*\{|^\s*#include\b|^(?:\t| {2,})\S')
+# Leading keywords and assignments, which sentences can start with too; only counted in multi-line input
+_CODE_LINE_RE = re.compile(
+    r'^\s*(?:def|class|import|from\s+\S+\s+import|return|const|let|var|function|public|private|SELECT|INSERT)\b'
+    r'|=>|^\s*[\w.\[\]]+\s*[+\-*/]?=\s*\S'
+)
+# Any run of letters, so "I", "я" and a CJK sentence count as words
+_WORD_RE = re.compile(r'[^\W\d_]+')
+
+# Routes scoring below this are not scheduled
+ROUTE_MIN_SCORE = 0.3
+CODE_LINE_RATIO = 0.6
+
+_route_skip_counts: Counter = Counter()
+
+
+def get_route_skip_counts() -> Dict[str, int]:
+    """How many times each route was pruned by the router since startup."""
+    return dict(_route_skip_counts)
+
+
+# Durations of recent node runs, newest last
+_timing_data: deque = deque(maxlen=1000)
+
+
+def get_timing_data() -> List[Dict[str, Any]]:
+    """Recent node runs as {"node", "model", "time"} dicts, `time` in seconds."""
+    return list(_timing_data)
+
+
+def clear_timing_data():
+    _timing_data.clear()
+
+
+# Routes that multi-output mode folds into a single structured request, with the
+# field name multi_output_transform uses for each of them.
+MULTI_OUTPUT_ROUTES = {
+    "text_fluent_translation_node": "fluent_translation",
+    "text_fix_node": "fixed",
+    "text_reformulation_node": "reformulation",
+    "text_polish_node": "polished",
+    "text_enrichment_node": "enrichment",
+    "text_summarization_node": "tldr",
+    "emoji_generation_node": "emoji",
+}
+
+# Every node the router can schedule. Priorities put what users read first (fixed text,
+# translation, quick local answers) ahead of nice-to-haves when concurrency is capped.
+NODE_REGISTRY: Dict[str, NodeSpec] = {spec.name: spec for spec in (
+    NodeSpec("text_fix_node", "_text_fix_node", "out_fixed", priority=0),
+    NodeSpec("text_fluent_translation_node", "_text_fluent_translation_node", "out_fluent_translation", priority=0),
+    NodeSpec("text_multi_output_node", "_text_multi_output_node", "out_multi_output", streams=False, cost_class="llm_batch", priority=0),
+    NodeSpec("math_formula_calculation_node", "_math_formula_calculation_node", "out_math_result", needs_llm=False, streams=False, cost_class="local", priority=0),
+    NodeSpec("time_zone_conversion_node", "_time_zone_conversion_node", "out_tz_conversion", streams=False, priority=1),
+    NodeSpec("text_polish_node", "_text_polish_node", "out_polished", priority=1),
+    NodeSpec("text_reformulation_node", "_text_reformulation_node", "out_reformulation", priority=1),
+    NodeSpec("text_summarization_node", "_text_summarization_node", "out_tldr", priority=1),
+    NodeSpec("text_enrichment_node", "_text_enrichment_node", "out_enrichment", priority=2),
+    NodeSpec("emoji_generation_node", "_emoji_generation_node", "out_emoji", priority=2),
+)}
 
 
 math_formula_calculation_prompt = dedent("""
@@ -54,6 +133,13 @@ math_formula_calculation_prompt = dedent("""
     """)
 
 
+async def _with_cache_hits(call: Callable[[CacheHits], Awaitable[Any]]):
+    """Runs `call` with a fresh `CacheHits`; returns its result and whether it was fully cached."""
+    cache_hits = CacheHits()
+    result = await call(cache_hits)
+    return result, cache_hits.all_hit
+
+
 @dataclass
 class AgentState:
     messages: List[Any] = field(default_factory=list)
@@ -72,6 +158,7 @@ class AgentState:
     out_enrichment: str = ""
     out_emoji: str = ""
     out_tz_conversion: str = ""
+    route_scores: Dict[str, float] = field(default_factory=dict)
 
     def update(self, updates: Dict[str, Any]):
         for key, value in updates.items():
@@ -103,6 +190,7 @@ class AgentState:
             "out_enrichment": self.out_enrichment,
             "out_emoji": self.out_emoji,
             "out_tz_conversion": self.out_tz_conversion,
+            "route_scores": self.route_scores,
         }
 
 
@@ -123,12 +211,18 @@ class Agent:
 
         return state.to_dict()
 
-    async def ainvoke_streaming(self, input_data: Dict[str, Any], cancellation_event: asyncio.Event = None):
+    async def ainvoke_streaming(
+        self,
+        input_data: Dict[str, Any],
+        cancellation_event: asyncio.Event = None,
+        stream_tokens: bool = False,
+        node_filter: Callable[[NodeSpec], bool] = None,
+    ):
         state = AgentState()
         if "messages" in input_data:
             state.messages = input_data["messages"]
 
-        async for result in self.builder._run_agent_streaming(state, cancellation_event):
+        async for result in self.builder._run_agent_streaming(state, cancellation_event, stream_tokens, node_filter):
             yield result
 
 
@@ -143,6 +237,10 @@ class AgentBuilder:
         temperature: float = 1,
         provider: Literal["openai", "litellm"] = "openai",
         thinking_budget: int = None,
+        execution_mode: Literal["fan_out", "multi_output"] = "fan_out",
+        max_concurrency: int = None,
+        hold_back_low_priority: bool = False,
+        hedging: bool = False,
         **kwargs,
     ):
         self.native_language = native_language
@@ -157,6 +255,12 @@ class AgentBuilder:
         self.temperature = temperature
         self.provider = provider
         self.thinking_budget = thinking_budget
+        self.execution_mode = execution_mode
+        self.max_concurrency = max_concurrency
+        self.hold_back_low_priority = hold_back_low_priority
+        # Instead of running every model for every node, send each node to the first model
+        # and hedge with the second (or the same one) once it runs past its usual latency
+        self.hedging = hedging
 
     def _get_llm(self, use_fast: bool = False) -> Union[ChatOpenAI, List[ChatOpenAI]]:
         model_names = self.base_model
@@ -217,14 +321,71 @@ class AgentBuilder:
         query_language = "Russian" if is_native_language else "English"
         logger.info(f"Tasks: {task_names}, cyrillic_ratio={cyrillic_ratio:.2f}, is_native={is_native_language}")
 
+        route_scores = self._score_routes(message_content_to_str(user_message.content))
+        logger.info(f"Route scores: {route_scores}")
+
         return {
             "tasks": task_names,
             "is_native_language": is_native_language,
             "query_language": query_language,
             "existent": user_message.content,
+            "route_scores": route_scores,
         }
 
+    def _score_routes(self, text: str) -> Dict[str, float]:
+        """Scores how likely each route is to produce something useful for `text`, in [0, 1].
+
+        Only routes that can be ruled out locally are scored; unscored routes always run.
+        """
+        stripped = text.strip()
+        tokens = stripped.split()
+        words = [w for w in _WORD_RE.findall(stripped) if w.lower() not in _MATH_WORDS]
+        prose = min(1.0, len(words) / len(tokens)) if tokens else 0.0
+
+        if _URL_RE.match(stripped) or _NUMBER_RE.match(stripped):
+            prose = 0.0
+        else:
+            lines = [line for line in stripped.splitlines() if line.strip()]
+            syntax_lines = sum(1 for line in lines if _CODE_SYNTAX_RE.search(line))
+            code_lines = sum(1 for line in lines if _CODE_SYNTAX_RE.search(line) or _CODE_LINE_RE.search(line))
+            if syntax_lines and (len(lines) == 1 or code_lines / len(lines) >= CODE_LINE_RATIO):
+                prose = 0.0
+
+        native_bucket = _label_to_language_bucket(self.native_language)
+        same_language = native_bucket is not None and native_bucket == _label_to_language_bucket(self.target_language)
+
+        scores = {route: prose for route in MULTI_OUTPUT_ROUTES}
+        scores["text_fluent_translation_node"] = 0.0 if same_language else prose
+        scores["time_zone_conversion_node"] = 1.0 if has_time_expression(stripped) else 0.0
+        return scores
+
     def _get_routes(self, state: AgentState) -> list[str]:
+        candidates = self._get_candidate_routes(state)
+        routes = self._prune_routes(state, candidates)
+        skipped = [route for route in candidates if route not in routes]
+        if skipped:
+            _route_skip_counts.update(skipped)
+            logger.info(f"Skipping inapplicable routes: {skipped}")
+        if self.execution_mode != "multi_output" or self._is_long(state):
+            # Long texts are chunked per node, which one combined JSON answer can't be
+            return routes
+
+        folded = [route for route in routes if route not in MULTI_OUTPUT_ROUTES]
+        if len(folded) < len(routes):
+            folded.append("text_multi_output_node")
+        return folded
+
+    def _get_fan_out_routes(self, state: AgentState) -> list[str]:
+        return self._prune_routes(state, self._get_candidate_routes(state))
+
+    def _prune_routes(self, state: AgentState, routes: list[str]) -> list[str]:
+        """Drops low-scoring routes, but never all of them: then the high-priority ones still run."""
+        pruned = [route for route in routes if state.route_scores.get(route, 1.0) >= ROUTE_MIN_SCORE]
+        if routes and not pruned:
+            return [route for route in routes if NODE_REGISTRY[route].priority <= USEFUL_PRIORITY] or routes
+        return pruned
+
+    def _get_candidate_routes(self, state: AgentState) -> list[str]:
         routes = ["time_zone_conversion_node"]
         word_count = len(state.messages[0].content.split())
         for task in state.tasks:
@@ -242,11 +403,48 @@ class AgentBuilder:
                 routes.append(f"{task}_node")
         return routes
 
-    async def _text_translation_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None) -> Dict[str, Any]:
+    @staticmethod
+    def _is_long(state: AgentState) -> bool:
+        content = state.messages[0].content
+        return isinstance(content, str) and len(content) >= CHUNK_MIN_CHARS
+
+    async def _chunked(
+        self,
+        tool: Callable,
+        text: str,
+        on_delta: Callable[[str], None] = None,
+        cache_hits: CacheHits = None,
+        **params,
+    ) -> str:
+        """Runs a cached LLM tool on `text`; long texts are split into paragraph chunks run
+        concurrently, and paragraphs already processed with the same settings are reused.
+        Every chunk's cache lookup and every reused paragraph is counted in `cache_hits`."""
+        if not isinstance(text, str):
+            return await tool(text=text, on_delta=on_delta, cache_hits=cache_hits, **params)
+
+        memo_key = None
+        identity = llm_identity(params.get("llm"))
+        if CACHE_ENABLED and identity is not None:
+            settings = {name: value for name, value in params.items() if name != "llm"}
+            memo_key = lambda paragraph: make_cache_key(
+                tool.__name__, tool.prompt_version, identity, {**settings, "text": paragraph}
+            )
+        return await transform_text(
+            text,
+            lambda chunk, chunk_delta: tool(text=chunk, on_delta=chunk_delta, cache_hits=cache_hits, **params),
+            on_delta,
+            memo_key=memo_key,
+            cache_hits=cache_hits,
+        )
+
+    async def _text_translation_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None, on_delta: Callable[[str], None] = None, cache_hits: CacheHits = None) -> Dict[str, Any]:
         model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
         logger.info(f"[MODEL_INFO] text_translation_node: {model_info}")
-        translated_text = await translate_text(
-            text=state.messages[0].content,
+        translated_text = await self._chunked(
+            translate_text,
+            state.messages[0].content,
+            on_delta,
+            cache_hits,
             native_language=self.native_language,
             target_language=self.target_language,
             is_native_language=state.is_native_language,
@@ -255,11 +453,14 @@ class AgentBuilder:
         )
         return {"out_translation": translated_text}
 
-    async def _text_fluent_translation_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None) -> Dict[str, Any]:
+    async def _text_fluent_translation_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None, on_delta: Callable[[str], None] = None, cache_hits: CacheHits = None) -> Dict[str, Any]:
         model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
         logger.info(f"[MODEL_INFO] text_fluent_translation_node: {model_info}")
-        translated_text = await fluent_translate_text(
-            text=state.messages[0].content,
+        translated_text = await self._chunked(
+            fluent_translate_text,
+            state.messages[0].content,
+            on_delta,
+            cache_hits,
             native_language=self.native_language,
             target_language=self.target_language,
             is_native_language=state.is_native_language,
@@ -268,82 +469,148 @@ class AgentBuilder:
         )
         return {"out_fluent_translation": translated_text}
 
-    async def _text_fix_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None) -> Dict[str, Any]:
+    async def _text_fix_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None, on_delta: Callable[[str], None] = None, cache_hits: CacheHits = None) -> Dict[str, Any]:
         model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
         logger.info(f"[MODEL_INFO] text_fix_node: {model_info}")
-        fixed_text = await fix_text(
-            text=state.messages[0].content,
-            llm=llm
+        fixed_text = await self._chunked(
+            fix_text,
+            state.messages[0].content,
+            on_delta,
+            cache_hits,
+            llm=llm,
         )
         return {"out_fixed": fixed_text}
 
-    async def _text_summarization_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None) -> Dict[str, Any]:
+    async def _text_summarization_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None, on_delta: Callable[[str], None] = None, cache_hits: CacheHits = None) -> Dict[str, Any]:
         model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
         logger.info(f"[MODEL_INFO] text_summarization_node: {model_info}")
         tldr_text = await text_summarization(
             text=state.messages[0].content,
             native_language=self.native_language,
-            llm=llm
+            llm=llm,
+            on_delta=on_delta,
+            cache_hits=cache_hits,
         )
         return {"out_tldr": tldr_text}
 
-    async def _text_reformulation_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None) -> Dict[str, Any]:
+    async def _text_reformulation_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None, on_delta: Callable[[str], None] = None, cache_hits: CacheHits = None) -> Dict[str, Any]:
         model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
         logger.info(f"[MODEL_INFO] text_reformulation_node: {model_info}")
-        reformulated_text = await text_reformulation(
-            text=state.messages[0].content,
-            llm=llm
+        reformulated_text = await self._chunked(
+            text_reformulation,
+            state.messages[0].content,
+            on_delta,
+            cache_hits,
+            llm=llm,
         )
         return {"out_reformulation": reformulated_text}
 
-    async def _text_polish_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None) -> Dict[str, Any]:
+    async def _text_polish_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None, on_delta: Callable[[str], None] = None, cache_hits: CacheHits = None) -> Dict[str, Any]:
         model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
         logger.info(f"[MODEL_INFO] text_polish_node: {model_info}")
-        polished = await polish_text(
-            text=state.messages[0].content,
-            llm=llm
+        polished = await self._chunked(
+            polish_text,
+            state.messages[0].content,
+            on_delta,
+            cache_hits,
+            llm=llm,
         )
         return {"out_polished": polished}
 
-    async def _text_enrichment_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None) -> Dict[str, Any]:
+    async def _text_enrichment_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None, on_delta: Callable[[str], None] = None, cache_hits: CacheHits = None) -> Dict[str, Any]:
         model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
         logger.info(f"[MODEL_INFO] text_enrichment_node: {model_info}")
-        enriched_text = await text_enrichment(
-            text=state.messages[0].content,
-            llm=llm
+        enriched_text = await self._chunked(
+            text_enrichment,
+            state.messages[0].content,
+            on_delta,
+            cache_hits,
+            llm=llm,
         )
         return {"out_enrichment": enriched_text}
 
-    async def _emoji_generation_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None) -> Dict[str, Any]:
+    async def _emoji_generation_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None, on_delta: Callable[[str], None] = None, cache_hits: CacheHits = None) -> Dict[str, Any]:
         model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
         logger.info(f"[MODEL_INFO] emoji_generation_node: {model_info}")
         emoji_text = await generate_emoji(
             text=state.messages[0].content,
-            llm=llm
+            llm=llm,
+            on_delta=on_delta,
+            cache_hits=cache_hits,
         )
         return {"out_emoji": emoji_text}
 
+    async def _text_multi_output_node(self, state: AgentState, llm: ChatOpenAI, model_name: str = None, cache_hits: CacheHits = None) -> Dict[str, Any]:
+        model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
+        logger.info(f"[MODEL_INFO] text_multi_output_node: {model_info}")
+        routes = [route for route in self._get_fan_out_routes(state) if route in MULTI_OUTPUT_ROUTES]
+        fields = [MULTI_OUTPUT_ROUTES[route] for route in routes]
+
+        try:
+            outputs = await multi_output_transform(
+                text=state.messages[0].content,
+                fields=fields,
+                native_language=self.native_language,
+                target_language=self.target_language,
+                is_native_language=state.is_native_language,
+                query_language=state.query_language,
+                llm=llm,
+                cache_hits=cache_hits,
+            )
+        except Exception as e:
+            if is_provider_failure(e):
+                raise
+            logger.warning(f"Multi-output request failed, falling back to fan-out: {e}")
+            outputs = {}
+
+        result = {f"out_{field}": value for field, value in outputs.items()}
+        missing = [route for route in routes if MULTI_OUTPUT_ROUTES[route] not in outputs]
+        if missing:
+            logger.info(f"Multi-output fallback to fan-out for: {missing}")
+            fallbacks = await asyncio.gather(
+                *(getattr(self, NODE_REGISTRY[route].method)(state, llm, model_name, cache_hits=cache_hits) for route in missing),
+                return_exceptions=True,
+            )
+            for route, fallback in zip(missing, fallbacks):
+                if isinstance(fallback, Exception):
+                    logger.error(f"Fan-out fallback for {route} failed: {fallback}")
+                    continue
+                result.update(fallback)
+        return result
+
     async def _time_zone_conversion_node(
         self,
         state: AgentState,
         llm: ChatOpenAI,
-        model_name: str = None
+        model_name: str = None,
+        cache_hits: CacheHits = None,
     ) -> Dict[str, Any]:
         model_info = f"provider={self.provider}, model={model_name or 'unknown'}"
         logger.info(f"[MODEL_INFO] time_zone_conversion_node: {model_info}")
         conversion = await convert_time_zones(
             text=state.messages[0].content,
-            llm=llm
+            llm=llm,
+            cache_hits=cache_hits,
         )
         if not conversion:
             return {}
         return {"out_tz_conversion": conversion}
 
     async def _math_formula_calculation_node(self, state: AgentState) -> Dict[str, Any]:
+        expression = message_content_to_str(state.messages[0].content)
+        try:
+            return {"out_math_result": str(evaluate_expression(expression))}
+        except UnsupportedExpression:
+            logger.info("Input is not a plain expression, generating a script")
+        except Exception as e:
+            return {"out_math_result": f"Error evaluating expression: {e}"}
+
         math_formula_calculation_llm = self._get_single_llm(use_fast=False)
         logger.info(f"[MODEL_INFO] math_formula_calculation_node: {self._get_model_info(use_fast=False)}")
+        started = time.perf_counter()
         response = await math_formula_calculation_llm.ainvoke([SystemMessage(math_formula_calculation_prompt), state.messages[0]])
-        calculation_result = calculate_formula(message_content_to_str(response.content))
+        usage_ledger.record(self.base_model[0], getattr(response, "usage_metadata", None), time.perf_counter() - started)
+        calculation_result = await acalculate_formula(message_content_to_str(response.content))
         return {
             "out_math_result": str(calculation_result),
             "out_math_script": message_content_to_str(response.content)
@@ -358,12 +625,158 @@ class AgentBuilder:
             return "[o]"
         return ""
 
-    async def _run_agent_streaming(self, state: AgentState, cancellation_event: asyncio.Event = None):
+    def _llms_with_names(self) -> List[tuple]:
+        llms = self._get_llm(use_fast=False)
+        if not isinstance(llms, list):
+            return [(llms, self.base_model[0])]
+        return [
+            (llm, self.base_model[i] if i < len(self.base_model) else "unknown")
+            for i, llm in enumerate(llms)
+        ]
+
+    def _call_node(
+        self,
+        spec: NodeSpec,
+        state: AgentState,
+        llm: ChatOpenAI,
+        model_name: str,
+        on_delta: Callable[[str], None] = None,
+        cache_hits: CacheHits = None,
+    ):
+        method = getattr(self, spec.method)
+        if not spec.needs_llm:
+            return method(state)
+        if spec.streams:
+            return method(state, llm, model_name, on_delta, cache_hits=cache_hits)
+        return method(state, llm, model_name, cache_hits=cache_hits)
+
+    def _plan_jobs(self, state: AgentState, routes: List[str], emit: Callable[[Dict[str, Any]], None] = None) -> List[Job]:
+        llms = self._llms_with_names()
+        num_models = 1 if self.hedging else len(llms)
+        limiter = get_provider_limiter(self.provider)
+        content = message_content_to_str(state.messages[0].content)
+        planned = time.perf_counter()
+        jobs = []
+        for route in routes:
+            spec = NODE_REGISTRY[route]
+            hedge = self.hedging and spec.needs_llm
+            for llm, model_name in llms if spec.needs_llm and not self.hedging else llms[:1]:
+                metadata = {"model": model_name, "tag": self._get_tag_for_model(model_name, num_models)}
+                # A hedge to a different model would interleave two texts, so only same-model hedges stream
+                streams = spec.streams and (not hedge or self._hedge_backup(llms)[1] == model_name)
+                on_delta = None
+                if emit is not None and streams:
+                    def on_delta(text: str, output_key=spec.output_key[4:], metadata=metadata):
+                        emit({"output_key": output_key, "delta": text, "tag": metadata["tag"], "model": metadata["model"]})
+
+                async def execute(node_delta, spec=spec, llm=llm, model_name=model_name, hedge=hedge):
+                    if hedge:
+                        run_node = lambda: self._run_hedged(spec, state, llms, node_delta)
+                    else:
+                        async def run_node():
+                            call = lambda cache_hits: self._call_node(spec, state, llm, model_name, node_delta, cache_hits)
+                            return await _with_cache_hits(call), model_name
+                    slot = nullcontext() if limiter is None or spec.cost_class == "local" else limiter.slot(spec.priority)
+                    async with slot:
+                        # Time spent waiting on dependencies, the scheduler's caps and the provider limiter
+                        tracer.record_duration("node.queue", time.perf_counter() - planned, node=spec.name, provider=self.provider)
+                        result, model = await run_node()
+                    # Runs once per shared flight; local nodes and cache hits say nothing about the provider
+                    if spec.needs_llm and spec.cost_class != "local" and not result[1]:
+                        health_monitor.record_success(self.provider)
+                    return result, model
+
+                # Identical concurrent requests share one call per node and model
+                flight_key = (id(self), spec.name, model_name, hedge, content)
+
+                async def start(spec=spec, flight_key=flight_key, execute=execute, on_delta=on_delta, metadata=metadata):
+                    started = time.perf_counter()
+                    with tracer.span("node", node=spec.name, model=metadata["model"], provider=self.provider) as span, usage_ledger.node(spec.name):
+                        result, model = await node_flights.run(flight_key, execute, on_delta)
+                        span["model"] = model
+                        span["cached"] = result[1]
+                    _timing_data.append({"node": spec.name, "model": model, "time": time.perf_counter() - started})
+                    metadata["model"] = model
+                    return result
+
+                jobs.append(Job(spec, start, metadata))
+        return jobs
+
+    def _apply_token_budget(self, state: AgentState, routes: List[str]) -> List[str]:
+        """Drops low-priority nodes whose estimated tokens don't fit the remaining budget."""
+        text_tokens = estimate_tokens(message_content_to_str(state.messages[0].content))
+        models = 1 if self.hedging else len(self.base_model)
+        candidates = []
+        for route in routes:
+            spec = NODE_REGISTRY[route]
+            estimate = (PROMPT_OVERHEAD_TOKENS + 2 * text_tokens) * models if spec.needs_llm and spec.cost_class != "local" else 0
+            candidates.append((route, spec.priority, estimate))
+        dropped = usage_ledger.over_budget(candidates, protected_priority=USEFUL_PRIORITY)
+        return [route for route in routes if route not in dropped]
+
+    @staticmethod
+    def _hedge_backup(llms: List[tuple]) -> tuple:
+        """The backup for hedged requests: the second configured model, or the primary again."""
+        return llms[1] if len(llms) > 1 else llms[0]
+
+    async def _run_hedged(self, spec: NodeSpec, state: AgentState, llms: List[tuple], on_delta: Callable[[str], None] = None):
+        """Runs a node on the primary model, hedged with the backup; returns the result and the winning model."""
+        primary_llm, primary_model = llms[0]
+        backup_llm, backup_model = self._hedge_backup(llms)
+        result, from_backup = await hedged(
+            lambda: _with_cache_hits(lambda cache_hits: self._call_node(spec, state, primary_llm, primary_model, on_delta, cache_hits)),
+            lambda: _with_cache_hits(lambda cache_hits: self._call_node(spec, state, backup_llm, backup_model, cache_hits=cache_hits)),
+            primary_key=(self.provider, primary_model, spec.name),
+            backup_key=(self.provider, backup_model, spec.name),
+            is_cached=lambda result: result[1],
+        )
+        return result, backup_model if from_backup else primary_model
+
+    async def _run_nodes(self, state: AgentState, routes: List[str], stream_tokens: bool = False):
+        """Runs `routes` through the scheduler, yielding delta dicts and a Completion per node.
+
+        Completions whose node failed are logged, fed to the health monitor and skipped.
+        The time to the first non-empty high-priority result is recorded in `ttfur_slo`.
+        """
+        scheduler = DagScheduler(
+            max_concurrency=self.max_concurrency,
+            hold_back_above=USEFUL_PRIORITY if self.hold_back_low_priority else None,
+        )
+        jobs = self._plan_jobs(state, routes, scheduler.emit if stream_tokens else None)
+        started = time.perf_counter()
+        first_useful = True
+        async with aclosing(scheduler.run(jobs)) as events:
+            async for event in events:
+                if not isinstance(event, Completion):
+                    yield event
+                    continue
+                if event.error is not None:
+                    logger.error(f"Task {event.job.spec.name} failed: {event.error}", exc_info=event.error)
+                    if is_provider_failure(event.error):
+                        health_monitor.record_failure(self.provider)
+                    continue
+                if first_useful and event.job.spec.priority <= USEFUL_PRIORITY and any(event.result[0].values()):
+                    first_useful = False
+                    ttfur_slo.record(self.provider, time.perf_counter() - started)
+                yield event
+
+    async def _run_agent_streaming(
+        self,
+        state: AgentState,
+        cancellation_event: asyncio.Event = None,
+        stream_tokens: bool = False,
+        node_filter: Callable[[NodeSpec], bool] = None,
+    ):
+        """Routes the request and yields node results (and deltas) as they arrive.
+
+        `node_filter`, if given, restricts the run to the routed nodes it accepts.
+        """
         if cancellation_event and cancellation_event.is_set():
             logger.info("Request cancelled before routing")
             return
 
-        result = await self._task_router_node(state)
+        with tracer.span("router", provider=self.provider):
+            result = await self._task_router_node(state)
         state.update(result)
 
         if cancellation_event and cancellation_event.is_set():
@@ -379,174 +792,53 @@ class AgentBuilder:
             }
 
         routes = self._get_routes(state)
-        llms = self._get_llm(use_fast=False)
-        model_names = self.base_model
-
-        if not isinstance(llms, list):
-            llms = [llms]
-            model_names = [model_names[0]] if isinstance(model_names, list) else [model_names]
-
-        num_models = len(llms)
-        tasks_list = []
-        metadata_list = []
+        if node_filter is not None:
+            routes = [route for route in routes if node_filter(NODE_REGISTRY[route])]
+        routes = self._apply_token_budget(state, routes)
 
-        for route in routes:
-            for i, llm in enumerate(llms):
-                model_name = model_names[i] if i < len(model_names) else "unknown"
-                task = None
-
-                if route == "text_fluent_translation_node":
-                    task = asyncio.create_task(self._text_fluent_translation_node(state, llm, model_name))
-                    metadata = {"route": route, "model": model_name, "output_key": "out_fluent_translation"}
-                elif route == "text_fix_node":
-                    task = asyncio.create_task(self._text_fix_node(state, llm, model_name))
-                    metadata = {"route": route, "model": model_name, "output_key": "out_fixed"}
-                elif route == "text_summarization_node":
-                    task = asyncio.create_task(self._text_summarization_node(state, llm, model_name))
-                    metadata = {"route": route, "model": model_name, "output_key": "out_tldr"}
-                elif route == "text_reformulation_node":
-                    task = asyncio.create_task(self._text_reformulation_node(state, llm, model_name))
-                    metadata = {"route": route, "model": model_name, "output_key": "out_reformulation"}
-                elif route == "text_polish_node":
-                    task = asyncio.create_task(self._text_polish_node(state, llm, model_name))
-                    metadata = {"route": route, "model": model_name, "output_key": "out_polished"}
-                elif route == "text_enrichment_node":
-                    task = asyncio.create_task(self._text_enrichment_node(state, llm, model_name))
-                    metadata = {"route": route, "model": model_name, "output_key": "out_enrichment"}
-                elif route == "emoji_generation_node":
-                    task = asyncio.create_task(self._emoji_generation_node(state, llm, model_name))
-                    metadata = {"route": route, "model": model_name, "output_key": "out_emoji"}
-                elif route == "time_zone_conversion_node":
-                    task = asyncio.create_task(self._time_zone_conversion_node(state, llm, model_name))
-                    metadata = {"route": route, "model": model_name, "output_key": "out_tz_conversion"}
-                elif route == "math_formula_calculation_node":
-                    task = asyncio.create_task(self._math_formula_calculation_node(state))
-                    metadata = {"route": route, "model": model_name, "output_key": "out_math_result"}
-
-                if task:
-                    tasks_list.append(task)
-                    metadata_list.append(metadata)
-
-        if tasks_list:
-            pending = set(tasks_list)
-            while pending:
+        async with aclosing(self._run_nodes(state, routes, stream_tokens)) as events:
+            async for event in events:
                 if cancellation_event and cancellation_event.is_set():
                     logger.info("Request cancelled during task processing, cancelling all pending tasks")
-                    for task in pending:
-                        task.cancel()
                     return
+                if not isinstance(event, Completion):
+                    yield event
+                    continue
 
-                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
-
-                for completed_task in done:
-                    if cancellation_event and cancellation_event.is_set():
-                        logger.info("Request cancelled, stopping result processing")
-                        for task in pending:
-                            task.cancel()
-                        return
-
-                    try:
-                        result = await completed_task
-                        task_index = tasks_list.index(completed_task)
-                        metadata = metadata_list[task_index]
-
-                        output_key = metadata["output_key"]
-                        model_name = metadata["model"]
-                        tag = self._get_tag_for_model(model_name, num_models)
-
-                        for key, value in result.items():
-                            if key.startswith("out_"):
-                                yield {
-                                    "output_key": key[4:],
-                                    "value": value,
-                                    "tag": tag,
-                                    "model": model_name
-                                }
-                    except asyncio.CancelledError:
-                        logger.info("Task was cancelled")
-                        continue
-                    except Exception as e:
-                        logger.error(f"Task failed: {e}", exc_info=True)
-                        continue
+                result, cached = event.result
+                for key, value in result.items():
+                    if key.startswith("out_"):
+                        yield {
+                            "output_key": key[4:],
+                            "value": value,
+                            "tag": event.job.metadata["tag"],
+                            "model": event.job.metadata["model"],
+                            "cached": cached
+                        }
 
     async def _run_agent(self, state: AgentState):
-        result = await self._task_router_node(state)
+        with tracer.span("router", provider=self.provider):
+            result = await self._task_router_node(state)
         state.update(result)
 
-        routes = self._get_routes(state)
-        llms = self._get_llm(use_fast=False)
-        model_names = self.base_model
-
-        if not isinstance(llms, list):
-            llms = [llms]
-            model_names = [model_names[0]] if isinstance(model_names, list) else [model_names]
-
-        num_models = len(llms)
-        tasks = []
-        task_metadata = []
-
-        for route in routes:
-            for i, llm in enumerate(llms):
-                model_name = model_names[i] if i < len(model_names) else "unknown"
-
-                if route == "text_fluent_translation_node":
-                    tasks.append(self._text_fluent_translation_node(state, llm, model_name))
-                    task_metadata.append({"route": route, "model": model_name, "output_key": "out_fluent_translation"})
-                elif route == "text_fix_node":
-                    tasks.append(self._text_fix_node(state, llm, model_name))
-                    task_metadata.append({"route": route, "model": model_name, "output_key": "out_fixed"})
-                elif route == "text_summarization_node":
-                    tasks.append(self._text_summarization_node(state, llm, model_name))
-                    task_metadata.append({"route": route, "model": model_name, "output_key": "out_tldr"})
-                elif route == "text_reformulation_node":
-                    tasks.append(self._text_reformulation_node(state, llm, model_name))
-                    task_metadata.append({"route": route, "model": model_name, "output_key": "out_reformulation"})
-                elif route == "text_polish_node":
-                    tasks.append(self._text_polish_node(state, llm, model_name))
-                    task_metadata.append({"route": route, "model": model_name, "output_key": "out_polished"})
-                elif route == "text_enrichment_node":
-                    tasks.append(self._text_enrichment_node(state, llm, model_name))
-                    task_metadata.append({"route": route, "model": model_name, "output_key": "out_enrichment"})
-                elif route == "emoji_generation_node":
-                    tasks.append(self._emoji_generation_node(state, llm, model_name))
-                    task_metadata.append({"route": route, "model": model_name, "output_key": "out_emoji"})
-                elif route == "time_zone_conversion_node":
-                    tasks.append(self._time_zone_conversion_node(state, llm, model_name))
-                    task_metadata.append({"route": route, "model": model_name, "output_key": "out_tz_conversion"})
-                elif route == "math_formula_calculation_node":
-                    tasks.append(self._math_formula_calculation_node(state))
-                    task_metadata.append({"route": route, "model": model_name, "output_key": "out_math_result"})
-
-        if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            aggregated = {}
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"Task failed: {result}")
-                    continue
-                
-                metadata = task_metadata[i]
-                output_key = metadata["output_key"]
-                model_name = metadata["model"]
-                tag = self._get_tag_for_model(model_name, num_models)
-                
-                if output_key not in aggregated:
-                    aggregated[output_key] = []
-                
+        aggregated = {}
+        routes = self._apply_token_budget(state, self._get_routes(state))
+        async with aclosing(self._run_nodes(state, routes)) as events:
+            async for event in events:
+                result, _ = event.result
                 for key, value in result.items():
                     if key.startswith("out_"):
-                        aggregated[output_key].append({
+                        aggregated.setdefault(key, []).append({
                             "value": value,
-                            "tag": tag,
-                            "model": model_name
+                            "tag": event.job.metadata["tag"],
+                            "model": event.job.metadata["model"]
                         })
-            
-            for output_key, items in aggregated.items():
-                if len(items) > 1:
-                    state.update({output_key: items})
-                elif len(items) == 1:
-                    state.update({output_key: items[0]["value"]})
+
+        for output_key, items in aggregated.items():
+            if len(items) > 1:
+                state.update({output_key: items})
+            elif len(items) == 1:
+                state.update({output_key: items[0]["value"]})
 
     def build(self) -> Agent:
         return Agent(self)
@@ -1,14 +1,31 @@
+import os
 from typing import Literal, Optional
 
+# "fan_out" sends one request per text transform, "multi_output" asks for all of them
+# in a single structured request and falls back to fan-out per missing field.
+EXECUTION_MODE = os.getenv("HERMIONE_EXECUTION_MODE", "fan_out")
+# Cap on nodes running at once for one request (empty for no cap), and whether
+# low-priority nodes wait for the first high-priority result before starting.
+MAX_NODE_CONCURRENCY = int(os.getenv("HERMIONE_MAX_NODE_CONCURRENCY", "0")) or None
+HOLD_BACK_LOW_PRIORITY = os.getenv("HERMIONE_HOLD_BACK_LOW_PRIORITY", "0") == "1"
+HEDGING = os.getenv("HERMIONE_HEDGING", "0") == "1"
 
 MODEL_CONFIGS = {
     "openai": {
         "base_model": "gpt-5.6-sol",
         "thinking_budget": None,
+        "execution_mode": EXECUTION_MODE,
+        "max_concurrency": MAX_NODE_CONCURRENCY,
+        "hold_back_low_priority": HOLD_BACK_LOW_PRIORITY,
+        "hedging": HEDGING,
     },
     "litellm": {
         "base_model": "gemini-3-flash-preview",
         "thinking_budget": None,
+        "execution_mode": EXECUTION_MODE,
+        "max_concurrency": MAX_NODE_CONCURRENCY,
+        "hold_back_low_priority": HOLD_BACK_LOW_PRIORITY,
+        "hedging": HEDGING,
     }
 }
 
@@ -1,6 +1,6 @@
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Dict, Any, Optional, Literal
 import uvicorn
@@ -11,17 +11,29 @@ import sys
 # Load environment variables from .env file in the root directory
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 
-from agent import AgentBuilder
+from agent import AgentBuilder, get_route_skip_counts
 from agent_config import get_agent_config
+from src.provider_health import health_monitor
+from src.llm_providers import get_async_http_client, warm_up_clients, aclose_clients
+from src.streaming import cancel_on, merge_streams
+from src.scheduler import provider_limits_snapshot, ttfur_slo
+from src.hedging import latency_tracker
+from src.single_flight import node_flights
+from src.tracing import tracer
+from src.prefetch import is_prefetchable, prefetch_key, prefetch_store, replay_then_complete
+from src.tools.function_calculator import sandbox_pool
+from src.tools.prompts import prompt_cache_stats
+from src.usage import usage_ledger
+from src.logging_setup import configure_logging
 import json
 from langchain_core.messages import HumanMessage
 import logging
+import multiprocessing
 import time
 from datetime import datetime
 import signal
 import asyncio
-import httpx
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, aclosing
 
 # Determine if we're in development mode
 IS_DEV = os.getenv('NODE_ENV') == 'development'
@@ -37,15 +49,9 @@ if not logs_dir:
         print(f"Failed to create logs directory: {e}")
         logs_dir = os.path.dirname(__file__)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(os.path.join(logs_dir, 'api.log'), mode='a')
-    ]
-)
+# Configure logging. Sandbox workers re-import this module; only the server process owns the log files.
+if multiprocessing.parent_process() is None:
+    configure_logging(logs_dir)
 logger = logging.getLogger(__name__)
 
 # Log startup information
@@ -60,11 +66,17 @@ shutdown_event = asyncio.Event()
 # Global agent variable
 agent = None
 
-# Global dictionary to track active requests
+# Agents are built once per provider; their LLM clients come from the shared registry
+agent_instances = {}
+
+# Active request per client session: session_id -> (request_id, cancellation event)
 active_requests = {}
 request_counter = 0
 requests_lock = asyncio.Lock()
 
+DEFAULT_SESSION = "default"
+DISCONNECT_POLL_INTERVAL = 0.5
+
 # Get environment variables
 DEFAULT_PORT = 8123
 PORT = int(os.getenv('API_PORT', str(DEFAULT_PORT)))
@@ -94,6 +106,15 @@ async def lifespan(app: FastAPI):
         agent = AgentBuilder().build()
         logger.info("Agent initialized successfully")
 
+        health_monitor.register_probe("litellm", check_litellm_availability)
+        health_monitor.start()
+
+        warm_up_providers = ["openai"]
+        if os.environ.get("LITELLM_API_KEY"):
+            warm_up_providers.append("litellm")
+        asyncio.create_task(warm_up_clients(warm_up_providers))
+        asyncio.create_task(asyncio.to_thread(sandbox_pool.start))
+
         yield
 
     except Exception as e:
@@ -102,6 +123,10 @@ async def lifespan(app: FastAPI):
     finally:
         # Shutdown
         logger.info("Shutting down API server")
+        await health_monitor.stop()
+        prefetch_store.clear()
+        await aclose_clients()
+        sandbox_pool.shutdown()
         await shutdown()
 
 async def shutdown():
@@ -139,7 +164,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class SimpleRequest(BaseModel):
+class PrefetchRequest(BaseModel):
     content: str
     provider_mode: Literal["openai_only", "litellm_only", "both"] = "litellm_only"
 
@@ -150,9 +175,13 @@ class SimpleRequest(BaseModel):
             raise ValueError("content must contain non-whitespace text")
         return content
 
+class SimpleRequest(PrefetchRequest):
+    session_id: Optional[str] = None
+    stream_tokens: bool = False
+
 
 async def check_litellm_availability() -> bool:
-    """Check if LiteLLM API is available."""
+    """Probe LiteLLM with a minimal completion. Only run by the health monitor while its circuit is open."""
     try:
         litellm_host = os.getenv("LITELLM_HOST", "https://api.litellm.ai")
         api_key = os.environ.get("LITELLM_API_KEY")
@@ -161,59 +190,74 @@ async def check_litellm_availability() -> bool:
             logger.warning("LITELLM_API_KEY not set, LiteLLM unavailable")
             return False
 
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            # Simple health check if possible, or minimal model check
-            # Assuming /health or root endpoint exists, otherwise fallback to models list
-            try:
-                # Try a lighter endpoint first if available, else stick to existing check but faster timeout
-                headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-                test_payload = {
-                    "model": "gemini-3-flash-preview",
-                    "messages": [{"role": "user", "content": "hi"}],
-                    "max_tokens": 1
-                }
-                response = await client.post(f"{litellm_host}/chat/completions", headers=headers, json=test_payload)
-                is_available = 200 <= response.status_code < 300
-                if not is_available:
-                    logger.warning(f"LiteLLM availability check failed with status {response.status_code}")
-                else:
-                    logger.info("LiteLLM is available")
-                return is_available
-            except:
-                return False
+        client = get_async_http_client(litellm_host)
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        test_payload = {
+            "model": "gemini-3-flash-preview",
+            "messages": [{"role": "user", "content": "hi"}],
+            "max_tokens": 1
+        }
+        response = await client.post(f"{litellm_host}/chat/completions", headers=headers, json=test_payload, timeout=2.0)
+        is_available = 200 <= response.status_code < 300
+        if not is_available:
+            logger.warning(f"LiteLLM availability check failed with status {response.status_code}")
+        else:
+            logger.info("LiteLLM is available")
+        return is_available
     except Exception as e:
         logger.warning(f"LiteLLM availability check failed: {str(e)}")
         return False
 
-async def get_providers_to_run(provider_mode: str) -> list[str]:
-    """Get list of providers based on provider_mode setting and availability."""
+def is_litellm_available() -> bool:
+    if not os.environ.get("LITELLM_API_KEY"):
+        return False
+    return health_monitor.is_available("litellm")
+
+def get_providers_to_run(provider_mode: str) -> list[str]:
+    """Get list of providers based on provider_mode setting and the cached LiteLLM health."""
     providers = []
 
     if provider_mode == "openai_only":
         providers.append("openai")
     elif provider_mode == "litellm_only":
-        if await check_litellm_availability():
+        if is_litellm_available():
             providers.append("litellm")
         else:
             logger.warning("LiteLLM unavailable, falling back to OpenAI")
             providers.append("openai")
     elif provider_mode == "both":
         providers.append("openai")
-        if await check_litellm_availability():
+        if is_litellm_available():
             providers.append("litellm")
         else:
             logger.warning("LiteLLM unavailable, using OpenAI only")
 
     return providers
 
-async def run_agent_streaming(provider: str, human_message: HumanMessage, cancellation_event: asyncio.Event):
+def get_agent_instance(provider: str):
+    if provider not in agent_instances:
+        config = get_agent_config(provider=provider)
+        agent_instances[provider] = AgentBuilder(provider=provider, **config).build()
+    return agent_instances[provider]
+
+async def run_agent_streaming(
+    provider: str,
+    human_message: HumanMessage,
+    cancellation_event: asyncio.Event,
+    stream_tokens: bool = False,
+    node_filter=None,
+):
     """Run an agent with streaming results as they complete."""
     try:
         logger.info(f"Running streaming agent with provider: {provider}")
-        config = get_agent_config(provider=provider)
-        agent_instance = AgentBuilder(provider=provider, **config).build()
-
-        async for result in agent_instance.ainvoke_streaming({"messages": [human_message]}, cancellation_event=cancellation_event):
+        agent_instance = get_agent_instance(provider)
+
+        async for result in agent_instance.ainvoke_streaming(
+            {"messages": [human_message]},
+            cancellation_event=cancellation_event,
+            stream_tokens=stream_tokens,
+            node_filter=node_filter,
+        ):
             if cancellation_event.is_set():
                 logger.info(f"Request cancelled for provider {provider}")
                 break
@@ -222,66 +266,158 @@ async def run_agent_streaming(provider: str, human_message: HumanMessage, cancel
             if output_key.startswith("out_"):
                 output_key = output_key[4:]
 
+            if "delta" in result:
+                yield {
+                    "provider": provider,
+                    "output_key": output_key,
+                    "delta": result["delta"],
+                    "tag": result["tag"],
+                    "model": result["model"]
+                }
+                continue
+
             yield {
                 "provider": provider,
                 "output_key": output_key,
                 "value": result["value"],
                 "tag": result["tag"],
-                "model": result["model"]
+                "model": result["model"],
+                "cached": result.get("cached", False)
             }
     except asyncio.CancelledError:
         logger.info(f"Request cancelled for provider {provider}")
         raise
     except Exception as e:
         logger.error(f"Error running streaming agent with provider {provider}: {str(e)}", exc_info=True)
+        health_monitor.record_failure(provider)
         if provider == "litellm":
             logger.warning(f"LiteLLM provider failed, continuing without it")
         else:
             raise
 
+async def run_prefetch(provider: str, content: str):
+    """The speculative part of a run: only prefetchable nodes, always with token deltas."""
+    async for result in run_agent_streaming(
+        provider, HumanMessage(content=content), asyncio.Event(), stream_tokens=True, node_filter=is_prefetchable
+    ):
+        if result["output_key"] != "existent":
+            yield result
+
+async def replay_prefetch(entry, stream_tokens: bool):
+    """Results of a prefetched run, skipping deltas of nodes that had already finished."""
+    finished = {(event["output_key"], event["model"]) for event in entry.events if "value" in event}
+    async for result in prefetch_store.attach(entry):
+        if "delta" in result and (not stream_tokens or (result["output_key"], result["model"]) in finished):
+            continue
+        yield result
+
+async def watch_disconnect(http_request: Request, cancellation_event: asyncio.Event, request_id: int):
+    """Cancel the request as soon as its client goes away."""
+    while not cancellation_event.is_set():
+        if await http_request.is_disconnected():
+            logger.info(f"Client of request {request_id} disconnected, cancelling it")
+            cancellation_event.set()
+            return
+        try:
+            await asyncio.wait_for(cancellation_event.wait(), timeout=DISCONNECT_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
 @app.post("/runs/stream")
-async def run_stream(request: SimpleRequest):
+async def run_stream(request: SimpleRequest, http_request: Request):
     """
     Process a user message and stream results as they become available.
     Now streams individual model results as they complete.
+
+    A new request cancels the previous one of the same session only. Cancellation,
+    by a newer request or by the client disconnecting, stops every node at once.
     """
     global request_counter
+    session_id = request.session_id or DEFAULT_SESSION
 
     async with requests_lock:
         current_request_id = request_counter
         request_counter += 1
 
-        for request_id, event in list(active_requests.items()):
-            logger.info(f"Cancelling previous request {request_id}")
-            event.set()
-
-        active_requests.clear()
+        previous = active_requests.get(session_id)
+        if previous:
+            logger.info(f"Cancelling previous request {previous[0]} of session {session_id}")
+            previous[1].set()
 
         cancellation_event = asyncio.Event()
-        active_requests[current_request_id] = cancellation_event
+        active_requests[session_id] = (current_request_id, cancellation_event)
 
-    logger.info(f"Starting new request {current_request_id}")
+    logger.info(f"Starting new request {current_request_id} for session {session_id}")
 
     async def generate():
-        try:
-            logger.info(f"Processing streaming request {current_request_id} with content: {request.content[:100]}... provider_mode: {request.provider_mode}")
-            user_message = request.content
-            human_message = HumanMessage(content=user_message)
-
-            providers_to_run = await get_providers_to_run(request.provider_mode)
-            accumulated_output = {}
+        disconnect_watcher = asyncio.create_task(watch_disconnect(http_request, cancellation_event, current_request_id))
+        serialization = {"seconds": 0.0, "chunks": 0}
 
-            for provider in providers_to_run:
-                if cancellation_event.is_set():
-                    logger.info(f"Request {current_request_id} cancelled before provider {provider}")
-                    break
+        def sse(payload) -> str:
+            started = time.perf_counter()
+            text = f"data: {json.dumps(payload)}\n\n"
+            serialization["seconds"] += time.perf_counter() - started
+            serialization["chunks"] += 1
+            return text
 
-                try:
-                    async for result in run_agent_streaming(provider, human_message, cancellation_event):
+        with tracer.span("request", request_id=current_request_id, provider_mode=request.provider_mode):
+            try:
+                logger.info(f"Processing streaming request {current_request_id} with content: {request.content[:100]}... provider_mode: {request.provider_mode}")
+                request_usage = usage_ledger.start_request()
+                user_message = request.content
+                human_message = HumanMessage(content=user_message)
+
+                providers_to_run = get_providers_to_run(request.provider_mode)
+                accumulated_output = {}
+
+                async def provider_stream(provider: str):
+                    entry = prefetch_store.get(prefetch_key(user_message, provider))
+                    if entry is None:
+                        stream = run_agent_streaming(provider, human_message, cancellation_event, request.stream_tokens)
+                    else:
+                        logger.info(f"Request {current_request_id} attaches to prefetched results for {provider}")
+                        stream = merge_streams(
+                            replay_then_complete(
+                                replay_prefetch(entry, request.stream_tokens),
+                                lambda node_filter: run_agent_streaming(
+                                    provider, human_message, cancellation_event, request.stream_tokens,
+                                    node_filter=node_filter,
+                                ),
+                            ),
+                            run_agent_streaming(
+                                provider, human_message, cancellation_event, request.stream_tokens,
+                                node_filter=lambda spec: not is_prefetchable(spec),
+                            ),
+                        )
+                    try:
+                        async with aclosing(stream) as results:
+                            async for result in results:
+                                yield result
+                    except Exception as e:
+                        logger.error(f"Error streaming from provider {provider}: {e}", exc_info=True)
+                        if provider != "litellm":
+                            raise
+
+                streams = [provider_stream(provider) for provider in providers_to_run]
+                async with aclosing(cancel_on(cancellation_event, merge_streams(*streams))) as merged:
+                    async for result in merged:
                         if cancellation_event.is_set():
                             logger.info(f"Request {current_request_id} cancelled during streaming")
                             break
 
+                        if "delta" in result:
+                            delta_chunk = {
+                                "event": "delta",
+                                "output_key": result["output_key"],
+                                "delta": result["delta"],
+                                "tag": result["tag"],
+                                "model": result["model"],
+                                "provider": result["provider"],
+                                "all_complete": False,
+                            }
+                            yield sse(delta_chunk)
+                            continue
+
                         output_key = result["output_key"]
                         value = result["value"]
                         tag = result["tag"]
@@ -301,41 +437,98 @@ async def run_stream(request: SimpleRequest):
                             "value": value,
                             "tag": tag,
                             "model": model,
-                            "provider": provider,
+                            "provider": result["provider"],
+                            "cached": result["cached"],
                             "all_complete": False,
                         }
-                        yield f"data: {json.dumps(response_chunk)}\n\n"
-
-                except Exception as e:
-                    logger.error(f"Error streaming from provider {provider}: {e}", exc_info=True)
-                    if provider != "litellm":
-                        raise
-
-            if not cancellation_event.is_set():
-                final_response = {
-                    "output": accumulated_output,
-                    "all_complete": True
-                }
-                yield f"data: {json.dumps(final_response)}\n\n"
-
-        except asyncio.CancelledError:
-            logger.info(f"Request {current_request_id} was cancelled")
-        except Exception as e:
-            logger.error(f"Error in stream for request {current_request_id}: {str(e)}", exc_info=True)
-            error_response = {"error": str(e)}
-            yield f"data: {json.dumps(error_response)}\n\n"
-        finally:
-            async with requests_lock:
-                if current_request_id in active_requests:
-                    del active_requests[current_request_id]
-                    logger.info(f"Cleaned up request {current_request_id}")
+                        yield sse(response_chunk)
+
+                if not cancellation_event.is_set():
+                    summary = request_usage.summary()
+                    logger.info(f"Request {current_request_id} usage: {summary['total']}")
+                    yield sse({"event": "usage", "usage": summary, "all_complete": False})
+
+                    final_response = {
+                        "output": accumulated_output,
+                        "all_complete": True
+                    }
+                    yield sse(final_response)
+
+            except asyncio.CancelledError:
+                logger.info(f"Request {current_request_id} was cancelled")
+            except Exception as e:
+                logger.error(f"Error in stream for request {current_request_id}: {str(e)}", exc_info=True)
+                error_response = {"error": str(e)}
+                yield sse(error_response)
+            finally:
+                tracer.record_duration("serialize", serialization["seconds"], chunks=serialization["chunks"])
+                cancellation_event.set()
+                disconnect_watcher.cancel()
+                async with requests_lock:
+                    if active_requests.get(session_id, (None,))[0] == current_request_id:
+                        del active_requests[session_id]
+                        logger.info(f"Cleaned up request {current_request_id}")
 
     return StreamingResponse(generate(), media_type="text/event-stream")
 
+@app.post("/runs/prefetch")
+async def run_prefetch_endpoint(request: PrefetchRequest):
+    """
+    Start the cheap, high-priority nodes for text the user is likely to ask about next
+    (e.g. what they just copied). A later /runs/stream with the same content attaches to
+    this work instead of starting over. Speculative runs expire and are dropped first
+    under memory pressure.
+    """
+    started = []
+    for provider in get_providers_to_run(request.provider_mode):
+        key = prefetch_key(request.content, provider)
+        if prefetch_store.start(key, lambda provider=provider: run_prefetch(provider, request.content), size=len(request.content)):
+            started.append(provider)
+    if started:
+        logger.info(f"Prefetching {len(request.content)} characters for {started}")
+    return {"started": started}
+
+@app.get("/debug/prefetch")
+async def prefetch_stats():
+    return prefetch_store.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(tracer.prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/traces")
+async def traces(limit: int = 20):
+    return tracer.traces(limit)
+
+@app.get("/stats")
+async def stats():
+    return usage_ledger.stats()
+
+@app.get("/debug/prompt-cache")
+async def prompt_cache():
+    return prompt_cache_stats.stats()
+
 @app.get("/")
 async def root():
     return {"status": "ok"}
 
+@app.get("/health/providers")
+async def provider_health():
+    return health_monitor.snapshot()
+
+@app.get("/debug/route-skips")
+async def route_skips():
+    return get_route_skip_counts()
+
+@app.get("/debug/slo")
+async def slo():
+    return {
+        "time_to_first_useful_result": ttfur_slo.snapshot(),
+        "provider_concurrency": provider_limits_snapshot(),
+        "hedging": latency_tracker.stats(),
+        "single_flight": node_flights.stats(),
+    }
+
 if __name__ == "__main__":
     try:
         logger.info("Starting Hermione Agent API server")
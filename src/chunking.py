@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from src.response_cache import CacheHits, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Texts shorter than this go to the model in one piece, unless most of their text was seen before
+CHUNK_MIN_CHARS = int(os.getenv("HERMIONE_CHUNK_MIN_CHARS", "4000"))
+CHUNK_TARGET_CHARS = int(os.getenv("HERMIONE_CHUNK_TARGET_CHARS", "1500"))
+# Chunks of one node in flight at once
+CHUNK_CONCURRENCY = int(os.getenv("HERMIONE_CHUNK_CONCURRENCY", "4"))
+PARAGRAPH_MEMO_ENTRIES = int(os.getenv("HERMIONE_PARAGRAPH_MEMO_ENTRIES", "4096"))
+
+_PARAGRAPH_BREAK_RE = re.compile(r"[ \t]*\n\s*\n\s*")
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?…])\s+")
+
+# Highlight markup (see llm_tools._apply_diff_highlights) that must not be cut in half
+_MARKUP_PAIRS = (("<b>", "</b>"), ("<span", "</span>"))
+
+Delta = Callable[[str], None]
+Transform = Callable[[str, Optional[Delta]], Awaitable[str]]
+MemoKey = Callable[[str], str]
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A piece of the input sent to the model, and the whitespace that followed it."""
+    text: str
+    separator: str
+
+
+def _split_with_separators(text: str, pattern: re.Pattern) -> List[Tuple[str, str]]:
+    pieces = []
+    position = 0
+    for match in pattern.finditer(text):
+        if match.start() > position:
+            pieces.append((text[position:match.start()], match.group()))
+            position = match.end()
+    tail = text[position:]
+    stripped = tail.rstrip()
+    if stripped:
+        pieces.append((stripped, tail[len(stripped):]))
+    elif pieces:
+        text_part, separator = pieces[-1]
+        pieces[-1] = (text_part, separator + tail)
+    return pieces
+
+
+def split_paragraphs(text: str, target_chars: int = CHUNK_TARGET_CHARS) -> Tuple[str, List[Chunk]]:
+    """Splits `text` into paragraphs, and paragraphs longer than `target_chars` into sentences.
+
+    Returns:
+        The text's leading whitespace and the pieces, each with the whitespace after it.
+    """
+    body = text.lstrip()
+    leading = text[:len(text) - len(body)]
+
+    units = []
+    for paragraph, separator in _split_with_separators(body, _PARAGRAPH_BREAK_RE):
+        if len(paragraph) <= target_chars:
+            units.append(Chunk(paragraph, separator))
+            continue
+        sentences = [Chunk(*sentence) for sentence in _split_with_separators(paragraph, _SENTENCE_BREAK_RE)]
+        sentences[-1] = Chunk(sentences[-1].text, sentences[-1].separator + separator)
+        units.extend(sentences)
+    return leading, units
+
+
+def _pack(units: List[Chunk], target_chars: int, alone: Set[int] = frozenset()) -> List[Chunk]:
+    """Merges consecutive units into chunks of up to `target_chars`; units in `alone` stay single."""
+    chunks = []
+    current, current_separator = "", ""
+    for index, unit in enumerate(units):
+        if current and (
+            index in alone or index - 1 in alone
+            or len(current) + len(current_separator) + len(unit.text) > target_chars
+        ):
+            chunks.append(Chunk(current, current_separator))
+            current, current_separator = "", ""
+        current = current + current_separator + unit.text if current else unit.text
+        current_separator = unit.separator
+    if current:
+        chunks.append(Chunk(current, current_separator))
+    return chunks
+
+
+def split_text(text: str, target_chars: int = CHUNK_TARGET_CHARS) -> Tuple[str, List[Chunk]]:
+    """Splits `text` into chunks of about `target_chars`, at paragraph breaks where possible.
+
+    Paragraphs longer than the target are split between sentences. Whitespace between
+    chunks is kept out of them, so formatting survives whatever the model does to a
+    chunk's edges.
+
+    Returns:
+        The text's leading whitespace and its chunks; `join_chunks(leading, chunks,
+        [chunk.text for chunk in chunks])` gives back `text` exactly.
+    """
+    leading, units = split_paragraphs(text, target_chars)
+    return leading, _pack(units, target_chars)
+
+
+def join_chunks(leading: str, chunks: List[Chunk], outputs: List[str]) -> str:
+    return leading + "".join(output + chunk.separator for chunk, output in zip(chunks, outputs))
+
+
+async def map_chunks(
+    chunks: List[Chunk],
+    transform: Transform,
+    on_delta: Optional[Delta] = None,
+    concurrency: int = CHUNK_CONCURRENCY,
+) -> List[str]:
+    """Runs `transform(chunk_text, on_chunk_delta)` on every chunk, at most `concurrency` at once.
+
+    Streamed deltas reach `on_delta` in document order: the earliest unfinished chunk
+    streams live, later chunks are buffered and flushed once every chunk before them has
+    finished. A chunk that finished without streaming (e.g. a cache hit) is sent whole.
+    If any chunk fails, the others are cancelled and the error is raised.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    buffers: List[List[str]] = [[] for _ in chunks]
+    results: List[Optional[str]] = [None] * len(chunks)
+    cursor = 0
+
+    def chunk_delta(index: int) -> Delta:
+        def delta(text: str):
+            if index == cursor:
+                on_delta(text)
+            buffers[index].append(text)
+        return delta
+
+    def advance():
+        nonlocal cursor
+        while cursor < len(chunks) and results[cursor] is not None:
+            if not buffers[cursor]:
+                on_delta(results[cursor])
+            if chunks[cursor].separator:
+                on_delta(chunks[cursor].separator)
+            cursor += 1
+            if cursor < len(chunks):
+                for text in buffers[cursor]:
+                    on_delta(text)
+
+    async def run(index: int) -> str:
+        async with semaphore:
+            result = await transform(chunks[index].text, chunk_delta(index) if on_delta else None)
+        results[index] = result
+        if on_delta is not None:
+            advance()
+        return result
+
+    tasks = [asyncio.create_task(run(index)) for index in range(len(chunks))]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Outputs of single paragraphs, so an edited text only sends its changed paragraphs again
+paragraph_memo = ResponseCache(max_entries=PARAGRAPH_MEMO_ENTRIES)
+
+
+def _balanced(text: str) -> bool:
+    return all(text.count(opening) == text.count(closing) for opening, closing in _MARKUP_PAIRS)
+
+
+def remember_paragraphs(memo: ResponseCache, memo_key: MemoKey, text: str, output: str):
+    """Stores the output of each paragraph of `text`, if `output` has the same paragraphs."""
+    paragraphs = _split_with_separators(text.lstrip(), _PARAGRAPH_BREAK_RE)
+    outputs = _split_with_separators(output.lstrip(), _PARAGRAPH_BREAK_RE)
+    if len(paragraphs) != len(outputs) or not all(_balanced(piece) for piece, _ in outputs):
+        return
+    for (paragraph, _), (paragraph_output, _) in zip(paragraphs, outputs):
+        memo.put(memo_key(paragraph), paragraph_output)
+
+
+async def transform_text(
+    text: str,
+    transform: Transform,
+    on_delta: Optional[Delta] = None,
+    memo_key: Optional[MemoKey] = None,
+    memo: ResponseCache = paragraph_memo,
+    min_chars: int = CHUNK_MIN_CHARS,
+    cache_hits: Optional[CacheHits] = None,
+) -> str:
+    """Runs `transform` over `text`, chunked when it is long or mostly seen before.
+
+    With `memo_key`, paragraphs whose output is in `memo` are reused as is. New paragraphs
+    go to `transform` together with the paragraphs next to them, so the model never sees
+    a lone line out of context; a short text is only split up when most of it is reused.
+    Every output that lines up with its input paragraph by paragraph is remembered for
+    the next edit of the text. Reused paragraphs are counted as hits in `cache_hits`.
+    """
+    leading, units = split_paragraphs(text)
+    known = {
+        index for index, unit in enumerate(units)
+        if memo_key is not None and len(units) > 1 and memo.get(memo_key(unit.text)) is not None
+    }
+    if len(text) < min_chars and sum(len(units[index].text) for index in known) * 2 <= len(text):
+        output = await transform(text, on_delta)
+        if memo_key is not None:
+            remember_paragraphs(memo, memo_key, text, output)
+        return output
+
+    fresh = set(range(len(units))) - known
+    context = {neighbour for index in fresh for neighbour in (index - 1, index + 1)}
+    reused = known - context
+
+    async def run(chunk_text: str, chunk_delta: Optional[Delta]) -> str:
+        if memo_key is not None:
+            output = memo.get(memo_key(chunk_text))
+            if output is not None:
+                if cache_hits is not None:
+                    cache_hits.record(True)
+                return output
+        output = await transform(chunk_text, chunk_delta)
+        if memo_key is not None:
+            remember_paragraphs(memo, memo_key, chunk_text, output)
+        return output
+
+    chunks = _pack(units, CHUNK_TARGET_CHARS, alone=reused)
+    logger.info(f"Processing {len(text)} chars in {len(chunks)} chunks, {len(reused)} paragraphs reused")
+    outputs = await map_chunks(chunks, run, on_delta)
+    return join_chunks(leading, chunks, outputs)
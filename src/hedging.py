@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEDGE_QUANTILE = float(os.getenv("HERMIONE_HEDGE_QUANTILE", "0.9"))
+HEDGE_DEFAULT_DEADLINE = float(os.getenv("HERMIONE_HEDGE_DEFAULT_DEADLINE", "4.0"))
+HEDGE_MIN_DEADLINE = float(os.getenv("HERMIONE_HEDGE_MIN_DEADLINE", "0.5"))
+
+
+class LatencyTracker:
+    """Recent latencies per key, used to decide when a request is late enough to hedge.
+
+    Until a key has `min_samples` observations the deadline is `default_deadline`;
+    afterwards it is the `quantile` of the last `window` samples, never below `min_deadline`.
+    """
+
+    def __init__(
+        self,
+        quantile: float = HEDGE_QUANTILE,
+        window: int = 200,
+        min_samples: int = 20,
+        default_deadline: float = HEDGE_DEFAULT_DEADLINE,
+        min_deadline: float = HEDGE_MIN_DEADLINE,
+    ):
+        self.quantile = quantile
+        self.window = window
+        self.min_samples = min_samples
+        self.default_deadline = default_deadline
+        self.min_deadline = min_deadline
+        self._samples: Dict[Hashable, deque] = {}
+        self.hedges = 0
+        self.backup_wins = 0
+
+    def record(self, key: Hashable, seconds: float):
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def deadline(self, key: Hashable) -> float:
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return self.default_deadline
+        ordered = sorted(samples)
+        value = ordered[min(int(len(ordered) * self.quantile), len(ordered) - 1)]
+        return max(value, self.min_deadline)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "quantile": self.quantile,
+            "hedges": self.hedges,
+            "backup_wins": self.backup_wins,
+            "deadlines": {str(key): round(self.deadline(key), 3) for key in self._samples},
+        }
+
+
+latency_tracker = LatencyTracker()
+
+
+async def _timed(
+    attempt: Callable[[], Awaitable[Any]],
+    tracker: LatencyTracker,
+    key: Hashable,
+    is_cached: Callable[[Any], bool],
+) -> Any:
+    started = time.perf_counter()
+    result = await attempt()
+    # Response-cache hits return in no time and would pull the deadline down to its floor
+    if not is_cached(result):
+        tracker.record(key, time.perf_counter() - started)
+    return result
+
+
+async def hedged(
+    primary: Callable[[], Awaitable[Any]],
+    backup: Callable[[], Awaitable[Any]],
+    primary_key: Hashable,
+    backup_key: Optional[Hashable] = None,
+    tracker: LatencyTracker = latency_tracker,
+    is_cached: Callable[[Any], bool] = lambda result: False,
+) -> Tuple[Any, bool]:
+    """Runs `primary`, and `backup` as well if the primary is slower than its learned deadline.
+
+    The backup also starts right away if the primary fails first. Whichever attempt
+    succeeds first wins and the other is cancelled; if both fail, the primary's error
+    is raised. Results for which `is_cached` is true are not recorded as latencies.
+
+    Returns:
+        The winning result and whether it came from the backup.
+    """
+    backup_key = primary_key if backup_key is None else backup_key
+    first = asyncio.create_task(_timed(primary, tracker, primary_key, is_cached))
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait({first}, timeout=tracker.deadline(primary_key))
+        if done and first.exception() is None:
+            return first.result(), False
+
+        tracker.hedges += 1
+        logger.info(f"Hedging {primary_key}: primary {'failed' if done else 'is late'}, starting backup")
+        second = asyncio.create_task(_timed(backup, tracker, backup_key, is_cached))
+        tasks.append(second)
+
+        pending = {second} if done else {first, second}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in (first, second):
+                if task in done and task.exception() is None:
+                    if task is second:
+                        tracker.backup_wins += 1
+                    return task.result(), task is second
+        raise first.exception() or second.exception()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
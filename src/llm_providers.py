@@ -1,38 +1,178 @@
+import asyncio
 import os
+import httpx
 import openai
 from langchain_openai import ChatOpenAI
+from typing import Dict, Iterable, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
 LITELLM_HOST = os.getenv("LITELLM_HOST", "https://api.litellm.ai")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HERMIONE_HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HERMIONE_HTTP_MAX_KEEPALIVE_CONNECTIONS", "32"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HERMIONE_HTTP_KEEPALIVE_EXPIRY", "300"))
+HTTP_TIMEOUT = float(os.getenv("HERMIONE_HTTP_TIMEOUT", "60"))
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.getenv("HERMIONE_HTTP2", "1") != "0"
+
+# Pools are shared per base URL. Async pools are bound to the event loop that created
+# them, so they and the LLMs built on them are additionally keyed by loop (the server
+# only ever has one), and dropped once that loop is closed.
+_sync_clients: Dict[str, httpx.Client] = {}
+_async_clients: Dict[Tuple[str, Optional[asyncio.AbstractEventLoop]], httpx.AsyncClient] = {}
+_llm_registry: Dict[tuple, ChatOpenAI] = {}
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _forget_closed_loops():
+    """Drops the pools and LLMs of closed loops; every key of both registries ends with its loop."""
+    for registry in (_async_clients, _llm_registry):
+        for key in [key for key in registry if key[-1] is not None and key[-1].is_closed()]:
+            del registry[key]
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_sync_http_client(base_url: str) -> httpx.Client:
+    if base_url not in _sync_clients:
+        _sync_clients[base_url] = httpx.Client(
+            http2=HTTP2_ENABLED, limits=_http_limits(), timeout=HTTP_TIMEOUT
+        )
+    return _sync_clients[base_url]
+
+
+def get_async_http_client(base_url: str) -> httpx.AsyncClient:
+    _forget_closed_loops()
+    key = (base_url, _running_loop())
+    if key not in _async_clients:
+        _async_clients[key] = httpx.AsyncClient(http2=HTTP2_ENABLED, limits=_http_limits(), timeout=HTTP_TIMEOUT)
+    return _async_clients[key]
+
+
+def _reasoning_effort(model_name: str, provider: str) -> Optional[str]:
+    low = model_name.lower()
+    if "gpt" in low or (provider == "litellm" and "gemini" in low):
+        return "low"
+    return None
+
+
+def _registry_key(provider: str, model_name: str, temperature: float, thinking_budget: int) -> tuple:
+    _forget_closed_loops()
+    return (
+        provider,
+        model_name,
+        temperature,
+        _reasoning_effort(model_name, provider),
+        thinking_budget,
+        _running_loop(),
+    )
+
 
 def get_litellm_client() -> openai.OpenAI:
     api_key = os.environ.get("LITELLM_API_KEY")
     if not api_key:
         raise ValueError("LITELLM_API_KEY environment variable is not set. Please set it to use the LLM API.")
-    return openai.OpenAI(api_key=api_key, base_url=LITELLM_HOST)
+    return openai.OpenAI(api_key=api_key, base_url=LITELLM_HOST, http_client=get_sync_http_client(LITELLM_HOST))
 
 def get_openai_llm(model_name: str, temperature: float = 1, thinking_budget: int = None) -> ChatOpenAI:
+    key = _registry_key("openai", model_name, temperature, thinking_budget)
+    if key in _llm_registry:
+        return _llm_registry[key]
+
     kwargs = {}
-    if "gpt" in model_name.lower():
-        kwargs["model_kwargs"] = {"reasoning_effort": "low"}
-    return ChatOpenAI(model=model_name, temperature=temperature, **kwargs)
+    reasoning_effort = _reasoning_effort(model_name, "openai")
+    if reasoning_effort:
+        kwargs["model_kwargs"] = {"reasoning_effort": reasoning_effort}
+    llm = ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        stream_usage=True,
+        http_client=get_sync_http_client(OPENAI_BASE_URL),
+        http_async_client=get_async_http_client(OPENAI_BASE_URL),
+        **kwargs,
+    )
+    _llm_registry[key] = llm
+    return llm
 
 def get_litellm_llm(model_name: str, temperature: float = 1, thinking_budget: int = None) -> ChatOpenAI:
     api_key = os.environ.get("LITELLM_API_KEY")
     if not api_key:
         raise ValueError("LITELLM_API_KEY environment variable is not set.")
 
+    key = _registry_key("litellm", model_name, temperature, thinking_budget)
+    if key in _llm_registry:
+        return _llm_registry[key]
+
     kwargs = {
         "model": model_name,
         "temperature": temperature,
+        "stream_usage": True,
         "openai_api_key": api_key,
-        "openai_api_base": LITELLM_HOST
+        "openai_api_base": LITELLM_HOST,
+        "http_client": get_sync_http_client(LITELLM_HOST),
+        "http_async_client": get_async_http_client(LITELLM_HOST),
     }
 
-    if "gemini" in model_name.lower() or "gpt" in model_name.lower():
-        kwargs["model_kwargs"] = {"reasoning_effort": "low"}
+    reasoning_effort = _reasoning_effort(model_name, "litellm")
+    if reasoning_effort:
+        kwargs["model_kwargs"] = {"reasoning_effort": reasoning_effort}
+
+    llm = ChatOpenAI(**kwargs)
+    _llm_registry[key] = llm
+    return llm
+
+def get_llm(provider: str, model_name: str, temperature: float = 1, thinking_budget: int = None) -> ChatOpenAI:
+    if provider == "litellm":
+        return get_litellm_llm(model_name, temperature, thinking_budget)
+    return get_openai_llm(model_name, temperature, thinking_budget)
+
+async def warm_up_clients(providers: Iterable[str]):
+    """Build the shared LLM clients for `providers` and open a connection to each host.
+
+    Any response (even 401/404) means TCP and TLS are already set up in the pool,
+    so the first real request skips the handshake.
+    """
+    from src.agent_config import get_agent_config
+
+    for provider in providers:
+        try:
+            config = get_agent_config(provider=provider)
+            models = config["base_model"]
+            for model_name in models if isinstance(models, list) else [models]:
+                get_llm(provider, model_name, config.get("temperature", 1), config.get("thinking_budget"))
 
-    return ChatOpenAI(**kwargs)
+            base_url = LITELLM_HOST if provider == "litellm" else OPENAI_BASE_URL
+            await get_async_http_client(base_url).get(f"{base_url.rstrip('/')}/models", timeout=5.0)
+            logger.info(f"Warmed up {provider} connection pool (http2={HTTP2_ENABLED})")
+        except Exception as e:
+            logger.warning(f"Failed to warm up {provider} connection pool: {e}")
 
+async def aclose_clients():
+    for client in list(_async_clients.values()):
+        await client.aclose()
+    for client in list(_sync_clients.values()):
+        client.close()
+    _async_clients.clear()
+    _sync_clients.clear()
+    _llm_registry.clear()
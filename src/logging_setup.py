@@ -0,0 +1,124 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Tuple
+
+LOG_FORMAT = os.getenv("HERMIONE_LOG_FORMAT", "json")
+LOG_MAX_BYTES = int(os.getenv("HERMIONE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("HERMIONE_LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("HERMIONE_LOG_QUEUE_SIZE", "10000"))
+# Fraction of per-node detail lines that are kept
+LOG_SAMPLE_RATE = float(os.getenv("HERMIONE_LOG_SAMPLE_RATE", "0.1"))
+SAMPLED_PREFIXES = ("[MODEL_INFO]",)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra=` fields kept as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every 1/`rate` records whose message starts with one of `prefixes`."""
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE, prefixes: Tuple[str, ...] = SAMPLED_PREFIXES):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.prefixes = prefixes
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not isinstance(record.msg, str) or not record.msg.startswith(self.prefixes):
+            return True
+        if not self.every:
+            return False
+        self._seen += 1
+        return (self._seen - 1) % self.every == 0
+
+
+class DroppingQueueHandler(QueueHandler):
+    """A QueueHandler that drops records instead of blocking or erroring when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like QueueHandler.prepare, but keeps the traceback apart from the message so
+        # the JSON formatter can store it as its own field
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(logs_dir: str, level: int = logging.INFO, log_format: str = LOG_FORMAT) -> QueueListener:
+    """Routes all logging through a queue drained by a background thread.
+
+    Request handlers only pay for putting a record on the queue; the listener thread
+    writes it to stdout and to a size-rotated `api.log` (JSON lines unless `log_format`
+    is "text"). Per-node detail lines are sampled before they are queued.
+
+    Returns:
+        The running listener; it is stopped, flushing the queue, at interpreter exit.
+    """
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers = [stream_handler]
+    try:
+        file_handler = RotatingFileHandler(
+            os.path.join(logs_dir, "api.log"), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+        handlers.append(file_handler)
+    except OSError as e:
+        print(f"Failed to open log file in {logs_dir}: {e}")
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
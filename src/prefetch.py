@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from src.scheduler import USEFUL_PRIORITY, NodeSpec
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_TTL = float(os.getenv("HERMIONE_PREFETCH_TTL", "60"))
+PREFETCH_MEMORY_BUDGET = int(os.getenv("HERMIONE_PREFETCH_MEMORY_BUDGET", str(4 * 1024 * 1024)))
+PREFETCH_MAX_RUNNING = int(os.getenv("HERMIONE_PREFETCH_MAX_RUNNING", "2"))
+
+
+def is_prefetchable(spec: NodeSpec) -> bool:
+    """Nodes worth running speculatively: the ones users read first, and anything local."""
+    return spec.priority <= USEFUL_PRIORITY or spec.cost_class == "local"
+
+
+def prefetch_key(content: str, provider: str) -> str:
+    return f"{provider}:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+
+
+async def replay_then_complete(
+    replay: AsyncIterator[Dict[str, Any]],
+    run_nodes: Callable[[Callable[[NodeSpec], bool]], AsyncIterator[Dict[str, Any]]],
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yields a prefetched run's results, then runs the prefetchable nodes it has no result for.
+
+    A prefetch run that failed, or whose nodes errored, leaves gaps in the replay;
+    `run_nodes(node_filter)` fills them with a live run restricted to those nodes.
+    """
+    completed = set()
+    async for result in replay:
+        if "value" in result:
+            completed.add(result["output_key"])
+        yield result
+
+    def missing(spec: NodeSpec) -> bool:
+        return is_prefetchable(spec) and spec.output_key[4:] not in completed
+
+    async for result in run_nodes(missing):
+        if result["output_key"] != "existent":
+            yield result
+
+
+class PrefetchEntry:
+    """Events produced so far by one speculative run, and whether it has finished."""
+
+    def __init__(self, key: str, size: int, created_at: float):
+        self.key = key
+        self.size = size
+        self.created_at = created_at
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _append(self, event: Dict[str, Any]):
+        self.events.append(event)
+        self.size += len(json.dumps(event, default=str))
+        self._notify()
+
+    def _finish(self):
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class PrefetchStore:
+    """Speculative agent runs started before the user asks for them.
+
+    `start` runs a stream in the background and buffers its events under a key; a later
+    request for the same key `attach`es to the buffer, replaying what is there and
+    following the run until it finishes. Entries expire `ttl` seconds after they were
+    started; when the buffered events exceed `memory_budget` bytes, or more than
+    `max_running` runs are in flight, the oldest entries nobody is attached to are
+    dropped and their runs cancelled.
+    """
+
+    def __init__(
+        self,
+        ttl: float = PREFETCH_TTL,
+        memory_budget: int = PREFETCH_MEMORY_BUDGET,
+        max_running: int = PREFETCH_MAX_RUNNING,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.max_running = max_running
+        self._clock = clock
+        self._entries: "OrderedDict[str, PrefetchEntry]" = OrderedDict()
+        self.hits = 0
+        self.evictions = 0
+
+    def start(self, key: str, stream_factory: Callable[[], AsyncIterator[Dict[str, Any]]], size: int = 0) -> bool:
+        """Starts a speculative run for `key` unless a live one exists; returns whether it started."""
+        self._expire()
+        if key in self._entries:
+            return False
+        entry = PrefetchEntry(key, size, self._clock())
+        self._entries[key] = entry
+        entry.task = asyncio.create_task(self._fill(entry, stream_factory))
+        self._enforce_limits()
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[PrefetchEntry]:
+        self._expire()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    async def attach(self, entry: PrefetchEntry) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the entry's events, first the buffered ones, then live ones until its run ends."""
+        entry.subscribers += 1
+        try:
+            index = 0
+            while True:
+                changed = entry._changed
+                while index < len(entry.events):
+                    yield entry.events[index]
+                    index += 1
+                if entry.done:
+                    return
+                await changed.wait()
+        finally:
+            entry.subscribers -= 1
+
+    async def _fill(self, entry: PrefetchEntry, stream_factory: Callable[[], AsyncIterator[Dict[str, Any]]]):
+        try:
+            async for event in stream_factory():
+                entry._append(event)
+                self._enforce_limits()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Prefetch {entry.key[:20]} failed: {e}")
+            # Later requests for this content should run normally rather than attach to a failure
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+        finally:
+            entry._finish()
+
+    def _drop(self, entry: PrefetchEntry, reason: str):
+        logger.info(f"Dropping prefetch {entry.key[:20]} ({reason})")
+        self._entries.pop(entry.key, None)
+        self.evictions += 1
+        if entry.task is not None and not entry.task.done():
+            entry.task.cancel()
+
+    def _expire(self):
+        now = self._clock()
+        for entry in list(self._entries.values()):
+            if now - entry.created_at > self.ttl and not entry.subscribers:
+                self._drop(entry, "expired")
+
+    def _enforce_limits(self):
+        for entry in list(self._entries.values()):
+            over_budget = sum(e.size for e in self._entries.values()) > self.memory_budget
+            too_many = sum(1 for e in self._entries.values() if not e.done) > self.max_running
+            if not over_budget and not too_many:
+                return
+            if entry.subscribers or (too_many and not over_budget and entry.done):
+                continue
+            self._drop(entry, "over memory budget" if over_budget else "too many running")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "running": sum(1 for entry in self._entries.values() if not entry.done),
+            "bytes": sum(entry.size for entry in self._entries.values()),
+            "memory_budget": self.memory_budget,
+            "hits": self.hits,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        for entry in list(self._entries.values()):
+            self._drop(entry, "cleared")
+
+
+prefetch_store = PrefetchStore()
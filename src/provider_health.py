@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_THRESHOLD = int(os.getenv("HERMIONE_BREAKER_FAILURE_THRESHOLD", "3"))
+RECOVERY_TIMEOUT = float(os.getenv("HERMIONE_BREAKER_RECOVERY_TIMEOUT", "15"))
+MAX_RECOVERY_TIMEOUT = float(os.getenv("HERMIONE_BREAKER_MAX_RECOVERY_TIMEOUT", "300"))
+PROBE_INTERVAL = float(os.getenv("HERMIONE_HEALTH_PROBE_INTERVAL", "1"))
+
+
+def is_provider_failure(exc: BaseException) -> bool:
+    """Whether an exception raised by an LLM call says something about provider health."""
+    return isinstance(exc, (openai.APIError, httpx.HTTPError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker fed by the outcome of real provider calls.
+
+    The breaker opens after `failure_threshold` consecutive failures. Once
+    `recovery_timeout` has passed it becomes due for a probe; a successful probe
+    (or real call) closes it again, a failed one re-opens it with a doubled timeout.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        recovery_timeout: float = RECOVERY_TIMEOUT,
+        max_recovery_timeout: float = MAX_RECOVERY_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_recovery_timeout = recovery_timeout
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+        self._clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+
+    def is_available(self) -> bool:
+        return self.state != OPEN
+
+    def probe_due(self) -> bool:
+        return self.state == OPEN and self._clock() - self.opened_at >= self.recovery_timeout
+
+    def begin_probe(self):
+        self.state = HALF_OPEN
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info("Circuit closed after successful call")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.recovery_timeout = self.base_recovery_timeout
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self.recovery_timeout = min(self.recovery_timeout * 2, self.max_recovery_timeout)
+            self._open()
+        elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = self._clock()
+        logger.warning(
+            f"Circuit opened after {self.consecutive_failures} consecutive failures, "
+            f"next probe in {self.recovery_timeout:.0f}s"
+        )
+
+
+class ProviderHealthMonitor:
+    """Tracks provider availability without putting a health check on the request path.
+
+    Real agent calls report their outcome through `record_success`/`record_failure`.
+    A background task probes a provider only while its breaker is open, so a healthy
+    provider costs nothing to check.
+    """
+
+    def __init__(self, probe_interval: float = PROBE_INTERVAL):
+        self.probe_interval = probe_interval
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._probes: Dict[str, Callable[[], Awaitable[bool]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker()
+        return self._breakers[provider]
+
+    def register_probe(self, provider: str, probe: Callable[[], Awaitable[bool]]):
+        self._probes[provider] = probe
+
+    def is_available(self, provider: str) -> bool:
+        return self.breaker(provider).is_available()
+
+    def record_success(self, provider: str):
+        self.breaker(provider).record_success()
+
+    def record_failure(self, provider: str):
+        self.breaker(provider).record_failure()
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {
+            provider: {
+                "state": breaker.state,
+                "consecutive_failures": breaker.consecutive_failures,
+                "recovery_timeout": breaker.recovery_timeout,
+            }
+            for provider, breaker in self._breakers.items()
+        }
+
+    async def probe_due_providers(self):
+        for provider, probe in list(self._probes.items()):
+            breaker = self.breaker(provider)
+            if not breaker.probe_due():
+                continue
+            breaker.begin_probe()
+            logger.info(f"Probing provider {provider}")
+            try:
+                healthy = await probe()
+            except Exception as e:
+                logger.warning(f"Health probe for {provider} raised: {e}")
+                healthy = False
+            if healthy:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self.probe_due_providers()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+health_monitor = ProviderHealthMonitor()
@@ -0,0 +1,230 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("HERMIONE_CACHE_ENABLED", "1") != "0"
+CACHE_MAX_ENTRIES = int(os.getenv("HERMIONE_CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL = float(os.getenv("HERMIONE_CACHE_TTL", "3600"))
+CACHE_DB_PATH = os.getenv("HERMIONE_CACHE_DB", "")
+
+class ResponseCache:
+    """Bounded LRU of tool results with a TTL and an optional SQLite tier that survives restarts."""
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL,
+        db_path: str = "",
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._memory: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at < ?", (self._clock(),))
+            self._db.commit()
+            logger.info(f"Response cache persisted to {db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"Could not open response cache database {db_path}: {e}")
+            self._db = None
+
+    def get(self, key: str) -> Optional[Any]:
+        now = self._clock()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._memory[key]
+
+        value = self._get_persistent(key, now)
+        if value is not None:
+            self._remember(key, value, now)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        return None
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def set(self, key: str, value: Any):
+        self.put(key, value)
+        self.persist(key, value)
+
+    def put(self, key: str, value: Any):
+        self._remember(key, value, self._clock())
+
+    def persist(self, key: str, value: Any):
+        self._set_persistent(key, value, self._clock())
+
+    def _remember(self, key: str, value: Any, now: float):
+        self._memory[key] = (now + self.ttl, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_persistent(self, key: str, now: float) -> Optional[Any]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_persistent(self, key: str, value: Any, now: float):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now + self.ttl),
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist cached response: {e}")
+
+    def clear(self):
+        self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "persistent": self.persistent,
+        }
+
+
+response_cache = ResponseCache(db_path=CACHE_DB_PATH)
+
+
+def _normalize_text(text: str) -> str:
+    return text.replace("\r\n", "\n").strip()
+
+
+def llm_identity(llm: Any) -> Optional[Dict[str, Any]]:
+    """What makes two LLM clients interchangeable for caching, or None if the model is unknown."""
+    model_name = getattr(llm, "model_name", None)
+    if not isinstance(model_name, str):
+        return None
+    return {
+        "model": model_name,
+        "base_url": getattr(llm, "openai_api_base", None) or "openai",
+        "temperature": getattr(llm, "temperature", None),
+        "model_kwargs": getattr(llm, "model_kwargs", None) or {},
+    }
+
+
+def make_cache_key(tool: str, prompt_version: int, identity: Dict[str, Any], params: Dict[str, Any]) -> str:
+    normalized = {
+        name: _normalize_text(value) if name == "text" and isinstance(value, str) else value
+        for name, value in params.items()
+    }
+    payload = json.dumps(
+        {"tool": tool, "version": prompt_version, "llm": identity, "params": normalized},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached_tool(prompt_version: int):
+    """Serve an LLM tool's result from `response_cache` when the same call was made recently.
+
+    The key covers the tool name, `prompt_version` (bump it whenever the prompt changes),
+    the model/provider/temperature of `llm` and every other argument, with `text`
+    normalized. Streaming callbacks are not part of the key; a hit simply skips streaming.
+    An optional `cache_hits=` keyword takes a `CacheHits` that records whether this call hit.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, cache_hits: Optional["CacheHits"] = None, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            identity = llm_identity(params.pop("llm", None))
+            params.pop("on_delta", None)
+
+            if not CACHE_ENABLED or identity is None:
+                if cache_hits is not None:
+                    cache_hits.record(False)
+                return await func(*args, **kwargs)
+
+            key = make_cache_key(func.__name__, prompt_version, identity, params)
+            cached = response_cache.get(key)
+            if cache_hits is not None:
+                cache_hits.record(cached is not None)
+            if cached is not None:
+                return cached
+
+            result = await func(*args, **kwargs)
+            response_cache.put(key, result)
+            if response_cache.persistent:
+                await asyncio.to_thread(response_cache.persist, key, result)
+            return result
+
+        wrapper.prompt_version = prompt_version
+        return wrapper
+
+    return decorator
+
+
+class CacheHits:
+    """Hits and misses of the cached calls made on behalf of one node run.
+
+    Passed down explicitly (to tools as `cache_hits=`, to `transform_text` for memoized
+    paragraphs) because chunk and fan-out tasks can't report back through context.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    @property
+    def all_hit(self) -> bool:
+        return self.hits > 0 and self.misses == 0
@@ -0,0 +1,296 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Literal, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CostClass = Literal["local", "llm", "llm_batch"]
+
+
+@dataclass(frozen=True)
+class NodeSpec:
+    """What the scheduler needs to know about a node.
+
+    Attributes:
+        name: Route name the router emits for this node.
+        method: Name of the AgentBuilder coroutine method that runs it.
+        output_key: State key the node writes (`out_*`).
+        depends_on: Nodes that must finish (successfully or not) before this one starts.
+            Dependencies that aren't scheduled for a request are ignored.
+        needs_llm: Whether the node calls a model; nodes that don't run once per request
+            instead of once per configured model.
+        streams: Whether the node accepts an `on_delta` callback.
+        cost_class: Rough cost, "local" (no request), "llm" or "llm_batch" (one request
+            standing in for several nodes).
+        priority: Lower runs first when concurrency is limited.
+        concurrency: Cap on simultaneously running instances of this node, or None.
+    """
+    name: str
+    method: str
+    output_key: str
+    depends_on: Tuple[str, ...] = ()
+    needs_llm: bool = True
+    streams: bool = True
+    cost_class: CostClass = "llm"
+    priority: int = 0
+    concurrency: Optional[int] = None
+
+
+@dataclass
+class Job:
+    """One scheduled run of a node; `start` creates its coroutine when the scheduler launches it."""
+    spec: NodeSpec
+    start: Callable[[], Awaitable[Any]]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Completion:
+    job: Job
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+class _Finished:
+    __slots__ = ("job", "task")
+
+    def __init__(self, job: Job, task: asyncio.Task):
+        self.job = job
+        self.task = task
+
+
+class DagScheduler:
+    """Runs jobs as their dependencies finish, highest priority first within the concurrency caps.
+
+    `run(jobs)` yields a `Completion` for every finished job and, interleaved in arrival
+    order, anything the jobs pass to `emit()` (streamed deltas). Closing the iterator
+    cancels every running job. A scheduler runs one batch of jobs.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, hold_back_above: Optional[int] = None):
+        """
+        Args:
+            max_concurrency: Cap on jobs running at once, or None.
+            hold_back_above: If set, jobs with a priority above this wait until a job at or
+                below it has completed successfully (or none of those are left), so the
+                first useful result isn't competing with nice-to-haves.
+        """
+        self.max_concurrency = max_concurrency
+        self.hold_back_above = hold_back_above
+        self._holding = False
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._running: Dict[asyncio.Task, Job] = {}
+        self._running_per_node: Dict[str, int] = {}
+        self._unfinished: Dict[str, int] = {}
+        self._blocked: List[Job] = []
+        self._ready: List[Tuple[int, int, Job]] = []
+        self._order = itertools.count()
+
+    def emit(self, item: Any):
+        self._events.put_nowait(item)
+
+    def _push_ready(self, job: Job):
+        heapq.heappush(self._ready, (job.spec.priority, next(self._order), job))
+
+    def _has_capacity(self, job: Job) -> bool:
+        if self.max_concurrency is not None and len(self._running) >= self.max_concurrency:
+            return False
+        cap = job.spec.concurrency
+        return cap is None or self._running_per_node.get(job.spec.name, 0) < cap
+
+    def _is_held(self, job: Job) -> bool:
+        return self._holding and job.spec.priority > self.hold_back_above
+
+    def _high_priority_left(self) -> bool:
+        return any(
+            job.spec.priority <= self.hold_back_above
+            for job in itertools.chain(self._running.values(), (entry[2] for entry in self._ready), self._blocked)
+        )
+
+    def _launch_ready(self):
+        deferred = []
+        while self._ready:
+            entry = heapq.heappop(self._ready)
+            job = entry[2]
+            if self._is_held(job):
+                deferred.append(entry)
+                continue
+            if not self._has_capacity(job):
+                deferred.append(entry)
+                if self.max_concurrency is not None and len(self._running) >= self.max_concurrency:
+                    break
+                continue
+            task = asyncio.create_task(job.start())
+            self._running[task] = job
+            self._running_per_node[job.spec.name] = self._running_per_node.get(job.spec.name, 0) + 1
+            task.add_done_callback(lambda finished, job=job: self._events.put_nowait(_Finished(job, finished)))
+        for entry in deferred:
+            heapq.heappush(self._ready, entry)
+
+    def _release_dependents(self, job: Job):
+        name = job.spec.name
+        self._unfinished[name] -= 1
+        if self._unfinished[name]:
+            return
+        still_blocked = []
+        for blocked in self._blocked:
+            if any(self._unfinished.get(dependency, 0) for dependency in blocked.spec.depends_on):
+                still_blocked.append(blocked)
+            else:
+                self._push_ready(blocked)
+        self._blocked = still_blocked
+
+    def _plan(self, jobs: List[Job]):
+        scheduled = {job.spec.name for job in jobs}
+        for job in jobs:
+            self._unfinished[job.spec.name] = self._unfinished.get(job.spec.name, 0) + 1
+        for job in jobs:
+            if any(dependency in scheduled for dependency in job.spec.depends_on):
+                self._blocked.append(job)
+            else:
+                self._push_ready(job)
+        if self.hold_back_above is not None:
+            self._holding = self._high_priority_left()
+
+    async def run(self, jobs: Iterable[Job]) -> AsyncIterator[Any]:
+        self._plan(list(jobs))
+        self._launch_ready()
+        try:
+            while self._running:
+                item = await self._events.get()
+                if not isinstance(item, _Finished):
+                    yield item
+                    continue
+
+                job, task = item.job, item.task
+                del self._running[task]
+                self._running_per_node[job.spec.name] -= 1
+                self._release_dependents(job)
+                if self._holding:
+                    succeeded = not task.cancelled() and task.exception() is None
+                    if (succeeded and job.spec.priority <= self.hold_back_above) or not self._high_priority_left():
+                        self._holding = False
+                self._launch_ready()
+
+                if task.cancelled():
+                    logger.info(f"Node {job.spec.name} was cancelled")
+                    continue
+                error = task.exception()
+                yield Completion(job, None if error else task.result(), error)
+
+            if self._blocked:
+                logger.warning(f"Nodes never became ready: {[job.spec.name for job in self._blocked]}")
+        finally:
+            for task in self._running:
+                task.cancel()
+            if self._running:
+                await asyncio.gather(*self._running, return_exceptions=True)
+
+
+class PriorityLimiter:
+    """A concurrency cap shared by every request to one provider.
+
+    When the cap is reached, waiting callers are admitted lowest priority value first
+    (then first come, first served), so fixes and translations don't queue behind
+    enrichment and emoji under rate limits.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: List[list] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int = 0):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._order), future])
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as this caller was cancelled
+                self.release()
+            raise
+
+    def release(self):
+        self.active -= 1
+        while self._waiters and self.active < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"limit": self.limit, "active": self.active, "waiting": sum(1 for *_, f in self._waiters if not f.done())}
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """Parses "openai=8,litellm=4" into {"openai": 8, "litellm": 4}."""
+    limits = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+_provider_limiters: Dict[str, PriorityLimiter] = {
+    provider: PriorityLimiter(limit)
+    for provider, limit in parse_limits(os.getenv("HERMIONE_PROVIDER_CONCURRENCY", "")).items()
+}
+
+
+def get_provider_limiter(provider: str) -> Optional[PriorityLimiter]:
+    return _provider_limiters.get(provider)
+
+
+def provider_limits_snapshot() -> Dict[str, Dict[str, int]]:
+    return {provider: limiter.snapshot() for provider, limiter in _provider_limiters.items()}
+
+
+class LatencySlo:
+    """Rolling record of a latency against a target, e.g. time to the first useful result."""
+
+    def __init__(self, target: float, window: int = 500):
+        self.target = target
+        self._samples: Dict[str, deque] = {}
+        self._window = window
+
+    def record(self, key: str, seconds: float):
+        self._samples.setdefault(key, deque(maxlen=self._window)).append(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for key, samples in self._samples.items():
+            ordered = sorted(samples)
+            report[key] = {
+                "target": self.target,
+                "samples": len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+                "within_target": sum(1 for sample in ordered if sample <= self.target) / len(ordered),
+            }
+        return report
+
+
+# Time from dispatch to the first non-empty result of a node at or below USEFUL_PRIORITY
+USEFUL_PRIORITY = 0
+ttfur_slo = LatencySlo(target=float(os.getenv("HERMIONE_TTFUR_TARGET", "2.0")))
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Emit = Callable[[str], None]
+
+
+class _Flight:
+    __slots__ = ("task", "subscribers", "listeners", "chunks")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        self.listeners: List[Emit] = []
+        self.chunks: List[str] = []
+
+    def broadcast(self, text: str):
+        self.chunks.append(text)
+        for listener in list(self.listeners):
+            listener(text)
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one call.
+
+    The first caller for a key starts `call(emit)` in a task; callers arriving while it
+    runs wait for the same result instead of starting their own. Streamed chunks passed
+    to `emit` reach every subscriber's `on_delta`, late ones first receiving what was
+    already sent. A subscriber being cancelled only cancels the call when it was the last.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def run(self, key: Hashable, call: Callable[[Optional[Emit]], Awaitable[T]], on_delta: Optional[Emit] = None) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            self.started += 1
+            # Whether the call streams is decided by its first subscriber
+            flight.task = asyncio.create_task(call(flight.broadcast if on_delta is not None else None))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.joined += 1
+            logger.info(f"Joining an in-flight call with {flight.subscribers} subscriber(s)")
+            if on_delta is not None:
+                for chunk in flight.chunks:
+                    on_delta(chunk)
+
+        if on_delta is not None:
+            flight.listeners.append(on_delta)
+        flight.subscribers += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.subscribers -= 1
+            if on_delta is not None:
+                flight.listeners.remove(on_delta)
+            if not flight.subscribers and not flight.task.done():
+                # Nobody is waiting any more; callers arriving from now on start afresh
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._flights), "started": self.started, "joined": self.joined}
+
+
+# Node calls shared between concurrent requests, keyed by agent, node, model and input
+node_flights = SingleFlight()
@@ -0,0 +1,75 @@
+import asyncio
+from typing import AsyncIterator, TypeVar
+
+T = TypeVar("T")
+
+_ITEM = "item"
+_DONE = "done"
+_ERROR = "error"
+
+
+async def merge_streams(*streams: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Consume several async iterators concurrently and yield items as soon as any produces one.
+
+    An exception raised by one source is re-raised to the consumer after the other
+    sources are cancelled; sources that want to fail softly must catch their own errors.
+    Closing or cancelling the merged iterator cancels every source.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump(stream: AsyncIterator[T]):
+        try:
+            async for item in stream:
+                await queue.put((_ITEM, item))
+            await queue.put((_DONE, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put((_ERROR, e))
+
+    tasks = [asyncio.create_task(pump(stream)) for stream in streams]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            kind, payload = await queue.get()
+            if kind == _DONE:
+                remaining -= 1
+            elif kind == _ERROR:
+                raise payload
+            else:
+                yield payload
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def cancel_on(event: asyncio.Event, stream: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Yield from `stream` until `event` is set, then stop at once.
+
+    The pending step of `stream` is cancelled rather than awaited, so whatever it was
+    waiting on (LLM calls, HTTP streams) is torn down immediately.
+    """
+    iterator = stream.__aiter__()
+    cancelled = asyncio.create_task(event.wait())
+    step = None
+    try:
+        while True:
+            step = asyncio.ensure_future(iterator.__anext__())
+            await asyncio.wait({step, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                return
+            try:
+                item = step.result()
+            except StopAsyncIteration:
+                return
+            step = None
+            yield item
+    finally:
+        cancelled.cancel()
+        if step is not None and not step.done():
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
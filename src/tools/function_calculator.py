@@ -1,7 +1,26 @@
-from typing import Any
+from typing import Any, Optional
+import ast
+import asyncio
+import logging
 import math
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import operator
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_WORKERS = int(os.getenv("HERMIONE_SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT = float(os.getenv("HERMIONE_SANDBOX_TIMEOUT", "1"))
+# How long a new worker may take to import numpy and report ready; not part of SANDBOX_TIMEOUT
+SANDBOX_START_TIMEOUT = float(os.getenv("HERMIONE_SANDBOX_START_TIMEOUT", "30"))
+# Caps the worker's whole address space, numpy and the interpreter included
+SANDBOX_MEMORY_LIMIT_MB = int(os.getenv("HERMIONE_SANDBOX_MEMORY_MB", "1024"))
 
 def clean_user_script(user_script: str) -> str:
     """Cleans the user script by removing code block markers and import statements.
@@ -28,19 +47,9 @@ def execute_code(code: str, safe_globals: dict) -> Any:
     exec(code, safe_globals, local_vars)
     return local_vars.get('result', "No result variable found in the code.")
 
-def calculate_formula(code: str) -> Any:
-    """Executes the provided Python code and returns the result.
-
-    Parameters:
-        code: A string containing Python code to execute
-
-    Returns:
-        The result of executing the code
-    """
-    code = clean_user_script(code)
-
-    # Create a safe local environment with only allowed modules
-    safe_globals = {
+def _safe_globals() -> dict:
+    """A safe environment with only allowed modules"""
+    return {
         # Math module and its functions
         'math': math,
 
@@ -71,15 +80,332 @@ def calculate_formula(code: str) -> Any:
         'dict': dict,
     }
 
+class UnsupportedExpression(Exception):
+    """The input is not a plain expression `evaluate_expression` can compute safely."""
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_COMPARISONS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+# numpy attributes that only compute on what the input spells out; file access (load, memmap, ...)
+# and array constructors whose size comes from an argument (arange, ones, ...) stay out
+_NUMPY_FUNCTIONS = {
+    "array", "sum", "prod", "mean", "median", "std", "var", "min", "max",
+    "cumsum", "cumprod", "dot", "round", "pi", "e", "inf", "nan",
+}
+_EXPRESSION_BUILTINS = ("abs", "min", "max", "sum", "len", "round", "int", "float")
+# Integers beyond this can't even be printed (str() is capped at 4300 digits)
+_MAX_RESULT_BITS = 10_000
+_MAX_FACTORIAL = 1_000
+_EXPRESSION_REPLACEMENTS = {"^": "**", "×": "*", "·": "*", "÷": "/", "−": "-"}
+
+def _expression_names() -> dict:
+    """Bare names an expression may use: math functions and constants plus the safe built-ins."""
+    safe_globals = _safe_globals()
+    names = {name: getattr(math, name) for name in dir(math) if not name.startswith("_")}
+    names.update({name: safe_globals[name] for name in _EXPRESSION_BUILTINS})
+    names["ln"] = math.log
+    return names
+
+_EXPRESSION_NAMES = _expression_names()
+
+def _numeric(value) -> Any:
+    if isinstance(value, bool) or not isinstance(value, (int, float, complex, np.number, np.ndarray)):
+        raise UnsupportedExpression(f"not a number: {type(value).__name__}")
+    return value
+
+def _checked_power(base, exponent):
+    if isinstance(base, int) and isinstance(exponent, int) and abs(base) > 1 and exponent * math.log2(abs(base)) > _MAX_RESULT_BITS:
+        raise UnsupportedExpression("result too large to evaluate inline")
+    return operator.pow(base, exponent)
+
+def _resolve_function(node: ast.expr):
+    if isinstance(node, ast.Name) and node.id in _EXPRESSION_NAMES:
+        return _EXPRESSION_NAMES[node.id]
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and not node.attr.startswith("_"):
+        module = node.value.id
+        if module == "math" and hasattr(math, node.attr):
+            return getattr(math, node.attr)
+        if module in ("np", "numpy"):
+            attr = getattr(np, node.attr, None)
+            if isinstance(attr, np.ufunc) or node.attr in _NUMPY_FUNCTIONS:
+                return attr
+    raise UnsupportedExpression(f"unsupported name: {ast.dump(node)}")
+
+def _evaluate_node(node: ast.expr) -> Any:
+    if isinstance(node, ast.Expression):
+        return _evaluate_node(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, complex)) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _numeric(_evaluate_node(node.left)), _numeric(_evaluate_node(node.right))
+        if isinstance(node.op, ast.Pow):
+            return _checked_power(left, right)
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_numeric(_evaluate_node(node.operand)))
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARISONS for op in node.ops):
+        left = _evaluate_node(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _evaluate_node(comparator)
+            if not _COMPARISONS[type(op)](left, right):
+                return False
+            left = right
+        return True
+    # No tuples: "1,000 * 3" or "3,5 + 2" parse as one, but their commas are digit separators
+    if isinstance(node, ast.List):
+        return [_evaluate_node(element) for element in node.elts]
+    if isinstance(node, (ast.Name, ast.Attribute)):
+        value = _resolve_function(node)
+        if callable(value):
+            raise UnsupportedExpression("a function is not a result")
+        return value
+    if isinstance(node, ast.Call) and not node.keywords:
+        function = _resolve_function(node.func)
+        args = [_evaluate_node(arg) for arg in node.args]
+        if function in (math.factorial, math.comb, math.perm) and any(abs(arg) > _MAX_FACTORIAL for arg in args):
+            raise UnsupportedExpression("argument too large to evaluate inline")
+        return function(*args)
+    raise UnsupportedExpression(f"unsupported syntax: {type(node).__name__}")
+
+def evaluate_expression(expression: str) -> Any:
+    """Evaluates a plain math expression such as "2 + 2 * 2" or "log10(1000 * 66)" without exec.
+
+    Only numbers, arithmetic and comparison operators (`^` means power), list arguments and calls to
+    math/numpy functions and the safe built-ins of `calculate_formula` are accepted.
+
+    Raises:
+        UnsupportedExpression: The input is not such an expression (the caller should fall
+            back to generating a script). Errors of the computation itself, like
+            ZeroDivisionError, propagate unchanged.
+    """
+    text = expression.strip().rstrip("=?").strip()
+    for symbol, replacement in _EXPRESSION_REPLACEMENTS.items():
+        text = text.replace(symbol, replacement)
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise UnsupportedExpression(str(e)) from e
+    if isinstance(tree.body, ast.List):
+        raise UnsupportedExpression("a list is not a result")
+    result = _evaluate_node(tree)
+    if isinstance(result, int) and result.bit_length() > _MAX_RESULT_BITS:
+        raise UnsupportedExpression("result too large to print")
+    return result
+
+def _limit_memory(limit_mb: int):
     try:
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(execute_code, code, safe_globals)
-            result = future.result(timeout=1)
-            return result
-    except TimeoutError:
-        return "Execution timed out after 1 second."
-    except Exception as e:
-        return f"Error executing code: {str(e)}"
+        import resource
+    except ImportError:
+        # Not available on Windows; only the wall-clock limit applies there
+        return
+    limit = limit_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not limit sandbox memory: {e}")
+
+def _sandbox_worker(conn, memory_limit_mb: int):
+    """Worker process loop: reports ready, then runs scripts received over `conn` until the parent goes away."""
+    _limit_memory(memory_limit_mb)
+    conn.send(("ready", None))
+    while True:
+        try:
+            code = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reply = ("ok", execute_code(code, _safe_globals()))
+        except MemoryError:
+            reply = ("error", f"memory limit of {memory_limit_mb} MB exceeded")
+        except Exception as e:
+            reply = ("error", str(e))
+        try:
+            conn.send(reply)
+        except Exception:
+            # The result can't be pickled (a module, a generator, ...); send its text instead
+            conn.send((reply[0], str(reply[1])))
+
+_main_lock = threading.Lock()
+
+@contextmanager
+def _worker_main_module():
+    """Makes spawned workers run this module as their `__main__` instead of the server's script.
+
+    A spawned child first re-imports the parent's main module; for `python src/api.py` that
+    is the whole server with langchain, which takes longer than the script timeout.
+    """
+    main = sys.modules["__main__"]
+    if __spec__ is None or main is sys.modules.get(__name__):
+        yield
+        return
+    with _main_lock:
+        main_spec = getattr(main, "__spec__", None)
+        main.__spec__ = __spec__
+        try:
+            yield
+        finally:
+            main.__spec__ = main_spec
+
+class _SandboxWorker:
+    def __init__(self, ctx, memory_limit_mb: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_sandbox_worker,
+            args=(child_conn, memory_limit_mb),
+            name="hermione-sandbox",
+            daemon=True,
+        )
+        with _worker_main_module():
+            self.process.start()
+        child_conn.close()
+
+    def wait_ready(self, timeout: float):
+        """Blocks until the worker has finished starting up; kills it if it doesn't in `timeout` seconds."""
+        try:
+            if self.conn.poll(timeout) and self.conn.recv()[0] == "ready":
+                return
+        except (EOFError, OSError):
+            pass
+        exitcode = self.process.exitcode
+        self.kill()
+        raise RuntimeError(f"Sandbox worker failed to start (exit code {exitcode})")
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class SandboxPool:
+    """Pre-started worker processes that run generated scripts with a wall-clock and memory limit.
+
+    Workers are spawned (not forked) so they never inherit the server's threads or event
+    loop, and numpy is imported once per worker rather than per script. A worker only
+    takes scripts once it has reported ready, so its startup never eats into the script
+    timeout. A worker that
+    exceeds the timeout or dies is killed and replaced, so a runaway script can't keep
+    burning CPU next to the server.
+    """
+
+    def __init__(self, size: int = SANDBOX_WORKERS, timeout: float = SANDBOX_TIMEOUT, memory_limit_mb: int = SANDBOX_MEMORY_LIMIT_MB):
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._missing = 0
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sandbox")
+
+    def _spawn(self) -> _SandboxWorker:
+        worker = _SandboxWorker(self._ctx, self.memory_limit_mb)
+        worker.wait_ready(SANDBOX_START_TIMEOUT)
+        return worker
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            # Started together, so the workers import numpy in parallel
+            workers = [_SandboxWorker(self._ctx, self.memory_limit_mb) for _ in range(self.size)]
+            for worker in workers:
+                try:
+                    worker.wait_ready(SANDBOX_START_TIMEOUT)
+                except RuntimeError as e:
+                    logger.error(str(e))
+                    self._missing += 1
+                    continue
+                self._idle.put(worker)
+            self._started = True
+            logger.info(f"Started {self.size - self._missing} sandbox workers")
+
+    def _acquire(self) -> Optional[_SandboxWorker]:
+        with self._lock:
+            retry = self._missing > 0
+            if retry:
+                self._missing -= 1
+        if retry:
+            # A replacement failed to start earlier; try again rather than wait on a worker that never comes
+            return self._replace(None)
+        return self._idle.get()
+
+    def _replace(self, worker: Optional[_SandboxWorker]) -> Optional[_SandboxWorker]:
+        """Kills `worker` and starts a new one; None (and one worker missing) if that fails."""
+        if worker is not None:
+            worker.kill()
+        try:
+            return self._spawn()
+        except Exception as e:
+            logger.error(f"Could not restart sandbox worker: {e}")
+            with self._lock:
+                self._missing += 1
+            return None
+
+    def run(self, code: str) -> Any:
+        """Runs `code` in a worker, blocking until it finishes or times out."""
+        self.start()
+        worker = self._acquire()
+        if worker is None:
+            return "Error executing code: sandbox worker could not be started"
+        try:
+            worker.conn.send(code)
+            if not worker.conn.poll(self.timeout):
+                logger.warning("Sandbox script timed out, restarting worker")
+                worker = self._replace(worker)
+                return f"Execution timed out after {self.timeout:g} second{'' if self.timeout == 1 else 's'}."
+            status, value = worker.conn.recv()
+        except (EOFError, OSError):
+            logger.warning(f"Sandbox worker exited with code {worker.process.exitcode}, restarting it")
+            worker = self._replace(worker)
+            return "Error executing code: sandbox worker exited unexpectedly"
+        finally:
+            if worker is not None:
+                self._idle.put(worker)
+        return value if status == "ok" else f"Error executing code: {value}"
+
+    async def run_async(self, code: str) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.run, code)
+
+    def shutdown(self):
+        with self._lock:
+            while not self._idle.empty():
+                self._idle.get_nowait().kill()
+            self._started = False
+            self._missing = 0
+
+sandbox_pool = SandboxPool()
+
+def calculate_formula(code: str) -> Any:
+    """Executes the provided Python code and returns the result.
+
+    Parameters:
+        code: A string containing Python code to execute
+
+    Returns:
+        The result of executing the code
+    """
+    return sandbox_pool.run(clean_user_script(code))
+
+async def acalculate_formula(code: str) -> Any:
+    """Async version of `calculate_formula` that doesn't block the event loop."""
+    return await sandbox_pool.run_async(clean_user_script(code))
 
 if __name__ == "__main__":
 
@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+from textwrap import dedent
+from typing import Any, Dict, List, Tuple
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A system prompt split into a static prefix and a per-call tail.
+
+    Providers cache prompts by exact prefix, so everything that is the same in every
+    call (role, rules, examples) comes first, and the values that change between calls
+    (languages, dates, field lists) are appended after it.
+    """
+    name: str
+    instructions: str
+    context: str = ""
+
+    def render(self, **values) -> str:
+        if not self.context:
+            return self.instructions
+        return f"{self.instructions}\n\n{self.context.format(**values)}"
+
+
+PROMPTS: Dict[str, PromptTemplate] = {}
+
+
+def register_prompt(name: str, instructions: str, context: str = "") -> PromptTemplate:
+    """Dedents and stores a prompt once, at import; `context` is a `str.format` template."""
+    template = PromptTemplate(name, dedent(instructions).strip(), dedent(context).strip())
+    if PROMPTS.get(name, template) != template:
+        raise ValueError(f"Prompt {name!r} is already registered with different text")
+    PROMPTS[name] = template
+    return template
+
+
+class PromptCacheStats:
+    """Input tokens per prompt and model, and how many the provider served from its prompt cache."""
+
+    def __init__(self):
+        self._rows: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def record(self, prompt: str, model: str, input_tokens: int, cached_tokens: int, ttft: float):
+        row = self._rows.setdefault((prompt, model), {
+            "calls": 0,
+            "input_tokens": 0,
+            "cached_tokens": 0,
+            "cached_calls": 0,
+            "ttft_cached": 0.0,
+            "ttft_uncached": 0.0,
+        })
+        row["calls"] += 1
+        row["input_tokens"] += input_tokens
+        row["cached_tokens"] += cached_tokens
+        if cached_tokens:
+            row["cached_calls"] += 1
+            row["ttft_cached"] += ttft
+        else:
+            row["ttft_uncached"] += ttft
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per prompt and model: token totals, the cached share, and mean time to first token
+        (ms) of calls with and without a cache hit."""
+        result = []
+        for (prompt, model), row in sorted(self._rows.items()):
+            uncached_calls = row["calls"] - row["cached_calls"]
+            result.append({
+                "prompt": prompt,
+                "model": model,
+                "calls": row["calls"],
+                "input_tokens": row["input_tokens"],
+                "cached_tokens": row["cached_tokens"],
+                "uncached_tokens": row["input_tokens"] - row["cached_tokens"],
+                "cached_ratio": round(row["cached_tokens"] / row["input_tokens"], 3) if row["input_tokens"] else 0.0,
+                "ttft_cached_ms": round(row["ttft_cached"] / row["cached_calls"] * 1000, 1) if row["cached_calls"] else None,
+                "ttft_uncached_ms": round(row["ttft_uncached"] / uncached_calls * 1000, 1) if uncached_calls else None,
+            })
+        return result
+
+    def clear(self):
+        self._rows.clear()
+
+
+prompt_cache_stats = PromptCacheStats()
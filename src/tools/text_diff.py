@@ -0,0 +1,200 @@
+from bisect import bisect_left
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Hashable, Sequence
+
+# Regions whose len(a) * len(b) is at most this are matched by difflib directly,
+# which keeps its well-tested output for the short texts most requests send.
+SMALL_REGION = 40_000
+# Token run lengths tried in turn when looking for unique anchors
+ANCHOR_LENGTHS = (1, 3, 8)
+# Myers gives up on regions needing more edits than this and reports them as one replace
+MAX_EDIT_COST = 2_000
+
+Opcode = tuple[str, int, int, int, int]
+Match = tuple[int, int, int]
+
+
+def _intern(a: Sequence[Hashable], b: Sequence[Hashable]) -> tuple[list[int], list[int]]:
+    ids: dict = {}
+    return [ids.setdefault(t, len(ids)) for t in a], [ids.setdefault(t, len(ids)) for t in b]
+
+
+def _unique_anchors(a: list[int], alo: int, ahi: int, b: list[int], blo: int, bhi: int, k: int) -> list[Match]:
+    """Runs of `k` tokens occurring exactly once on both sides, reduced to the longest in-order chain.
+
+    This is patience diff; runs longer than one token let it anchor texts with a small
+    vocabulary, where hardly any single word is unique.
+    """
+    a_keys = [tuple(a[i:i + k]) for i in range(alo, ahi - k + 1)]
+    b_keys = [tuple(b[j:j + k]) for j in range(blo, bhi - k + 1)]
+    a_counts = Counter(a_keys)
+    b_counts = Counter(b_keys)
+    b_positions = {key: blo + offset for offset, key in enumerate(b_keys) if b_counts[key] == 1}
+    candidates = [
+        (alo + offset, b_positions[key])
+        for offset, key in enumerate(a_keys)
+        if a_counts[key] == 1 and key in b_positions
+    ]
+    if not candidates:
+        return []
+
+    # Longest increasing subsequence of b positions, via patience sorting
+    tails: list[int] = []
+    tail_indexes: list[int] = []
+    previous = [-1] * len(candidates)
+    for index, (_, j) in enumerate(candidates):
+        pile = bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_indexes.append(index)
+        else:
+            tails[pile] = j
+            tail_indexes[pile] = index
+        previous[index] = tail_indexes[pile - 1] if pile else -1
+
+    chain = []
+    index = tail_indexes[-1]
+    while index != -1:
+        chain.append(candidates[index])
+        index = previous[index]
+    chain.reverse()
+
+    # Overlapping runs on the same diagonal merge; any other overlap is dropped
+    anchors: list[Match] = []
+    for i, j in chain:
+        if anchors:
+            last_i, last_j, last_size = anchors[-1]
+            if i - j == last_i - last_j and i <= last_i + last_size:
+                anchors[-1] = (last_i, last_j, i + k - last_i)
+                continue
+            if i < last_i + last_size or j < last_j + last_size:
+                continue
+        anchors.append((i, j, k))
+    return anchors
+
+
+def _myers_matches(a: list[int], alo: int, ahi: int, b: list[int], blo: int, bhi: int) -> list[Match]:
+    """Shortest-edit-script matches for a region without unique anchors, or none if it is too costly."""
+    n, m = ahi - alo, bhi - blo
+    v = {1: 0}
+    trace = []
+    for d in range(min(n + m, MAX_EDIT_COST) + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, n, m, alo, blo)
+    return []
+
+
+def _myers_backtrack(trace: list[dict], n: int, m: int, alo: int, blo: int) -> list[Match]:
+    matches = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = v[previous_k]
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+            matches.append((alo + x, blo + y, 1))
+        x, y = previous_x, previous_y
+    return matches
+
+
+def _matching_blocks(a: list[int], b: list[int]) -> list[Match]:
+    matches: list[Match] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        prefix = 0
+        while alo + prefix < ahi and blo + prefix < bhi and a[alo + prefix] == b[blo + prefix]:
+            prefix += 1
+        if prefix:
+            matches.append((alo, blo, prefix))
+            alo += prefix
+            blo += prefix
+
+        suffix = 0
+        while ahi - suffix > alo and bhi - suffix > blo and a[ahi - suffix - 1] == b[bhi - suffix - 1]:
+            suffix += 1
+        if suffix:
+            matches.append((ahi - suffix, bhi - suffix, suffix))
+            ahi -= suffix
+            bhi -= suffix
+
+        if alo == ahi or blo == bhi:
+            continue
+
+        if (ahi - alo) * (bhi - blo) <= SMALL_REGION:
+            matcher = SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            matches.extend((alo + i, blo + j, size) for i, j, size in matcher.get_matching_blocks() if size)
+            continue
+
+        anchors = []
+        for k in ANCHOR_LENGTHS:
+            anchors = _unique_anchors(a, alo, ahi, b, blo, bhi, k)
+            if anchors:
+                break
+        if not anchors:
+            matches.extend(_myers_matches(a, alo, ahi, b, blo, bhi))
+            continue
+
+        previous_a, previous_b = alo, blo
+        for i, j, size in anchors:
+            stack.append((previous_a, i, previous_b, j))
+            matches.append((i, j, size))
+            previous_a, previous_b = i + size, j + size
+        stack.append((previous_a, ahi, previous_b, bhi))
+
+    return matches
+
+
+def _coalesce(matches: list[Match]) -> list[Match]:
+    blocks: list[Match] = []
+    for i, j, size in sorted(matches):
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            last_i, last_j, last_size = blocks[-1]
+            blocks[-1] = (last_i, last_j, last_size + size)
+        else:
+            blocks.append((i, j, size))
+    return blocks
+
+
+def diff_opcodes(a: Sequence[Hashable], b: Sequence[Hashable]) -> list[Opcode]:
+    """Opcodes turning `a` into `b`, in the format of `SequenceMatcher.get_opcodes()`.
+
+    Tokens are interned to ints, common prefixes and suffixes are stripped, and large
+    regions are split on tokens (or short runs of tokens) unique to both sides, as in
+    patience diff, before difflib or Myers match what is left. Edited prose diffs in
+    roughly O(n log n) instead of SequenceMatcher's worst-case quadratic time.
+    """
+    ia, ib = _intern(a, b)
+    opcodes: list[Opcode] = []
+    i = j = 0
+    for ai, bj, size in _coalesce(_matching_blocks(ia, ib)) + [(len(a), len(b), 0)]:
+        if i < ai and j < bj:
+            opcodes.append(("replace", i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(("delete", i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(("insert", i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            opcodes.append(("equal", ai, i, bj, j))
+    return opcodes
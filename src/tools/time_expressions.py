@@ -0,0 +1,316 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from zoneinfo import ZoneInfo
+
+# Locations every conversion is shown for, in display order
+TARGET_LOCATIONS = (
+    ("Larnaca", "Asia/Nicosia"),
+    ("Berlin", "Europe/Berlin"),
+    ("Moscow", "Europe/Moscow"),
+    ("London", "Europe/London"),
+)
+
+DEFAULT_SOURCE = TARGET_LOCATIONS[0]
+
+# (pattern, display name, IANA zone). Cyrillic stems cover case endings ("по Москве", "в Берлине").
+_LOCATION_ALIASES = (
+    (r"larnaca|limassol|nicosia|paphos|cyprus|ларнак\w*|лимассол\w*|никоси\w*|пафос\w*|кипр\w*", "Larnaca", "Asia/Nicosia"),
+    (r"berlin|germany|munich|берлин\w*|германи\w*|мюнхен\w*", "Berlin", "Europe/Berlin"),
+    (r"moscow|москв\w*|мск", "Moscow", "Europe/Moscow"),
+    (r"london|uk time|лондон\w*", "London", "Europe/London"),
+    (r"paris|париж\w*", "Paris", "Europe/Paris"),
+    (r"barcelona|барселон\w*", "Barcelona", "Europe/Madrid"),
+    (r"madrid|мадрид\w*", "Madrid", "Europe/Madrid"),
+    (r"amsterdam|амстердам\w*", "Amsterdam", "Europe/Amsterdam"),
+    (r"prague|праг\w*", "Prague", "Europe/Prague"),
+    (r"warsaw|варшав\w*", "Warsaw", "Europe/Warsaw"),
+    (r"belgrade|белград\w*", "Belgrade", "Europe/Belgrade"),
+    (r"kyiv|kiev|киев\w*|києв\w*", "Kyiv", "Europe/Kyiv"),
+    (r"istanbul|стамбул\w*", "Istanbul", "Europe/Istanbul"),
+    (r"tbilisi|тбилиси", "Tbilisi", "Asia/Tbilisi"),
+    (r"yerevan|ереван\w*", "Yerevan", "Asia/Yerevan"),
+    (r"dubai|дуба[йеюя]\w*", "Dubai", "Asia/Dubai"),
+    (r"new york|nyc|нью-йорк\w*|нью йорк\w*", "New York", "America/New_York"),
+    (r"los angeles|san francisco|лос-андж\w*|сан-франциско", "Los Angeles", "America/Los_Angeles"),
+    (r"chicago|чикаго", "Chicago", "America/Chicago"),
+    (r"tokyo|токио", "Tokyo", "Asia/Tokyo"),
+    (r"singapore|сингапур\w*", "Singapore", "Asia/Singapore"),
+)
+
+# Zone abbreviations are only recognised in upper case ("est" is a word in several languages);
+# two-letter ones like ET/PT are left out, they are too often something else ("PT session").
+# A standard or daylight abbreviation names a fixed offset whatever the date ("10:00 EST" in
+# October is not EDT); zones without daylight saving keep their IANA name.
+_ZONE_ABBREVIATIONS = (
+    (r"CET", "CET", "UTC+01:00"),
+    (r"CEST", "CEST", "UTC+02:00"),
+    (r"EET", "EET", "UTC+02:00"),
+    (r"EEST", "EEST", "UTC+03:00"),
+    (r"BST", "BST", "UTC+01:00"),
+    (r"EST", "EST", "UTC-05:00"),
+    (r"EDT", "EDT", "UTC-04:00"),
+    (r"PST", "PST", "UTC-08:00"),
+    (r"PDT", "PDT", "UTC-07:00"),
+    (r"MSK|МСК", "Moscow", "Europe/Moscow"),
+    (r"UTC|GMT", "UTC", "UTC"),
+    (r"JST", "Tokyo", "Asia/Tokyo"),
+)
+
+_LOCATION_PATTERNS = [
+    (re.compile(rf"(?<!\w)(?:{pattern})(?!\w)", re.IGNORECASE), name, zone)
+    for pattern, name, zone in _LOCATION_ALIASES
+] + [
+    (re.compile(rf"(?<!\w)(?:{pattern})(?!\w)"), name, zone)
+    for pattern, name, zone in _ZONE_ABBREVIATIONS
+]
+
+_TIME_24H_RE = re.compile(r"(?<![\d:.])([01]?\d|2[0-3]):([0-5]\d)(?::[0-5]\d)?(?![\d:])")
+# A bare H:MM is also a verse, a score or a ratio; it counts as a time after one of these
+_TIME_CONTEXT_RE = re.compile(
+    r"(?<!\w)(?:at|by|from|until|till|to|around|before|after|since|between|в|к|до|с|со|после|около|между)\s+$",
+    re.IGNORECASE,
+)
+# Joins the ends of a range ("10:00-11:30 CET", "between 9:00 and 10:00"), which share context
+_TIME_RANGE_JOIN_RE = re.compile(r"\s*(?:[-–—]|to|and|until|till|и|до)\s*", re.IGNORECASE)
+_ISO_TIMESTAMP_RE = re.compile(
+    r"(?<!\d)\d{4}-\d{2}-\d{2}[T ]([01]\d|2[0-3]):([0-5]\d)(?::[0-5]\d(?:\.\d+)?)?(Z|[+-](?:[01]\d|2[0-3]):?[0-5]\d)?(?![\d:])"
+)
+_TIME_24H_DOT_RE = re.compile(
+    r"(?<!\w)(?:at|from|until|till|by|around|в|к|до|с|со|после|около)\s+([01]?\d|2[0-3])\.([0-5]\d)(?![\d.])",
+    re.IGNORECASE,
+)
+_TIME_12H_RE = re.compile(
+    r"(?<![\d:])(1[0-2]|0?[1-9])(?::([0-5]\d))?\s*([ap])\.?\s?m\b\.?",
+    re.IGNORECASE,
+)
+_TIME_RU_PERIOD_RE = re.compile(
+    r"(?<!\w)(1[0-2]|0?[1-9])(?::([0-5]\d))?\s*(?:час(?:а|ов)?\s+)?(утра|дня|вечера|ночи)(?!\w)",
+    re.IGNORECASE,
+)
+_TIME_RU_HOURS_RE = re.compile(r"(?<!\w)(1[3-9]|2[0-3])\s*час(?:а|ов)?(?!\w)", re.IGNORECASE)
+_NOON_RE = re.compile(r"(?<!\w)(noon|midday|полдень|полдня)(?!\w)", re.IGNORECASE)
+_MIDNIGHT_RE = re.compile(r"(?<!\w)(midnight|полночь|полночи)(?!\w)", re.IGNORECASE)
+
+# Phrases that mention a time we can't pin down locally; these go to the LLM fallback
+_AMBIGUOUS_TIME_RE = re.compile(
+    r"(?<!\w)(?:"
+    r"half past|quarter (?:past|to)|o'?clock"
+    r"|(?:at|around|by|until|till|after|before)\s+(?:[01]?\d|2[0-3])(?![\w%/,.\d])"
+    r"|(?:в|к|до|после|около)\s+(?:[01]?\d|2[0-3])(?:\s*час(?:а|ов)?)?(?![\w%/,.\d])"
+    r"|пол\s?\w+ого|без (?:четверти|\d+)"
+    r")",
+    re.IGNORECASE,
+)
+
+_HARD_BOUNDARY_RE = re.compile(r"[\n;!?]|\.\s")
+_SOURCE_WINDOW = 25
+_COMMA_PENALTY = 20
+
+
+@dataclass
+class TimeMention:
+    hour: int
+    minute: int
+    start: int
+    end: int
+    source: str = DEFAULT_SOURCE[0]
+    zone: str = DEFAULT_SOURCE[1]
+    # Whether the text itself says this is a time of day, rather than only its H:MM shape
+    anchored: bool = True
+    # Set by a timestamp's own offset, not by nearby locations
+    zone_given: bool = False
+    # A timestamp's own date, which decides daylight saving; otherwise the current date
+    day: date | None = None
+
+
+def _to_24h(hour: int, period: str) -> int:
+    if period.lower() == "a":
+        return 0 if hour == 12 else hour
+    return 12 if hour == 12 else hour + 12
+
+
+def _ru_to_24h(hour: int, period: str) -> int:
+    period = period.lower()
+    if period == "утра":
+        return 0 if hour == 12 else hour
+    if period == "ночи":
+        if hour == 12:
+            return 0
+        return hour + 12 if hour >= 9 else hour
+    if period == "дня":
+        return hour + 12 if hour <= 6 else hour
+    return hour + 12 if hour < 12 else hour
+
+
+def _offset_zone(suffix: str) -> str:
+    """Zone, also used as the source name, of a `Z` or `±hh:mm` timestamp suffix: "UTC+03:00"."""
+    if suffix == "Z" or not suffix.strip("+-:0"):
+        return "UTC"
+    return f"UTC{suffix[:3]}:{suffix[-2:]}"
+
+
+def _tzinfo(zone: str) -> tzinfo:
+    if zone.startswith("UTC") and len(zone) > 3:
+        sign = -1 if zone[3] == "-" else 1
+        return timezone(sign * timedelta(hours=int(zone[4:6]), minutes=int(zone[7:9])))
+    return ZoneInfo(zone)
+
+
+def _find_confident_mentions(text: str) -> list[TimeMention]:
+    mentions: list[TimeMention] = []
+    # Timestamps without an offset have no zone we could convert from
+    skipped: list[tuple[int, int]] = []
+
+    def add(hour: int, minute: int, start: int, end: int, **fields):
+        if any(start < m.end and m.start < end for m in mentions):
+            return
+        if any(start < skipped_end and skipped_start < end for skipped_start, skipped_end in skipped):
+            return
+        mentions.append(TimeMention(hour, minute, start, end, **fields))
+
+    for match in _ISO_TIMESTAMP_RE.finditer(text):
+        if match.group(3) is None:
+            skipped.append(match.span())
+            continue
+        zone = _offset_zone(match.group(3))
+        day = date.fromisoformat(match.group(0)[:10])
+        add(int(match.group(1)), int(match.group(2)), match.start(), match.end(), source=zone, zone=zone, zone_given=True, day=day)
+    for match in _TIME_12H_RE.finditer(text):
+        add(_to_24h(int(match.group(1)), match.group(3)), int(match.group(2) or 0), match.start(), match.end())
+    for match in _TIME_RU_PERIOD_RE.finditer(text):
+        add(_ru_to_24h(int(match.group(1)), match.group(3)), int(match.group(2) or 0), match.start(), match.end())
+    for match in _TIME_24H_RE.finditer(text):
+        anchored = bool(_TIME_CONTEXT_RE.search(text[max(0, match.start() - 20):match.start()]))
+        add(int(match.group(1)), int(match.group(2)), match.start(), match.end(), anchored=anchored)
+    for match in _TIME_24H_DOT_RE.finditer(text):
+        add(int(match.group(1)), int(match.group(2)), match.start(1), match.end())
+    for match in _TIME_RU_HOURS_RE.finditer(text):
+        add(int(match.group(1)), 0, match.start(), match.end())
+    for match in _NOON_RE.finditer(text):
+        add(12, 0, match.start(), match.end())
+    for match in _MIDNIGHT_RE.finditer(text):
+        add(0, 0, match.start(), match.end())
+
+    return sorted(mentions, key=lambda m: m.start)
+
+
+def _find_locations(text: str) -> list[tuple[int, int, str, str]]:
+    found = []
+    for pattern, name, zone in _LOCATION_PATTERNS:
+        for match in pattern.finditer(text):
+            found.append((match.start(), match.end(), name, zone))
+    return sorted(found)
+
+
+def _link_score(gap: str) -> int | None:
+    if len(gap) > _SOURCE_WINDOW or _HARD_BOUNDARY_RE.search(gap):
+        return None
+    return len(gap) + (_COMMA_PENALTY if "," in gap else 0)
+
+
+def _assign_sources(text: str, mentions: list[TimeMention], locations: list[tuple[int, int, str, str]]):
+    spans = [(m.start, m.end) for m in mentions] + [(start, end) for start, end, _, _ in locations]
+
+    def blocked(lo: int, hi: int) -> bool:
+        return any(lo <= start < hi for start, _ in spans)
+
+    distinct = {(name, zone) for _, _, name, zone in locations}
+    fallback = next(iter(distinct)) if len(distinct) == 1 else DEFAULT_SOURCE
+
+    for mention in mentions:
+        if mention.zone_given:
+            continue
+        best = None
+        for start, end, name, zone in locations:
+            if start >= mention.end:
+                gap_lo, gap_hi = mention.end, start
+            elif end <= mention.start:
+                gap_lo, gap_hi = end, mention.start
+            else:
+                continue
+            score = _link_score(text[gap_lo:gap_hi])
+            if score is None or blocked(gap_lo, gap_hi):
+                continue
+            if best is None or score < best[0]:
+                best = (score, name, zone)
+        mention.source, mention.zone = (best[1], best[2]) if best else fallback
+        if best:
+            mention.anchored = True
+
+
+def _anchor_ranges(text: str, mentions: list[TimeMention]):
+    """Gives the unanchored end of a range the context and source of its other end."""
+    pairs = list(zip(mentions, mentions[1:]))
+    for left, right in pairs + pairs[::-1]:
+        if left.anchored != right.anchored and _TIME_RANGE_JOIN_RE.fullmatch(text, left.end, right.start):
+            loose, anchor = (left, right) if right.anchored else (right, left)
+            loose.anchored = True
+            loose.source, loose.zone = anchor.source, anchor.zone
+
+
+def find_time_mentions(text: str) -> tuple[list[TimeMention], bool]:
+    """Extracts explicit times of day with their source location.
+
+    Returns:
+        The mentions in text order and whether the text also contains time-like phrasing
+        that can't be resolved locally ("half past three", "в 3", "at 5"), in which case
+        the caller should not trust the local result alone.
+    """
+    mentions = _find_confident_mentions(text)
+    ambiguous = any(
+        not any(match.start() < m.end and m.start < match.end() for m in mentions)
+        for match in _AMBIGUOUS_TIME_RE.finditer(text)
+    )
+    if mentions:
+        _assign_sources(text, mentions, _find_locations(text))
+        _anchor_ranges(text, mentions)
+    return [mention for mention in mentions if mention.anchored], ambiguous
+
+
+def has_time_expression(text: str) -> bool:
+    mentions, ambiguous = find_time_mentions(text)
+    return bool(mentions) or ambiguous
+
+
+def convert_mentions(mentions: list[TimeMention], current_date: str) -> list[dict]:
+    """Converts mentions to every target location, in the structure `_format_time_zone_conversions` expects."""
+    today = date.fromisoformat(current_date)
+    conversions = []
+    seen = set()
+    for mention in mentions:
+        day = mention.day or today
+        key = (mention.source, mention.hour, mention.minute, day)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        source_dt = datetime.combine(day, time(mention.hour, mention.minute), tzinfo=_tzinfo(mention.zone))
+        times = {}
+        for city, zone in TARGET_LOCATIONS:
+            converted = source_dt.astimezone(ZoneInfo(zone))
+            value = converted.strftime("%H:%M")
+            day_shift = (converted.date() - day).days
+            if day_shift:
+                value += f" ({day_shift:+d})"
+            times[city] = value
+
+        conversions.append({
+            "source": mention.source,
+            "source_time": f"{mention.hour:02d}:{mention.minute:02d}",
+            "conversions": times,
+        })
+    return conversions
+
+
+def local_time_zone_conversions(text: str, current_date: str) -> list[dict] | None:
+    """Converts every explicit time in `text` without an LLM.
+
+    Returns:
+        The conversions (an empty list when the text has no time of day), or None when
+        the text contains phrasing that needs the LLM to interpret.
+    """
+    mentions, ambiguous = find_time_mentions(text)
+    if ambiguous:
+        return None
+    return convert_mentions(mentions, current_date)
@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import logging
+import os
+import secrets
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACE_BUFFER_SIZE = int(os.getenv("HERMIONE_TRACE_BUFFER", "5000"))
+OTEL_ENDPOINT = os.getenv("HERMIONE_OTEL_ENDPOINT", "")
+
+# Span attributes that become Prometheus labels; anything else would explode cardinality
+METRIC_LABELS = ("node", "model", "provider")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span_id", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    duration: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect_left(BUCKETS, value)
+        if index < len(BUCKETS):
+            self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+def _otel_value(value: Any):
+    return value if isinstance(value, (str, bool, int, float)) else str(value)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: Tuple) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in zip(("span",) + METRIC_LABELS, labels) if value)
+
+
+class Tracer:
+    """Keeps the most recent spans in a ring buffer and a duration histogram per span kind.
+
+    Spans of one request share a trace id; nesting follows the asyncio context, so work
+    started with `asyncio.create_task` inside a span becomes its child.
+    """
+
+    def __init__(self, buffer_size: int = TRACE_BUFFER_SIZE):
+        self._spans: deque = deque(maxlen=buffer_size)
+        self._histograms: Dict[Tuple, _Histogram] = {}
+        self._errors: Dict[Tuple, int] = {}
+        self._otel = None
+
+    def record(self, span: Span):
+        self._spans.append(span)
+        labels = (span.name,) + tuple(str(span.attributes.get(label, "")) for label in METRIC_LABELS)
+        self._histograms.setdefault(labels, _Histogram()).observe(span.duration)
+        if span.error is not None:
+            self._errors[labels] = self._errors.get(labels, 0) + 1
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Dict[str, Any]]:
+        """Times the block as a span; yields its attribute dict so the block can add to it."""
+        trace_id = _current_trace.get() or secrets.token_hex(8)
+        parent_id = _current_span.get()
+        span_id = secrets.token_hex(4)
+        trace_token = _current_trace.set(trace_id)
+        span_token = _current_span.set(span_id)
+        start, started = time.time(), time.perf_counter()
+        error = None
+        with self._otel.start_as_current_span(name) if self._otel else nullcontext() as exported:
+            try:
+                yield attributes
+            except asyncio.CancelledError:
+                attributes["cancelled"] = True
+                raise
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                duration = time.perf_counter() - started
+                if exported is not None:
+                    exported.set_attributes({key: _otel_value(value) for key, value in attributes.items()})
+                try:
+                    _current_span.reset(span_token)
+                    _current_trace.reset(trace_token)
+                except ValueError:
+                    # A span held across yields of an async generator can end in another context
+                    pass
+                self.record(Span(name, trace_id, span_id, parent_id, start, duration, attributes, error))
+
+    def record_duration(self, name: str, duration: float, **attributes):
+        """Records an already measured span (e.g. a sum of many small steps) under the current one."""
+        trace_id = _current_trace.get() or secrets.token_hex(8)
+        self.record(Span(name, trace_id, secrets.token_hex(4), _current_span.get(), time.time() - duration, duration, attributes))
+
+    def traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """The most recent `limit` traces, newest first, each with its spans in start order."""
+        grouped: Dict[str, List[Span]] = {}
+        for span in reversed(self._spans):
+            if span.trace_id not in grouped:
+                if len(grouped) >= limit:
+                    continue
+                grouped[span.trace_id] = []
+            grouped[span.trace_id].append(span)
+        return [
+            {
+                "trace_id": trace_id,
+                "start": min(span.start for span in spans),
+                "duration": max(span.start + span.duration for span in spans) - min(span.start for span in spans),
+                "spans": [asdict(span) for span in sorted(spans, key=lambda span: span.start)],
+            }
+            for trace_id, spans in grouped.items()
+        ]
+
+    def prometheus(self) -> str:
+        """Span durations in the Prometheus text exposition format."""
+        lines = [
+            "# HELP hermione_span_duration_seconds Duration of traced operations.",
+            "# TYPE hermione_span_duration_seconds histogram",
+        ]
+        for labels, histogram in sorted(self._histograms.items()):
+            label_text = _label_text(labels)
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'hermione_span_duration_seconds_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'hermione_span_duration_seconds_bucket{{{label_text},le="+Inf"}} {histogram.count}')
+            lines.append(f"hermione_span_duration_seconds_sum{{{label_text}}} {histogram.total:.6f}")
+            lines.append(f"hermione_span_duration_seconds_count{{{label_text}}} {histogram.count}")
+        lines += [
+            "# HELP hermione_span_errors_total Traced operations that raised.",
+            "# TYPE hermione_span_errors_total counter",
+        ]
+        for labels, count in sorted(self._errors.items()):
+            label_text = _label_text(labels)
+            lines.append(f"hermione_span_errors_total{{{label_text}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def enable_otel(self, endpoint: str) -> bool:
+        """Also exports spans over OTLP/HTTP to `endpoint`; returns False if OpenTelemetry isn't installed."""
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError:
+            logger.warning("HERMIONE_OTEL_ENDPOINT is set but opentelemetry-sdk is not installed; not exporting spans")
+            return False
+
+        provider = TracerProvider(resource=Resource.create({"service.name": "hermione"}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        self._otel = provider.get_tracer("hermione")
+        logger.info(f"Exporting spans to {endpoint}")
+        return True
+
+    def clear(self):
+        self._spans.clear()
+        self._histograms.clear()
+        self._errors.clear()
+
+
+tracer = Tracer()
+if OTEL_ENDPOINT:
+    tracer.enable_otel(OTEL_ENDPOINT)
@@ -0,0 +1,229 @@
+import contextvars
+import json
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Token budgets; 0 means unlimited
+REQUEST_TOKEN_BUDGET = int(os.getenv("HERMIONE_REQUEST_TOKEN_BUDGET", "0"))
+DAILY_TOKEN_BUDGET = int(os.getenv("HERMIONE_DAILY_TOKEN_BUDGET", "0"))
+# USD per million tokens, e.g. {"gpt-5": {"input": 1.25, "cached": 0.125, "output": 10}}
+MODEL_PRICES: Dict[str, Dict[str, float]] = json.loads(os.getenv("HERMIONE_MODEL_PRICES", "") or "{}")
+USAGE_DAYS_KEPT = 7
+
+# Rough sizes for budgeting before any call is made
+CHARS_PER_TOKEN = 4
+PROMPT_OVERHEAD_TOKENS = 400
+
+_current_request: contextvars.ContextVar[Optional["RequestUsage"]] = contextvars.ContextVar("request_usage", default=None)
+_current_node: contextvars.ContextVar[str] = contextvars.ContextVar("usage_node", default="other")
+
+
+@dataclass
+class Usage:
+    calls: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    latency: float = 0.0
+    cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def add(self, other: "Usage"):
+        self.calls += other.calls
+        self.input_tokens += other.input_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        self.latency += other.latency
+        self.cost += other.cost
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["latency"] = round(self.latency, 3)
+        data["cost"] = round(self.cost, 6)
+        data["total_tokens"] = self.total_tokens
+        return data
+
+
+def price(model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+    """Cost in USD from MODEL_PRICES; 0 for models without a price."""
+    rates = MODEL_PRICES.get(model)
+    if not rates:
+        return 0.0
+    cached_rate = rates.get("cached", rates.get("input", 0.0))
+    return (
+        (input_tokens - cached_tokens) * rates.get("input", 0.0)
+        + cached_tokens * cached_rate
+        + output_tokens * rates.get("output", 0.0)
+    ) / 1_000_000
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _rows(groups: Dict[Tuple[str, str], Usage]) -> List[Dict[str, Any]]:
+    return [{"node": node, "model": model, **usage.as_dict()} for (node, model), usage in sorted(groups.items())]
+
+
+class RequestUsage:
+    """LLM usage of one request, by node and model."""
+
+    def __init__(self):
+        self.groups: Dict[Tuple[str, str], Usage] = {}
+        self.dropped: List[str] = []
+
+    def add(self, node: str, model: str, usage: Usage):
+        self.groups.setdefault((node, model), Usage()).add(usage)
+
+    @property
+    def total(self) -> Usage:
+        total = Usage()
+        for usage in self.groups.values():
+            total.add(usage)
+        return total
+
+    def summary(self) -> Dict[str, Any]:
+        return {"total": self.total.as_dict(), "nodes": _rows(self.groups), "dropped_nodes": self.dropped}
+
+
+class UsageLedger:
+    """Rolls up LLM usage by day, node and model, and enforces the token budgets.
+
+    Calls are attributed to the request and node active in the asyncio context they run
+    in, like spans in `tracing`: set with `start_request()` and `node()`.
+    """
+
+    def __init__(
+        self,
+        request_budget: int = REQUEST_TOKEN_BUDGET,
+        daily_budget: int = DAILY_TOKEN_BUDGET,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.request_budget = request_budget
+        self.daily_budget = daily_budget
+        self._clock = clock
+        self._days: "OrderedDict[str, Dict[Tuple[str, str], Usage]]" = OrderedDict()
+        self._dropped: Counter = Counter()
+
+    def _today(self) -> str:
+        return time.strftime("%Y-%m-%d", time.localtime(self._clock()))
+
+    def start_request(self) -> RequestUsage:
+        request = RequestUsage()
+        _current_request.set(request)
+        return request
+
+    @contextmanager
+    def node(self, name: str) -> Iterator[None]:
+        token = _current_node.set(name)
+        try:
+            yield
+        finally:
+            try:
+                _current_node.reset(token)
+            except ValueError:
+                pass
+
+    def record(self, model: str, usage_metadata: Optional[Dict[str, Any]], latency: float):
+        """Adds one LLM call, from a LangChain `usage_metadata` dict, to the current request and day."""
+        if not usage_metadata:
+            return
+        input_tokens = usage_metadata.get("input_tokens") or 0
+        cached_tokens = (usage_metadata.get("input_token_details") or {}).get("cache_read") or 0
+        output_tokens = usage_metadata.get("output_tokens") or 0
+        usage = Usage(1, input_tokens, cached_tokens, output_tokens, latency, price(model, input_tokens, cached_tokens, output_tokens))
+        node = _current_node.get()
+
+        request = _current_request.get()
+        if request is not None:
+            request.add(node, model, usage)
+
+        day = self._today()
+        if day not in self._days:
+            self._days[day] = {}
+            while len(self._days) > USAGE_DAYS_KEPT:
+                self._days.popitem(last=False)
+        self._days[day].setdefault((node, model), Usage()).add(usage)
+
+    def used_today(self) -> int:
+        return sum(usage.total_tokens for usage in self._days.get(self._today(), {}).values())
+
+    def remaining_tokens(self) -> Optional[int]:
+        """Tokens the current request may still spend under both budgets, or None if unlimited."""
+        limits = []
+        if self.request_budget:
+            request = _current_request.get()
+            limits.append(self.request_budget - (request.total.total_tokens if request else 0))
+        if self.daily_budget:
+            limits.append(self.daily_budget - self.used_today())
+        return min(limits) if limits else None
+
+    def over_budget(self, candidates: List[Tuple[str, int, int]], protected_priority: int) -> List[str]:
+        """Names of nodes to drop so the estimated cost fits the remaining budget.
+
+        Args:
+            candidates: (name, priority, estimated tokens) of the nodes about to run.
+            protected_priority: Nodes at or below this priority are never dropped.
+
+        Returns:
+            The dropped names, least valuable (highest priority number, then most
+            expensive) first.
+        """
+        remaining = self.remaining_tokens()
+        if remaining is None:
+            return []
+        needed = sum(estimate for _, _, estimate in candidates)
+        droppable = sorted(
+            (candidate for candidate in candidates if candidate[1] > protected_priority and candidate[2] > 0),
+            key=lambda candidate: (candidate[1], candidate[2]),
+            reverse=True,
+        )
+        dropped = []
+        for name, _, estimate in droppable:
+            if needed <= remaining:
+                break
+            dropped.append(name)
+            needed -= estimate
+        if dropped:
+            self._dropped.update(dropped)
+            request = _current_request.get()
+            if request is not None:
+                request.dropped.extend(dropped)
+            logger.info(f"Token budget: {remaining} tokens left, dropping {dropped}")
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        by_node: Dict[str, Usage] = {}
+        by_model: Dict[str, Usage] = {}
+        for groups in self._days.values():
+            for (node, model), usage in groups.items():
+                by_node.setdefault(node, Usage()).add(usage)
+                by_model.setdefault(model, Usage()).add(usage)
+        return {
+            "budgets": {
+                "request_tokens": self.request_budget or None,
+                "daily_tokens": self.daily_budget or None,
+                "used_today": self.used_today(),
+            },
+            "days": {day: _rows(groups) for day, groups in self._days.items()},
+            "by_node": {node: usage.as_dict() for node, usage in sorted(by_node.items())},
+            "by_model": {model: usage.as_dict() for model, usage in sorted(by_model.items())},
+            "dropped_nodes": dict(self._dropped),
+        }
+
+    def clear(self):
+        self._days.clear()
+        self._dropped.clear()
+
+
+usage_ledger = UsageLedger()
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.messages import HumanMessage
+
+from src.agent import AgentBuilder, clear_timing_data, get_timing_data
+from src.prefetch import is_prefetchable
+
+
+class StreamingFakeLLM:
+    async def ainvoke(self, messages):
+        return SimpleNamespace(content="<no_time>")
+
+    async def astream(self, messages):
+        for chunk in ("Hello", " ", "world"):
+            await asyncio.sleep(0)
+            yield SimpleNamespace(content=chunk)
+
+
+def collect(stream_tokens, node_filter=None):
+    builder = AgentBuilder(provider="openai", base_model="gpt-test")
+    builder._get_llm = lambda use_fast=False: StreamingFakeLLM()
+    agent = builder.build()
+
+    async def run():
+        return [
+            event async for event in agent.ainvoke_streaming(
+                {"messages": [HumanMessage("Please review the draft before the meeting")]},
+                stream_tokens=stream_tokens,
+                node_filter=node_filter,
+            )
+        ]
+
+    return asyncio.run(run())
+
+
+def test_stream_tokens_emits_deltas_before_final_value():
+    events = collect(stream_tokens=True)
+    reformulation = [event for event in events if event["output_key"] == "reformulation"]
+
+    assert [event.get("delta") for event in reformulation[:-1]] == ["Hello", " ", "world"]
+    assert reformulation[-1]["value"] == "Hello world"
+
+
+def test_deltas_are_not_emitted_by_default():
+    events = collect(stream_tokens=False)
+
+    assert not any("delta" in event for event in events)
+    assert any(event["output_key"] == "reformulation" for event in events)
+
+
+def test_node_filter_splits_a_run_into_prefetchable_and_remaining_nodes():
+    prefetched = {event["output_key"] for event in collect(False, is_prefetchable)}
+    remaining = {event["output_key"] for event in collect(False, lambda spec: not is_prefetchable(spec))}
+
+    assert {"fixed", "fluent_translation"} <= prefetched
+    assert "reformulation" in remaining and "reformulation" not in prefetched
+    assert "existent" in remaining
+
+
+def test_identical_concurrent_requests_share_llm_calls():
+    calls = []
+
+    class CountingLLM(StreamingFakeLLM):
+        async def ainvoke(self, messages):
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return SimpleNamespace(content="Hello world")
+
+    builder = AgentBuilder(provider="openai", base_model="gpt-test")
+    builder._get_llm = lambda use_fast=False: CountingLLM()
+    agent = builder.build()
+
+    async def run():
+        message = {"messages": [HumanMessage("Please review the draft before the meeting")]}
+        return await asyncio.gather(agent.ainvoke(message), agent.ainvoke(message))
+
+    first, second = asyncio.run(run())
+
+    assert first["out_reformulation"] == second["out_reformulation"] == "Hello world"
+    assert len(calls) == 5
+
+
+def test_node_durations_are_recorded():
+    clear_timing_data()
+    collect(stream_tokens=False)
+    timings = get_timing_data()
+
+    assert "text_reformulation_node" in {timing["node"] for timing in timings}
+    assert all(timing["model"] == "gpt-test" and timing["time"] >= 0 for timing in timings)
@@ -0,0 +1,175 @@
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.messages import HumanMessage
+
+from src.agent import AgentBuilder, AgentState
+from src.chunking import join_chunks, map_chunks, split_text, transform_text
+from src.response_cache import ResponseCache
+
+
+def paragraphs(count, sentence="The quick brown fox jumps over the lazy dog. ", repeat=8):
+    return [f"{index}: " + sentence * repeat for index in range(count)]
+
+
+def test_split_text_joins_back_to_the_original():
+    text = "\n  " + "\n\n".join(paragraphs(6)) + "  \n\n\t- item one\n- item two\n\n"
+    leading, chunks = split_text(text, target_chars=800)
+
+    assert len(chunks) > 1
+    assert join_chunks(leading, chunks, [chunk.text for chunk in chunks]) == text
+    assert all(chunk.text == chunk.text.strip() for chunk in chunks)
+    assert all(len(chunk.text) <= 800 for chunk in chunks)
+
+
+def test_split_text_breaks_long_paragraphs_between_sentences():
+    text = "First sentence here. " * 100
+    leading, chunks = split_text(text, target_chars=300)
+
+    assert len(chunks) > 1
+    assert all(chunk.text.endswith(".") for chunk in chunks)
+    assert join_chunks(leading, chunks, [chunk.text for chunk in chunks]) == text
+
+
+def test_map_chunks_streams_in_order_when_chunks_finish_out_of_order():
+    _, chunks = split_text("\n\n".join(["alpha", "beta", "gamma"]), target_chars=5)
+    delays = {"alpha": 0.03, "beta": 0.0, "gamma": 0.01}
+    deltas = []
+
+    async def transform(text, on_delta):
+        await asyncio.sleep(delays[text])
+        on_delta(text.upper())
+        return text.upper()
+
+    outputs = asyncio.run(map_chunks(chunks, transform, deltas.append))
+
+    assert outputs == ["ALPHA", "BETA", "GAMMA"]
+    assert "".join(deltas) == "ALPHA\n\nBETA\n\nGAMMA"
+
+
+def test_map_chunks_sends_unstreamed_results_whole_and_bounds_concurrency():
+    _, chunks = split_text("\n\n".join(str(index) for index in range(6)), target_chars=1)
+    running = peak = 0
+    deltas = []
+
+    async def transform(text, on_delta):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return text
+
+    asyncio.run(map_chunks(chunks, transform, deltas.append, concurrency=2))
+
+    assert peak == 2
+    assert "".join(deltas) == "0\n\n1\n\n2\n\n3\n\n4\n\n5"
+
+
+def memo_runner():
+    memo = ResponseCache()
+    sent = []
+
+    async def transform(text, on_delta):
+        sent.append(text)
+        return text.upper()
+
+    def run(text):
+        return asyncio.run(transform_text(text, transform, memo_key=lambda paragraph: paragraph, memo=memo))
+
+    return run, sent
+
+
+def test_edited_text_sends_changed_paragraphs_with_their_neighbours():
+    run, sent = memo_runner()
+
+    first = "One paragraph.\n\nTwo paragraph.\n\nThree paragraph.\n\nFour paragraph."
+    assert run(first) == first.upper()
+    edited = "One paragraph.\n\nTwo paragraph.\n\nThree paragraph.\n\nFour paragraph!"
+    assert run(edited) == edited.upper()
+
+    assert sent == [first, "Three paragraph.\n\nFour paragraph!"]
+
+
+def test_short_text_is_sent_whole_unless_mostly_seen_before():
+    run, sent = memo_runner()
+
+    run("Hi Anna,\n\nThe report is attached, let me know what you think of the numbers.\n\nThanks")
+    run("Hi Anna,\n\nThe meeting moved to Friday.\n\nThanks")
+
+    assert sent[1] == "Hi Anna,\n\nThe meeting moved to Friday.\n\nThanks"
+
+
+def test_outputs_that_split_highlight_markup_are_not_memoized():
+    memo = ResponseCache()
+
+    async def transform(text, on_delta):
+        return "<b>One.\n\nTwo.</b>"
+
+    asyncio.run(transform_text("One\n\nTwo", transform, memo_key=lambda paragraph: paragraph, memo=memo))
+
+    assert memo.stats()["entries"] == 0
+
+
+class EchoLLM:
+    def __init__(self, model_name=None):
+        self.calls = 0
+        if model_name:
+            self.model_name = model_name
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return SimpleNamespace(content=messages[-1].content)
+
+    async def astream(self, messages):
+        self.calls += 1
+        yield SimpleNamespace(content=messages[-1].content)
+
+
+def test_long_text_is_fixed_chunk_by_chunk():
+    text = "\n\n".join(paragraphs(20, sentence="Chunked fix pipeline sentence. "))
+    llm = EchoLLM()
+    builder = AgentBuilder(provider="openai", base_model="gpt-test")
+    deltas = []
+
+    result = asyncio.run(builder._text_fix_node(AgentState(messages=[HumanMessage(text)]), llm, on_delta=deltas.append))
+
+    assert llm.calls == len(split_text(text)[1]) > 1
+    assert result == {"out_fixed": text}
+    assert "".join(deltas) == text
+
+
+def test_long_text_edit_reuses_unchanged_paragraphs():
+    original = paragraphs(20, sentence="Memoized paragraph sentence. ")
+    edited = original[:7] + ["7: A single edited paragraph."] + original[8:]
+    llm = EchoLLM(model_name="gpt-test")
+    builder = AgentBuilder(provider="openai", base_model="gpt-test")
+
+    def fix(text):
+        return asyncio.run(builder._text_fix_node(AgentState(messages=[HumanMessage(text)]), llm))["out_fixed"]
+
+    fix("\n\n".join(original))
+    calls = llm.calls
+
+    assert fix("\n\n".join(edited)) == "\n\n".join(edited)
+    assert llm.calls - calls == 1
+
+
+def test_fully_cached_long_text_is_reported_as_cached():
+    text = "\n\n".join(paragraphs(20, sentence="Cached chunk report sentence. "))
+    llm = EchoLLM(model_name="gpt-test")
+    builder = AgentBuilder(provider="openai", base_model="gpt-test")
+    builder._get_llm = lambda use_fast=False: llm
+    agent = builder.build()
+
+    def fixed_cached():
+        async def collect():
+            return [
+                event["cached"]
+                async for event in agent.ainvoke_streaming({"messages": [HumanMessage(text)]})
+                if event.get("output_key") == "fixed"
+            ]
+        return asyncio.run(collect())
+
+    assert fixed_cached() == [False]
+    assert fixed_cached() == [True]
@@ -1,4 +1,5 @@
 from src.tools.llm_tools import _apply_diff_highlights
+from src.tools.text_diff import diff_opcodes
 
 
 def test_replaced_word_includes_original_wording():
@@ -44,3 +45,30 @@ def test_removed_punctuation_has_no_original_annotation():
     assert result == "Hello world"
     assert "original-wording" not in result
 
+
+
+def test_diff_opcodes_cover_both_sequences():
+    a = ("one two three " * 400).split() + ["end"]
+    b = ("one two three " * 200).split() + ["four"] + ("one two three " * 200).split() + ["finish"]
+
+    opcodes = diff_opcodes(a, b)
+
+    assert opcodes[0][1] == 0 and opcodes[0][3] == 0
+    assert opcodes[-1][2] == len(a) and opcodes[-1][4] == len(b)
+    for (_, _, i2, _, j2), (_, i1, _, j1, _) in zip(opcodes, opcodes[1:]):
+        assert (i2, j2) == (i1, j1)
+    assert [op for op in opcodes if op[0] != "equal"] == [
+        ("insert", 600, 600, 600, 601),
+        ("replace", 1200, 1201, 1201, 1202),
+    ]
+
+
+def test_long_text_highlights_only_the_edit():
+    sentences = [f"Sentence number {i} talks about topic {i % 7}." for i in range(2000)]
+    original = " ".join(sentences)
+    sentences[1234] = sentences[1234].replace("talks", "speaks")
+
+    result = _apply_diff_highlights(original, " ".join(sentences))
+
+    assert result.count("<b>") == 1
+    assert '<s>talks</s> </span><b>speaks</b>' in result
@@ -0,0 +1,109 @@
+import asyncio
+import math
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from src.agent import AgentBuilder, AgentState
+from src.tools.function_calculator import SandboxPool, UnsupportedExpression, evaluate_expression
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(size=1, timeout=1, memory_limit_mb=1024)
+    yield pool
+    pool.shutdown()
+
+
+def test_sandbox_runs_script_with_numpy(pool):
+    assert pool.run("result = int(np.sum(np.arange(10)))") == 45
+
+
+def test_sandbox_reports_script_errors(pool):
+    assert pool.run("result = 1 / 0") == "Error executing code: division by zero"
+
+
+def test_sandbox_kills_runaway_script_and_recovers(pool):
+    assert pool.run("while True:\n    pass") == "Execution timed out after 1 second."
+    assert pool.run("result = math.sqrt(16)") == 4.0
+
+
+def test_worker_startup_does_not_count_against_the_script_timeout():
+    pool = SandboxPool(size=1, timeout=0.05)
+    try:
+        assert pool.run("result = 6 * 7") == 42
+    finally:
+        pool.shutdown()
+
+
+def test_failed_restart_is_retried_instead_of_requeued(monkeypatch):
+    pool = SandboxPool(size=1, timeout=0.2)
+    try:
+        pool.start()
+
+        def broken_spawn():
+            raise RuntimeError("no processes left")
+
+        spawn = pool._spawn
+        monkeypatch.setattr(pool, "_spawn", broken_spawn)
+        assert pool.run("while True:\n    pass") == "Execution timed out after 0.2 seconds."
+        assert pool.run("result = 1") == "Error executing code: sandbox worker could not be started"
+
+        monkeypatch.setattr(pool, "_spawn", spawn)
+        assert pool.run("result = 1") == 1
+        assert pool.run("result = 2") == 2
+    finally:
+        pool.shutdown()
+
+
+def test_sandbox_enforces_memory_limit(pool):
+    assert "memory limit" in pool.run("data = [0] * (10 ** 10)\nresult = 1")
+
+
+def test_sandbox_async_api():
+    pool = SandboxPool(size=2, timeout=1)
+
+    async def run_all():
+        return await asyncio.gather(*(pool.run_async(f"result = {i} * 2") for i in range(4)))
+
+    try:
+        assert asyncio.run(run_all()) == [0, 2, 4, 6]
+    finally:
+        pool.shutdown()
+
+
+def test_evaluate_expression_handles_plain_math():
+    assert evaluate_expression("2 + 2 * 2") == 6
+    assert evaluate_expression("log10(1000 * 66)") == pytest.approx(math.log10(66000))
+    assert evaluate_expression("2^10") == 1024
+    assert evaluate_expression("np.mean([1, 2, 3]) + sqrt(16)") == 6.0
+    assert evaluate_expression("ln(e) =") == 1.0
+
+
+@pytest.mark.parametrize("text", [
+    "Photosynthesis",
+    "x = 5",
+    "__import__('os').getpid()",
+    "(1).__class__",
+    "np.load('data.npy')",
+    "[1] * 10 ** 9",
+    "9 ^ 10000",
+    "1,000 * 3",
+    "3,5 + 2",
+    "[1, 2]",
+])
+def test_evaluate_expression_rejects_everything_else(text):
+    with pytest.raises(UnsupportedExpression):
+        evaluate_expression(text)
+
+
+def test_math_node_evaluates_expressions_without_llm():
+    builder = AgentBuilder(provider="openai", base_model="gpt-test")
+
+    def no_llm(use_fast=False):
+        raise AssertionError("LLM must not be used for a plain expression")
+
+    builder._get_single_llm = no_llm
+    state = AgentState(messages=[HumanMessage("2 + 2 * 2")])
+
+    assert asyncio.run(builder._math_formula_calculation_node(state)) == {"out_math_result": "6"}
@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.messages import HumanMessage
+
+from src.agent import AgentBuilder
+from src.hedging import LatencyTracker, hedged
+from src.response_cache import CacheHits, response_cache
+from src.tools.llm_tools import text_reformulation
+
+
+def test_deadline_is_learned_quantile():
+    tracker = LatencyTracker(quantile=0.9, min_samples=10, default_deadline=5.0, min_deadline=0.0)
+    assert tracker.deadline("fix") == 5.0
+
+    for i in range(1, 11):
+        tracker.record("fix", i / 10)
+
+    assert tracker.deadline("fix") == 1.0
+
+
+def run_hedged(primary_delay, backup_delay, primary_fails=False, deadline=0.05):
+    tracker = LatencyTracker(default_deadline=deadline, min_deadline=0.0)
+    cancelled = []
+
+    def attempt(name, delay, fails=False):
+        async def run():
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+            if fails:
+                raise RuntimeError(name)
+            return name
+        return run
+
+    result = asyncio.run(hedged(attempt("primary", primary_delay, primary_fails), attempt("backup", backup_delay), "fix", tracker=tracker))
+    return result, cancelled, tracker
+
+
+def test_fast_primary_never_fires_backup():
+    result, cancelled, tracker = run_hedged(primary_delay=0, backup_delay=0)
+
+    assert result == ("primary", False)
+    assert tracker.hedges == 0
+
+
+def test_late_primary_loses_to_backup_and_is_cancelled():
+    result, cancelled, tracker = run_hedged(primary_delay=1, backup_delay=0)
+
+    assert result == ("backup", True)
+    assert cancelled == ["primary"]
+    assert tracker.hedges == 1 and tracker.backup_wins == 1
+
+
+def test_failed_primary_starts_backup_immediately():
+    result, _, _ = run_hedged(primary_delay=0, backup_delay=0, primary_fails=True, deadline=10)
+
+    assert result == ("backup", True)
+
+
+class NamedLLM:
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    async def ainvoke(self, messages):
+        self.calls.append(self.name)
+        return SimpleNamespace(content=f"{self.name} text")
+
+
+def test_hedging_mode_sends_each_node_once_to_the_primary():
+    calls = []
+    builder = AgentBuilder(provider="openai", base_model=["gpt-a", "gpt-b"], hedging=True)
+    builder._get_llm = lambda use_fast=False: [NamedLLM("gpt-a", calls), NamedLLM("gpt-b", calls)]
+
+    state = asyncio.run(builder.build().ainvoke({"messages": [HumanMessage("Please check the report")]}))
+
+    assert state["out_reformulation"] == "gpt-a text"
+    assert "gpt-b" not in calls
+
+
+def test_cache_hits_are_not_recorded_as_latency():
+    response_cache.clear()
+    tracker = LatencyTracker()
+    llm = NamedLLM("gpt-test", [])
+    llm.model_name, llm.temperature = "gpt-test", 1
+
+    async def reformulate():
+        hits = CacheHits()
+        result = await text_reformulation("Send me the hedged report", llm=llm, cache_hits=hits)
+        return result, hits.all_hit
+
+    async def run():
+        await hedged(reformulate, reformulate, "miss", tracker=tracker, is_cached=lambda result: result[1])
+        await hedged(reformulate, reformulate, "hit", tracker=tracker, is_cached=lambda result: result[1])
+
+    asyncio.run(run())
+
+    assert llm.calls == ["gpt-test"]
+    assert set(tracker.stats()["deadlines"]) == {"miss"}
@@ -0,0 +1,40 @@
+import asyncio
+
+from src import llm_providers
+from src.llm_providers import get_async_http_client, get_openai_llm
+
+
+def test_openai_llm_is_shared_for_identical_settings(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+    first = get_openai_llm("gpt-test", temperature=1)
+    second = get_openai_llm("gpt-test", temperature=1)
+    other = get_openai_llm("gpt-test", temperature=0)
+
+    assert first is second
+    assert other is not first
+
+
+def test_async_http_client_is_scoped_to_event_loop():
+    async def get_client():
+        return get_async_http_client("https://example.invalid")
+
+    first = asyncio.run(get_client())
+    second = asyncio.run(get_client())
+
+    assert first is not second
+
+
+def test_llms_of_closed_event_loops_are_released(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+    async def build():
+        return get_openai_llm("loop-test-model")
+
+    first = asyncio.run(build())
+    second = asyncio.run(build())
+
+    get_openai_llm("loop-test-model")
+
+    assert first is not second
+    assert not any(key[-1] is not None and key[-1].is_closed() for key in llm_providers._llm_registry)
@@ -0,0 +1,45 @@
+import json
+import logging
+import queue
+import sys
+
+from src.logging_setup import DroppingQueueHandler, JsonFormatter, SamplingFilter
+
+
+def make_record(message, **extra):
+    record = logging.LogRecord("agent", logging.INFO, __file__, 1, message, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampling_keeps_one_in_n_model_info_lines_and_everything_else():
+    sampler = SamplingFilter(rate=0.25)
+
+    kept = [sampler.filter(make_record(f"[MODEL_INFO] node {i}")) for i in range(8)]
+
+    assert kept == [True, False, False, False, True, False, False, False]
+    assert sampler.filter(make_record("Request started"))
+
+
+def test_json_records_keep_extras_and_tracebacks_through_the_queue():
+    handler = DroppingQueueHandler(queue.Queue())
+    try:
+        raise ValueError("bad input")
+    except ValueError:
+        record = logging.LogRecord("api", logging.ERROR, __file__, 1, "failed %s", ("request",), sys.exc_info())
+    record.request_id = 7
+
+    entry = json.loads(JsonFormatter().format(handler.prepare(record)))
+
+    assert entry["message"] == "failed request"
+    assert entry["request_id"] == 7
+    assert "ValueError: bad input" in entry["exception"]
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+
+    handler.handle(make_record("first"))
+    handler.handle(make_record("second"))
+
+    assert handler.dropped == 1
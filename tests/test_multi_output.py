@@ -0,0 +1,57 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from langchain_core.messages import HumanMessage
+
+from src.agent import AgentBuilder
+from src.tools.llm_tools import _parse_multi_output
+
+
+class FakeLLM:
+    def __init__(self, multi_response):
+        self.multi_response = multi_response
+        self.calls = []
+
+    async def ainvoke(self, messages):
+        system_prompt = messages[0].content
+        self.calls.append(system_prompt)
+        if "Return only a JSON object with exactly the keys" in system_prompt:
+            return SimpleNamespace(content=self.multi_response)
+        if "identify explicit references to a time of day" in system_prompt:
+            return SimpleNamespace(content="<no_time>")
+        return SimpleNamespace(content="fallback")
+
+
+def build_agent(llm):
+    builder = AgentBuilder(provider="openai", base_model="gpt-test", execution_mode="multi_output")
+    builder._get_llm = lambda use_fast=False: llm
+    return builder.build()
+
+
+def test_parse_multi_output_skips_missing_and_empty_fields():
+    raw = "```json\n" + json.dumps({"fixed": "ok", "tldr": "", "emoji": 5}) + "\n```"
+
+    assert _parse_multi_output(raw, ["fixed", "tldr", "emoji", "polished"]) == {"fixed": "ok"}
+
+
+def test_multi_output_mode_uses_one_request_for_all_text_fields():
+    fields = ["fluent_translation", "fixed", "reformulation", "polished", "enrichment"]
+    llm = FakeLLM(json.dumps({field: f"{field} result" for field in fields}))
+
+    state = asyncio.run(build_agent(llm).ainvoke({"messages": [HumanMessage("Let us check the report tomorrow morning")]}))
+
+    text_calls = [call for call in llm.calls if "time of day" not in call]
+    assert len(text_calls) == 1
+    assert state["out_reformulation"] == "reformulation result"
+    assert state["out_enrichment"] == "enrichment result"
+
+
+def test_multi_output_mode_falls_back_per_missing_field():
+    llm = FakeLLM(json.dumps({"fluent_translation": "перевод", "reformulation": "r", "enrichment": "e"}))
+
+    state = asyncio.run(build_agent(llm).ainvoke({"messages": [HumanMessage("Let us check the report tomorrow morning")]}))
+
+    assert state["out_fluent_translation"] == "перевод"
+    assert "fallback" in state["out_fixed"]
+    assert "fallback" in state["out_polished"]
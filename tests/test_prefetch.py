@@ -0,0 +1,105 @@
+import asyncio
+
+from src.agent import NODE_REGISTRY
+from src.prefetch import PrefetchStore, replay_then_complete
+
+
+def numbers(count, gate=None):
+    async def stream():
+        for i in range(count):
+            if gate is not None:
+                await gate.wait()
+            yield {"output_key": "fixed", "value": str(i)}
+
+    return stream
+
+
+async def drain(store, entry):
+    return [event["value"] async for event in store.attach(entry)]
+
+
+def test_attach_replays_buffered_events_and_follows_the_run():
+    async def main():
+        store = PrefetchStore()
+        gate = asyncio.Event()
+        store.start("key", numbers(3, gate))
+        await asyncio.sleep(0)
+        reader = asyncio.create_task(drain(store, store.get("key")))
+        await asyncio.sleep(0)
+        gate.set()
+        late = await reader
+        early = await drain(store, store.get("key"))
+        return late, early
+
+    late, early = asyncio.run(main())
+
+    assert late == early == ["0", "1", "2"]
+
+
+def test_start_is_a_no_op_for_content_already_prefetched():
+    async def main():
+        store = PrefetchStore()
+        return store.start("key", numbers(1)), store.start("key", numbers(1))
+
+    assert asyncio.run(main()) == (True, False)
+
+
+def test_entries_expire_after_the_ttl():
+    now = [0.0]
+
+    async def main():
+        store = PrefetchStore(ttl=10, clock=lambda: now[0])
+        store.start("key", numbers(1))
+        await asyncio.sleep(0)
+        now[0] = 11
+        return store.get("key")
+
+    assert asyncio.run(main()) is None
+
+
+def test_oldest_runs_are_cancelled_over_the_running_limit_or_budget():
+    async def main():
+        store = PrefetchStore(max_running=1)
+        gate = asyncio.Event()
+        store.start("old", numbers(1, gate))
+        store.start("new", numbers(1, gate))
+        running = store.get("old"), store.get("new")
+
+        small = PrefetchStore(memory_budget=100)
+        small.start("a", numbers(1), size=40)
+        small.start("b", numbers(1), size=40)
+        await asyncio.sleep(0)
+        return running, small.get("a"), small.get("b")
+
+    (old, new), a, b = asyncio.run(main())
+
+    assert old is None and new is not None
+    assert a is None and b is not None
+
+
+def test_nodes_missing_from_a_failed_prefetch_are_run_live():
+    async def failing():
+        yield {"output_key": "fixed", "value": "Fixed"}
+        raise RuntimeError("provider down")
+
+    async def main():
+        store = PrefetchStore()
+        store.start("key", failing)
+        entry = store.get("key")
+        filters = []
+
+        async def run_nodes(node_filter):
+            filters.append(node_filter)
+            yield {"output_key": "existent", "value": "text"}
+            yield {"output_key": "fluent_translation", "value": "Live"}
+
+        results = [result async for result in replay_then_complete(store.attach(entry), run_nodes)]
+        return results, filters, store.get("key")
+
+    results, [node_filter], entry = asyncio.run(main())
+
+    assert [result["value"] for result in results] == ["Fixed", "Live"]
+    assert node_filter(NODE_REGISTRY["text_fluent_translation_node"])
+    assert not node_filter(NODE_REGISTRY["text_fix_node"])
+    assert not node_filter(NODE_REGISTRY["text_enrichment_node"])
+    assert entry is None
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.tools.llm_tools import TIME_ZONE_PROMPT, TRANSLATION_PROMPT, _invoke_llm
+from src.tools.prompts import PromptCacheStats, prompt_cache_stats, register_prompt
+
+
+def test_variable_parts_come_after_an_identical_static_prefix():
+    english = TRANSLATION_PROMPT.render(target="English")
+    russian = TRANSLATION_PROMPT.render(target="Русский")
+
+    assert english.startswith(TRANSLATION_PROMPT.instructions)
+    assert russian.startswith(TRANSLATION_PROMPT.instructions)
+    assert english.endswith("Target language: English")
+    assert "2026-10-17" not in TIME_ZONE_PROMPT.instructions
+    assert TIME_ZONE_PROMPT.render(current_date="2026-10-17").endswith("2026-10-17")
+
+
+def test_register_prompt_rejects_conflicting_text():
+    register_prompt("test_conflict", "Same text")
+    register_prompt("test_conflict", "Same text")
+
+    with pytest.raises(ValueError):
+        register_prompt("test_conflict", "Other text")
+
+
+def test_prompt_cache_stats_split_cached_and_uncached_tokens():
+    stats = PromptCacheStats()
+    stats.record("fix", "gpt-test", 1000, 0, 0.8)
+    stats.record("fix", "gpt-test", 1000, 750, 0.4)
+
+    [row] = stats.stats()
+    assert row["cached_tokens"] == 750 and row["uncached_tokens"] == 1250
+    assert row["cached_ratio"] == 0.375
+    assert row["ttft_cached_ms"] == 400.0 and row["ttft_uncached_ms"] == 800.0
+
+
+class UsageLLM:
+    model_name = "gpt-usage-test"
+    usage = {"input_tokens": 1200, "output_tokens": 5, "input_token_details": {"cache_read": 1024}}
+
+    async def ainvoke(self, messages):
+        return SimpleNamespace(content="done", usage_metadata=self.usage)
+
+    async def astream(self, messages):
+        yield SimpleNamespace(content="do", usage_metadata=None)
+        yield SimpleNamespace(content="ne", usage_metadata=None)
+        yield SimpleNamespace(content="", usage_metadata=self.usage)
+
+
+def test_invoke_llm_records_cached_tokens_from_usage_metadata():
+    prompt_cache_stats.clear()
+
+    asyncio.run(_invoke_llm(UsageLLM(), [], prompt="usage_test"))
+    asyncio.run(_invoke_llm(UsageLLM(), [], on_delta=lambda text: None, prompt="usage_test"))
+
+    [row] = [row for row in prompt_cache_stats.stats() if row["prompt"] == "usage_test"]
+    assert row["calls"] == 2
+    assert row["input_tokens"] == 2400 and row["cached_tokens"] == 2048
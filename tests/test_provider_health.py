@@ -0,0 +1,121 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+from langchain_core.messages import HumanMessage
+
+from src import agent as agent_module
+from src.agent import AgentBuilder
+from src.provider_health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ProviderHealthMonitor
+from src.response_cache import response_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10, clock=FakeClock())
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert not breaker.is_available()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10, clock=FakeClock())
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CLOSED
+
+
+def test_failed_half_open_probe_backs_off():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert not breaker.probe_due()
+
+    clock.now = 10
+    assert breaker.probe_due()
+    breaker.begin_probe()
+    assert breaker.state == HALF_OPEN
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.recovery_timeout == 20
+
+
+def test_monitor_probes_only_open_providers():
+    calls = []
+
+    async def probe():
+        calls.append("probe")
+        return True
+
+    monitor = ProviderHealthMonitor()
+    monitor.register_probe("litellm", probe)
+
+    asyncio.run(monitor.probe_due_providers())
+    assert calls == []
+
+    breaker = monitor.breaker("litellm")
+    breaker.failure_threshold = 1
+    breaker.recovery_timeout = 0
+    monitor.record_failure("litellm")
+    assert not monitor.is_available("litellm")
+
+    asyncio.run(monitor.probe_due_providers())
+
+    assert calls == ["probe"]
+    assert monitor.is_available("litellm")
+
+
+class FlakyLLM:
+    model_name = "gpt-health-test"
+    temperature = 1
+
+    def __init__(self):
+        self.down = False
+
+    async def ainvoke(self, messages):
+        if self.down:
+            raise httpx.ConnectError("provider down")
+        return SimpleNamespace(content="<no_time>")
+
+    async def astream(self, messages):
+        if self.down:
+            raise httpx.ConnectError("provider down")
+        yield SimpleNamespace(content="Fine")
+
+
+def test_local_and_cached_nodes_do_not_count_as_provider_success(monkeypatch):
+    response_cache.clear()
+    monitor = ProviderHealthMonitor()
+    monkeypatch.setattr(agent_module, "health_monitor", monitor)
+    llm = FlakyLLM()
+    builder = AgentBuilder(provider="openai", base_model="gpt-test")
+    builder._get_llm = lambda use_fast=False: llm
+    agent = builder.build()
+
+    def run(text):
+        async def collect():
+            return [event["output_key"] async for event in agent.ainvoke_streaming({"messages": [HumanMessage(text)]})]
+        return asyncio.run(collect())
+
+    assert "fixed" in run("Please review the draft before the meeting")
+    llm.down = True
+    monitor.record_failure("openai")
+
+    assert "fixed" in run("Please review the draft before the meeting")
+    assert "math_result" in run("2 + 2 * 2")
+    assert monitor.breaker("openai").consecutive_failures == 1
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.response_cache import CacheHits, ResponseCache, response_cache
+from src.tools.llm_tools import text_reformulation
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLLM:
+    model_name = "gpt-test"
+    temperature = 1
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return SimpleNamespace(content=f"reply {self.calls}")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, ttl=60, clock=FakeClock())
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=10, ttl=60, clock=clock)
+    cache.set("a", "1")
+
+    clock.now += 61
+
+    assert cache.get("a") is None
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    ResponseCache(db_path=db_path).set("a", {"fixed": "ok"})
+
+    assert ResponseCache(db_path=db_path).get("a") == {"fixed": "ok"}
+
+
+def test_cached_tool_reuses_result_for_same_input():
+    response_cache.clear()
+    llm = CountingLLM()
+
+    async def run_twice():
+        first = await text_reformulation("Send me the report", llm=llm)
+        hits = CacheHits()
+        second = await text_reformulation("Send me the report  ", llm=llm, cache_hits=hits)
+        return first, second, hits.all_hit
+
+    first, second, hit = asyncio.run(run_twice())
+
+    assert first == second == "reply 1"
+    assert llm.calls == 1
+    assert hit
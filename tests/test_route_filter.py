@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.messages import HumanMessage
+
+from src.agent import AgentBuilder, get_route_skip_counts
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, messages):
+        self.calls.append(messages[0].content)
+        return SimpleNamespace(content="result")
+
+
+def routes_for(text, **builder_kwargs):
+    builder = AgentBuilder(provider="openai", base_model="gpt-test", **builder_kwargs)
+    state = SimpleNamespace(messages=[HumanMessage(text)])
+    result = asyncio.run(builder._task_router_node(state))
+    state = SimpleNamespace(messages=[HumanMessage(text)], **result)
+    return builder._get_routes(state)
+
+
+def test_prose_without_time_skips_time_zone_node():
+    routes = routes_for("Could you please check the quarterly report before the meeting")
+
+    assert "time_zone_conversion_node" not in routes
+    assert "text_fix_node" in routes
+
+
+def test_time_expression_keeps_time_zone_node():
+    assert "time_zone_conversion_node" in routes_for("Let's talk at 15:30 Berlin time")
+
+
+def test_url_and_code_skip_text_nodes():
+    code = "def add(a, b):\n    return a + b\nresult = add(1, 2)"
+    for text in ["https://example.com/docs?page=2", code]:
+        routes = routes_for(text)
+        assert not any(route.startswith("text_") or route.startswith("emoji") for route in routes), text
+
+
+def test_text_with_no_route_left_falls_back_to_high_priority_nodes():
+    for text in ["1 250 000.50", "5 km", "3D"]:
+        assert routes_for(text) == ["text_fluent_translation_node", "text_fix_node"], text
+
+
+def test_plain_sentences_and_single_words_keep_text_nodes():
+    sentences = [
+        "let me know if you are free tomorrow",
+        "return the keys to the front desk please",
+        "public transport is on strike today",
+        "class was cancelled so we went home",
+        "import duties went up again this year",
+        "Thanks => see you soon",
+        "SELECT is a keyword in SQL",
+        "猫", "я", "a", "I",
+    ]
+    for text in sentences:
+        routes = routes_for(text)
+        assert "text_fix_node" in routes and "text_reformulation_node" in routes, text
+
+
+def test_pure_formula_keeps_only_math_node():
+    assert routes_for("log10(1000 * 66) + 2^5") == ["math_formula_calculation_node"]
+
+
+def test_same_native_and_target_language_skips_translation():
+    routes = routes_for("Please check the report", native_language="English", target_language="English")
+
+    assert "text_fluent_translation_node" not in routes
+    assert "text_polish_node" in routes
+
+
+def test_skipped_routes_are_counted_and_never_invoked():
+    before = get_route_skip_counts().get("time_zone_conversion_node", 0)
+    llm = FakeLLM()
+    builder = AgentBuilder(provider="openai", base_model="gpt-test")
+    builder._get_llm = lambda use_fast=False: llm
+
+    asyncio.run(builder.build().ainvoke({"messages": [HumanMessage("Please check the report")]}))
+
+    assert get_route_skip_counts()["time_zone_conversion_node"] == before + 1
+    assert not any("time of day" in call for call in llm.calls)
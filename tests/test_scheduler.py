@@ -0,0 +1,143 @@
+import asyncio
+
+from src.scheduler import Completion, DagScheduler, Job, LatencySlo, NodeSpec, PriorityLimiter, parse_limits
+
+
+def make_job(name, log, priority=0, depends_on=(), concurrency=None, delay=0):
+    spec = NodeSpec(name, "unused", f"out_{name}", depends_on=depends_on, priority=priority, concurrency=concurrency)
+
+    async def start():
+        log.append(("start", name))
+        await asyncio.sleep(delay)
+        log.append(("end", name))
+        return name
+
+    return Job(spec, start)
+
+
+def run(scheduler, jobs):
+    async def collect():
+        return [event async for event in scheduler.run(jobs)]
+
+    return asyncio.run(collect())
+
+
+def test_priority_decides_order_under_a_concurrency_cap():
+    log = []
+    jobs = [make_job("emoji", log, priority=2), make_job("fix", log, priority=0), make_job("polish", log, priority=1)]
+
+    events = run(DagScheduler(max_concurrency=1), jobs)
+
+    assert [event.result for event in events] == ["fix", "polish", "emoji"]
+
+
+def test_dependencies_start_after_their_node_finishes():
+    log = []
+    jobs = [make_job("summary", log, depends_on=("fix",)), make_job("fix", log, delay=0.01)]
+
+    run(DagScheduler(), jobs)
+
+    assert log.index(("end", "fix")) < log.index(("start", "summary"))
+
+
+def test_per_node_concurrency_limit():
+    log = []
+    jobs = [make_job("fix", log, concurrency=1, delay=0.01) for _ in range(3)]
+
+    run(DagScheduler(), jobs)
+
+    assert log == [("start", "fix"), ("end", "fix")] * 3
+
+
+def test_emitted_items_arrive_before_the_completion():
+    scheduler = DagScheduler()
+    spec = NodeSpec("fix", "unused", "out_fixed")
+
+    async def start():
+        scheduler.emit("delta")
+        await asyncio.sleep(0)
+        return "done"
+
+    events = run(scheduler, [Job(spec, start)])
+
+    assert events[0] == "delta"
+    assert isinstance(events[1], Completion) and events[1].result == "done"
+
+
+def test_closing_the_stream_cancels_running_jobs():
+    cancelled = []
+    spec = NodeSpec("slow", "unused", "out_slow")
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fast():
+        return "fast"
+
+    async def first_event():
+        stream = DagScheduler().run([Job(spec, slow), Job(NodeSpec("fast", "unused", "out_fast"), fast)])
+        event = await stream.__anext__()
+        await stream.aclose()
+        return event
+
+    assert asyncio.run(first_event()).result == "fast"
+    assert cancelled == [True]
+
+
+def test_hold_back_waits_for_first_high_priority_result():
+    log = []
+    jobs = [make_job("emoji", log, priority=2), make_job("fix", log, priority=0, delay=0.01)]
+
+    run(DagScheduler(hold_back_above=0), jobs)
+
+    assert log.index(("end", "fix")) < log.index(("start", "emoji"))
+
+
+def test_hold_back_releases_when_high_priority_nodes_fail():
+    log = []
+    spec = NodeSpec("fix", "unused", "out_fixed", priority=0)
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    events = run(DagScheduler(hold_back_above=0), [Job(spec, failing), make_job("emoji", log, priority=2)])
+
+    assert [event.result for event in events if event.error is None] == ["emoji"]
+
+
+def test_priority_limiter_admits_waiters_by_priority():
+    limiter = PriorityLimiter(1)
+    order = []
+
+    async def worker(name, priority):
+        async with limiter.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await limiter.acquire()
+        tasks = [asyncio.create_task(worker(name, priority)) for name, priority in [("emoji", 2), ("fix", 0), ("polish", 1)]]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+    assert order == ["fix", "polish", "emoji"]
+    assert limiter.active == 0
+
+
+def test_parse_limits_and_slo_snapshot():
+    assert parse_limits("openai=8, litellm=4,") == {"openai": 8, "litellm": 4}
+
+    slo = LatencySlo(target=1.0)
+    for seconds in (0.5, 0.8, 1.5, 0.9):
+        slo.record("openai", seconds)
+
+    snapshot = slo.snapshot()["openai"]
+    assert snapshot["samples"] == 4
+    assert snapshot["within_target"] == 0.75
@@ -0,0 +1,62 @@
+import asyncio
+
+from src.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call_and_its_chunks():
+    calls = []
+
+    async def call(emit):
+        calls.append(emit is not None)
+        for chunk in ("Hel", "lo"):
+            await asyncio.sleep(0.01)
+            emit(chunk)
+        return "Hello"
+
+    async def main():
+        flights = SingleFlight()
+        first, second = [], []
+        leader = asyncio.create_task(flights.run("key", call, first.append))
+        await asyncio.sleep(0.015)
+        results = await asyncio.gather(leader, flights.run("key", call, second.append))
+        return results, first, second, flights.stats()
+
+    results, first, second, stats = asyncio.run(main())
+
+    assert calls == [True]
+    assert results == ["Hello", "Hello"]
+    assert first == second == ["Hel", "lo"]
+    assert stats == {"in_flight": 0, "started": 1, "joined": 1}
+
+
+def test_call_is_cancelled_only_when_the_last_subscriber_leaves():
+    cancelled = []
+
+    async def call(emit):
+        try:
+            await asyncio.sleep(0.05)
+            return "done"
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        flights = SingleFlight()
+        first = asyncio.create_task(flights.run("key", call))
+        second = asyncio.create_task(flights.run("key", call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+
+        third = asyncio.create_task(flights.run("other", call))
+        await asyncio.sleep(0.01)
+        third.cancel()
+        await asyncio.gather(third, return_exceptions=True)
+        await asyncio.sleep(0)
+        return result, flights.stats()["in_flight"]
+
+    result, in_flight = asyncio.run(main())
+
+    assert result == "done"
+    assert cancelled == [True]
+    assert in_flight == 0
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from src.streaming import cancel_on, merge_streams
+
+
+async def delayed(items, delay):
+    for item in items:
+        await asyncio.sleep(delay)
+        yield item
+
+
+def test_merge_streams_forwards_items_as_they_arrive():
+    async def collect():
+        return [item async for item in merge_streams(delayed(["slow"], 0.05), delayed(["a", "b"], 0.01))]
+
+    assert asyncio.run(collect()) == ["a", "b", "slow"]
+
+
+def test_merge_streams_cancels_other_sources_on_error():
+    cancelled = asyncio.Event()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+        yield
+
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.005)
+                yield "tick"
+        finally:
+            cancelled.set()
+
+    async def collect():
+        async for _ in merge_streams(failing(), endless()):
+            pass
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect())
+    assert cancelled.is_set()
+
+
+def test_cancel_on_stops_pending_step_immediately():
+    cleaned_up = []
+
+    async def slow_source():
+        try:
+            yield "first"
+            await asyncio.sleep(10)
+            yield "never"
+        finally:
+            cleaned_up.append(True)
+
+    async def run():
+        event = asyncio.Event()
+        items = []
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        async for item in cancel_on(event, slow_source()):
+            items.append(item)
+            loop.call_later(0.01, event.set)
+        return items, loop.time() - started
+
+    items, elapsed = asyncio.run(run())
+
+    assert items == ["first"]
+    assert cleaned_up == [True]
+    assert elapsed < 1
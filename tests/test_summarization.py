@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.tools.llm_tools import SUMMARY_CHUNK_CHARS, text_summarization
+
+
+class SummarizerLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def _reply(self, messages):
+        system, text = messages[0].content, messages[-1].content
+        self.prompts.append(system)
+        if "summaries of consecutive sections" in system:
+            return "Final TL;DR."
+        return f"Section summary of {len(text)} chars."
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(0)
+        return SimpleNamespace(content=self._reply(messages))
+
+    async def astream(self, messages):
+        await asyncio.sleep(0)
+        yield SimpleNamespace(content=self._reply(messages))
+
+
+def long_text(paragraphs):
+    return "\n\n".join(f"Paragraph {index}. " + "Some words in a sentence. " * 40 for index in range(paragraphs))
+
+
+def test_long_text_is_summarized_per_section_then_combined():
+    llm = SummarizerLLM()
+    deltas = []
+    text = long_text(30)
+
+    summary = asyncio.run(text_summarization(text=text, native_language="English", llm=llm, on_delta=deltas.append))
+
+    sections = [prompt for prompt in llm.prompts if "one section of a longer document" in prompt]
+    assert len(text) > SUMMARY_CHUNK_CHARS and len(sections) > 1
+    assert llm.prompts[-1].count("summaries of consecutive sections") == 1
+    assert summary == "Final TL;DR."
+    assert "".join(deltas).startswith("Section summary of")
+
+
+def test_short_text_is_summarized_in_one_call():
+    llm = SummarizerLLM()
+
+    summary = asyncio.run(text_summarization(text=long_text(1), native_language="English", llm=llm))
+
+    assert len(llm.prompts) == 1
+    assert summary.startswith("Section summary of")
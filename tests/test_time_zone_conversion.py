@@ -2,6 +2,7 @@ import asyncio
 from types import SimpleNamespace
 
 from src.tools.llm_tools import convert_time_zones
+from src.tools.time_expressions import local_time_zone_conversions
 
 
 class FakeLLM:
@@ -34,7 +35,7 @@ def test_convert_time_zones_builds_dated_prompt():
 
     result = asyncio.run(
         convert_time_zones(
-            text="Let's meet at 3 PM Berlin time",
+            text="Let's meet at half past three Berlin time",
             llm=llm,
             current_date="2026-07-25"
         )
@@ -54,7 +55,7 @@ def test_convert_time_zones_builds_dated_prompt():
     assert "Europe/London" in system_prompt
     assert "treat the source as Larnaca" in system_prompt
     assert llm.messages[1].content == (
-        "<input>Let's meet at 3 PM Berlin time</input>"
+        "<input>Let's meet at half past three Berlin time</input>"
     )
 
 
@@ -104,3 +105,89 @@ def test_convert_time_zones_includes_external_source():
         "London:   14:00"
     )
 
+
+
+def test_convert_time_zones_converts_explicit_time_locally():
+    llm = FakeLLM("<no_time>")
+
+    result = asyncio.run(
+        convert_time_zones(
+            text="Let's meet at 3 PM Berlin time",
+            llm=llm,
+            current_date="2026-07-25"
+        )
+    )
+
+    assert result == (
+        "Larnaca: 16:00\n"
+        "Berlin:  <b>15:00</b>\n"
+        "Moscow:  16:00\n"
+        "London:  14:00"
+    )
+    assert llm.messages == []
+
+
+def test_convert_time_zones_skips_llm_without_time():
+    llm = FakeLLM("<no_time>")
+
+    result = asyncio.run(
+        convert_time_zones(
+            text="There is no schedule yet",
+            llm=llm,
+            current_date="2026-07-25"
+        )
+    )
+
+    assert result == ""
+    assert llm.messages == []
+
+
+def test_cyrillic_time_uses_winter_offsets_and_marks_next_day():
+    conversions = local_time_zone_conversions("созвон в 11 вечера по Москве", "2026-01-15")
+
+    assert conversions == [{
+        "source": "Moscow",
+        "source_time": "23:00",
+        "conversions": {
+            "Larnaca": "22:00",
+            "Berlin": "21:00",
+            "Moscow": "23:00",
+            "London": "20:00",
+        },
+    }]
+    assert local_time_zone_conversions("в 23:30 London", "2026-01-15")[0]["conversions"]["Moscow"] == "02:30 (+1)"
+
+
+def test_ambiguous_time_phrasing_needs_llm():
+    assert local_time_zone_conversions("давай в 3 по Берлину", "2026-07-25") is None
+
+
+def test_bare_clock_shapes_without_time_context_are_not_converted():
+    assert local_time_zone_conversions("Read John 3:16 tonight", "2026-07-25") == []
+    assert local_time_zone_conversions("Final score 2:45", "2026-07-25") == []
+    assert local_time_zone_conversions("Logged 2026-07-25 02:30:00 by cron", "2026-07-25") == []
+    assert local_time_zone_conversions("Standup 10:00 CET", "2026-07-25")[0]["source"] == "CET"
+
+
+def test_timestamp_offsets_are_honored_and_two_letter_zones_ignored():
+    [utc] = local_time_zone_conversions("Deploy at 2026-07-25T02:30:00Z", "2026-07-25")
+    [session] = local_time_zone_conversions("PT session at 10:00", "2026-07-25")
+
+    assert (utc["source"], utc["conversions"]["Larnaca"]) == ("UTC", "05:30")
+    assert session["source"] == "Larnaca"
+
+
+def test_timestamps_use_their_own_date_for_daylight_saving():
+    [deploy] = local_time_zone_conversions("Deploy finished at 2024-01-15T10:00:00+00:00", "2026-07-25")
+
+    assert deploy["source"] == "UTC"
+    assert deploy["conversions"]["London"] == "10:00"
+    assert deploy["conversions"]["Larnaca"] == "12:00"
+
+
+def test_standard_and_daylight_abbreviations_are_fixed_offsets():
+    [october] = local_time_zone_conversions("Call at 10:00 EST", "2026-10-17")
+    [summer] = local_time_zone_conversions("Call at 10:00 CET", "2026-07-25")
+
+    assert october["conversions"]["London"] == "16:00"
+    assert summer["conversions"]["Berlin"] == "11:00"
@@ -0,0 +1,67 @@
+import asyncio
+
+from src.tracing import Tracer
+
+
+def test_spans_nest_across_tasks_and_group_into_traces():
+    tracer = Tracer()
+
+    async def child():
+        with tracer.span("node", node="text_fix_node"):
+            await asyncio.sleep(0)
+
+    async def main():
+        with tracer.span("request"):
+            await asyncio.gather(asyncio.create_task(child()), asyncio.create_task(child()))
+            tracer.record_duration("serialize", 0.001, chunks=3)
+        with tracer.span("request"):
+            pass
+
+    asyncio.run(main())
+    latest, first = tracer.traces()
+    root = next(span for span in first["spans"] if span["name"] == "request")
+    children = [span for span in first["spans"] if span is not root]
+
+    assert len(latest["spans"]) == 1
+    assert sorted(span["name"] for span in children) == ["node", "node", "serialize"]
+    assert all(span["parent_id"] == root["span_id"] and span["trace_id"] == root["trace_id"] for span in children)
+
+
+def test_prometheus_histograms_use_only_low_cardinality_labels():
+    tracer = Tracer()
+    tracer.record_duration("node", 0.2, node="text_fix_node", model="gpt-test", request_id=42)
+    tracer.record_duration("node", 3.0, node="text_fix_node", model="gpt-test", request_id=43)
+
+    text = tracer.prometheus()
+
+    assert 'hermione_span_duration_seconds_bucket{span="node",node="text_fix_node",model="gpt-test",le="0.25"} 1' in text
+    assert 'hermione_span_duration_seconds_count{span="node",node="text_fix_node",model="gpt-test"} 2' in text
+    assert "request_id" not in text
+
+
+def test_failures_are_counted_but_cancellation_is_not():
+    tracer = Tracer()
+
+    async def main():
+        try:
+            with tracer.span("llm.call", model="gpt-test"):
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        task = asyncio.create_task(asyncio.sleep(1))
+
+        async def cancelled():
+            with tracer.span("node"):
+                await task
+
+        waiter = asyncio.create_task(cancelled())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(main())
+    text = tracer.prometheus()
+
+    assert 'hermione_span_errors_total{span="llm.call",model="gpt-test"} 1' in text
+    assert 'hermione_span_errors_total{span="node"}' not in text
+    assert tracer.traces()[0]["spans"][0]["attributes"] == {"cancelled": True}
@@ -0,0 +1,106 @@
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.messages import HumanMessage
+
+from src.agent import AgentBuilder
+from src import usage
+from src.usage import UsageLedger, price, usage_ledger
+
+USAGE = {"input_tokens": 100, "output_tokens": 20, "input_token_details": {"cache_read": 60}}
+
+
+def test_calls_are_attributed_to_the_request_and_node_in_context():
+    ledger = UsageLedger()
+
+    async def call(latency):
+        ledger.record("gpt-test", USAGE, latency)
+
+    async def run():
+        request = ledger.start_request()
+        with ledger.node("text_fix_node"):
+            await asyncio.create_task(call(0.5))
+        await call(0.25)
+        return request
+
+    request = asyncio.run(run())
+
+    nodes = {(row["node"], row["model"]): row for row in request.summary()["nodes"]}
+    assert nodes[("text_fix_node", "gpt-test")]["cached_tokens"] == 60
+    assert nodes[("other", "gpt-test")]["calls"] == 1
+    assert request.total.total_tokens == 240
+    assert ledger.used_today() == 240
+    assert ledger.stats()["by_node"]["text_fix_node"]["output_tokens"] == 20
+
+
+def test_price_bills_cached_input_at_the_cached_rate(monkeypatch):
+    monkeypatch.setitem(usage.MODEL_PRICES, "gpt-test", {"input": 2.0, "cached": 0.5, "output": 8.0})
+
+    assert price("gpt-test", 1_000_000, 500_000, 100_000) == 1.0 + 0.25 + 0.8
+    assert price("unpriced", 1000, 0, 1000) == 0.0
+
+
+def test_over_budget_drops_low_value_nodes_first():
+    ledger = UsageLedger(request_budget=1000)
+    candidates = [("fix", 0, 600), ("reformulation", 1, 300), ("enrichment", 2, 300), ("emoji", 2, 100)]
+
+    async def plan():
+        ledger.start_request()
+        return ledger.over_budget(candidates, protected_priority=0)
+
+    assert asyncio.run(plan()) == ["enrichment"]
+    assert UsageLedger().over_budget(candidates, protected_priority=0) == []
+
+
+def test_daily_budget_keeps_only_protected_nodes_once_spent():
+    ledger = UsageLedger(daily_budget=100)
+    ledger.record("gpt-test", USAGE, 0.1)
+
+    dropped = ledger.over_budget([("fix", 0, 500), ("polish", 1, 500), ("emoji", 2, 0)], protected_priority=0)
+
+    assert dropped == ["polish"]
+    assert ledger.stats()["dropped_nodes"] == {"polish": 1}
+
+
+class MeteredLLM:
+    model_name = "gpt-test"
+
+    async def ainvoke(self, messages):
+        return SimpleNamespace(content="<no_time>", usage_metadata=USAGE)
+
+    async def astream(self, messages):
+        yield SimpleNamespace(content="Reply", usage_metadata=None)
+        yield SimpleNamespace(content="", usage_metadata=USAGE)
+
+
+def run_agent(monkeypatch, text, request_budget=0):
+    monkeypatch.setattr(usage_ledger, "request_budget", request_budget)
+    builder = AgentBuilder(provider="openai", base_model="gpt-test")
+    builder._get_llm = lambda use_fast=False: MeteredLLM()
+    agent = builder.build()
+
+    async def run():
+        request = usage_ledger.start_request()
+        keys = [
+            event["output_key"] async for event in agent.ainvoke_streaming(
+                {"messages": [HumanMessage(text)]}
+            )
+        ]
+        return request, keys
+
+    return asyncio.run(run())
+
+
+def test_request_summary_has_usage_per_node(monkeypatch):
+    request, _ = run_agent(monkeypatch, "Usage accounting check for the weekly planning notes")
+
+    nodes = {row["node"] for row in request.summary()["nodes"]}
+    assert {"text_fix_node", "text_reformulation_node"} <= nodes
+
+
+def test_request_budget_drops_low_value_nodes(monkeypatch):
+    request, keys = run_agent(monkeypatch, "Budget check for the quarterly planning notes", request_budget=1)
+
+    assert "fixed" in keys
+    assert "reformulation" not in keys and "enrichment" not in keys
+    assert "text_enrichment_node" in request.summary()["dropped_nodes"]